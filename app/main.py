@@ -8,12 +8,15 @@ from fastapi.responses import ORJSONResponse
 from starlette.exceptions import HTTPException
 
 from app.server.config import config
+from app.server.database.write_behind import write_buffer
 from app.server.handler.error_handler import http_exception_handler, validation_exception_handler
 from app.server.logger.custom_logger import logger
 from app.server.middlewares.exceptions import ExceptionHandlerMiddleware
 from app.server.middlewares.request_gzip import GzipRoute
 from app.server.middlewares.tracker import RequestsTrackerMiddleware
 from app.server.routes.auth_manager import router as AUTH_MANAGER
+from app.server.routes.diagnostics import router as DIAGNOSTICS
+from app.server.services import auth_manager, retention, revocation
 from app.server.utils import date_utils, mongo_utils
 from app.server.utils.token_util import authorize_docs
 
@@ -32,6 +35,7 @@ GZIP_REQUEST_ROUTE = APIRouter(route_class=GzipRoute)
 # add routes
 app.include_router(GZIP_REQUEST_ROUTE)
 app.include_router(AUTH_MANAGER, tags=['AUTH'], prefix='/api/v1')
+app.include_router(DIAGNOSTICS, tags=['DIAGNOSTICS'], prefix='/api/v1', include_in_schema=False)
 
 
 # add exception handlers
@@ -70,14 +74,25 @@ async def openapi(_username: str = Depends(authorize_docs)):
 async def startup_event():
     logger.debug(f'App startup: {str(date_utils.get_current_date_time())}')
     await mongo_utils.create_indexes()
+    if config.MONGO_INDEX_CHECK:
+        await mongo_utils.verify_hot_queries()
+    write_buffer.start()
+    retention.start()
+    revocation.start()
+    # users created before the search fields existed
+    auth_manager.start_search_backfill()
     # Count the number of APIs
     num_apis = len(app.routes)
     print(f'**********************************************\nThere are {num_apis} APIs in this application.\n**********************************************')
 
 
 @app.on_event('shutdown')
-def shutdown_event():
+async def shutdown_event():
     logger.debug(f'App shutdown: {str(date_utils.get_current_date_time())}')
+    await auth_manager.stop_search_backfill()
+    await revocation.stop()
+    await retention.stop()
+    await write_buffer.stop()
 
 
 @app.get('/', tags=['Root'], include_in_schema=False)
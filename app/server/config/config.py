@@ -8,12 +8,76 @@ APP_VERSION = os.environ.get('APP_VERSION', '1.0.0')
 
 # Oauth JWT configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', os.urandom(32))
+# Verified claims kept per token until it expires, so repeated requests skip the signature check. 0 disables the cache.
+JWT_CLAIMS_CACHE_MAX_SIZE = int(os.environ.get('JWT_CLAIMS_CACHE_MAX_SIZE', 10000))
+# Users resolved by JWTAuthUser per access token. Dropped on local token and account status writes, the ttl bounds how long other workers serve a stale entry.
+AUTH_USER_CACHE_MAX_SIZE = int(os.environ.get('AUTH_USER_CACHE_MAX_SIZE', 10000))
+AUTH_USER_CACHE_TTL_SECONDS = float(os.environ.get('AUTH_USER_CACHE_TTL_SECONDS', 10))
+# Stateless JWTAuthUser: access tokens are accepted on signature, expiry and a per-worker revocation set refreshed from revoked_tokens
+# every REVOCATION_REFRESH_SECONDS, without reading access_tokens or users. auth_manager.update_user_access and delete_user revoke the tokens of the user.
+STATELESS_AUTH = os.environ.get('STATELESS_AUTH', 'false').lower() == 'true'
+REVOCATION_REFRESH_SECONDS = float(os.environ.get('REVOCATION_REFRESH_SECONDS', 5))
+REVOCATION_REBUILD_SECONDS = float(os.environ.get('REVOCATION_REBUILD_SECONDS', 3600))
+REVOCATION_FILTER_CAPACITY = int(os.environ.get('REVOCATION_FILTER_CAPACITY', 100000))
+REVOCATION_FILTER_ERROR_RATE = float(os.environ.get('REVOCATION_FILTER_ERROR_RATE', 0.001))
 LOG_FILE_NAME = os.environ.get('LOG_FILE_NAME', 'app')
 # Swagger Doc configuration
 DOC_USERNAME = os.environ.get('DOC_USERNAME', 'admin')
 DOC_PASSWORD = os.environ.get('DOC_PASSWORD', 'admin')
 # Mongo configuration
 MONGO_URI = os.environ.get('MONGO_URI', 'mongodb://localhost:27017/test-dev')
+# mongo or memory, the in-memory engine runs the app without a mongod for benchmarks and load tests
+DATABASE_BACKEND = os.environ.get('DATABASE_BACKEND', 'mongo')
+# Default read profile per collection, e.g. 'users:secondary_preferred,request_tracker:nearest'. Unlisted collections read from the primary.
+MONGO_READ_PROFILES = os.environ.get('MONGO_READ_PROFILES', '')
+# Maximum replication lag of a secondary serving secondary_preferred and nearest reads, mongo requires at least 90
+MONGO_MAX_STALENESS_SECONDS = int(os.environ.get('MONGO_MAX_STALENESS_SECONDS', 90))
+# Write concern of telemetry writes (request tracker, last active, last login), 0 does not wait for any acknowledgement
+TELEMETRY_WRITE_CONCERN_W = int(os.environ.get('TELEMETRY_WRITE_CONCERN_W', 1))
+MONGO_SLOW_COMMAND_MS = float(os.environ.get('MONGO_SLOW_COMMAND_MS', 100))
+# Fail startup if a registered hot query would run a collection scan
+MONGO_INDEX_CHECK = os.environ.get('MONGO_INDEX_CHECK', 'false').lower() == 'true'
+# Read-through document cache configuration (core_data.read_one with use_cache=True)
+DOCUMENT_CACHE_MAX_SIZE = int(os.environ.get('DOCUMENT_CACHE_MAX_SIZE', 10000))
+DOCUMENT_CACHE_TTL_SECONDS = float(os.environ.get('DOCUMENT_CACHE_TTL_SECONDS', 30))
+# Cached total counts of paginated aggregations (CountStrategy.CACHED)
+COUNT_CACHE_MAX_SIZE = int(os.environ.get('COUNT_CACHE_MAX_SIZE', 1000))
+COUNT_CACHE_TTL_SECONDS = float(os.environ.get('COUNT_CACHE_TTL_SECONDS', 60))
+# Guard of user supplied filters (read_many/read_page/update_many with guard=True): rejects collection and whole index scans over QUERY_GUARD_MAX_DOCS_EXAMINED
+# documents and stops guarded reads and updates after QUERY_GUARD_MAX_TIME_MS. Query plans are cached per filter shape for QUERY_PLAN_CACHE_TTL_SECONDS.
+QUERY_GUARD_ENABLED = os.environ.get('QUERY_GUARD_ENABLED', 'true').lower() == 'true'
+QUERY_GUARD_MAX_DOCS_EXAMINED = int(os.environ.get('QUERY_GUARD_MAX_DOCS_EXAMINED', 10000))
+QUERY_GUARD_MAX_TIME_MS = int(os.environ.get('QUERY_GUARD_MAX_TIME_MS', 2000))
+QUERY_PLAN_CACHE_MAX_SIZE = int(os.environ.get('QUERY_PLAN_CACHE_MAX_SIZE', 1000))
+QUERY_PLAN_CACHE_TTL_SECONDS = float(os.environ.get('QUERY_PLAN_CACHE_TTL_SECONDS', 600))
+# Share one in-flight read among identical concurrent read_one/query_read calls
+SINGLE_FLIGHT_ENABLED = os.environ.get('SINGLE_FLIGHT_ENABLED', 'true').lower() == 'true'
+# Batch concurrent read_one calls by _id into one $in query, a window of 0 batches the calls of one event loop iteration
+BATCH_LOADER_ENABLED = os.environ.get('BATCH_LOADER_ENABLED', 'true').lower() == 'true'
+BATCH_LOADER_WINDOW_MS = float(os.environ.get('BATCH_LOADER_WINDOW_MS', 0))
+BATCH_LOADER_MAX_BATCH_SIZE = int(os.environ.get('BATCH_LOADER_MAX_BATCH_SIZE', 100))
+# core_data.bulk_write splits operations into chunks of at most this many operations and bytes, running up to BULK_WRITE_CONCURRENCY unordered chunks at once
+BULK_WRITE_CHUNK_SIZE = int(os.environ.get('BULK_WRITE_CHUNK_SIZE', 1000))
+BULK_WRITE_CHUNK_BYTES = int(os.environ.get('BULK_WRITE_CHUNK_BYTES', 8 * 1024 * 1024))
+BULK_WRITE_CONCURRENCY = int(os.environ.get('BULK_WRITE_CONCURRENCY', 4))
+# core_data.run_transaction retries transient transaction errors and unknown commit results for this long
+TRANSACTION_RETRY_SECONDS = float(os.environ.get('TRANSACTION_RETRY_SECONDS', 120))
+# Rows validated and written per transaction by the bulk user import
+# User searches rank at most this many matching users by relevance, the ranking sorts them in memory
+SEARCH_CANDIDATE_LIMIT = int(os.environ.get('SEARCH_CANDIDATE_LIMIT', 1000))
+USER_IMPORT_CHUNK_SIZE = int(os.environ.get('USER_IMPORT_CHUNK_SIZE', 500))
+# Write-behind buffer for fire-and-forget updates (request tracker, last active, last login)
+WRITE_BEHIND_FLUSH_INTERVAL_SECONDS = float(os.environ.get('WRITE_BEHIND_FLUSH_INTERVAL_SECONDS', 1))
+WRITE_BEHIND_MAX_BATCH_SIZE = int(os.environ.get('WRITE_BEHIND_MAX_BATCH_SIZE', 500))
+WRITE_BEHIND_MAX_PENDING = int(os.environ.get('WRITE_BEHIND_MAX_PENDING', 50000))
+# Cursor batch size of streaming reads (core_data.stream_many / stream_query)
+STREAM_BATCH_SIZE = int(os.environ.get('STREAM_BATCH_SIZE', 500))
+# core_data.read_changes holds back documents updated within this window, writes stamped earlier may still be committing
+CHANGES_SAFETY_WINDOW_SECONDS = int(os.environ.get('CHANGES_SAFETY_WINDOW_SECONDS', 5))
+# request_tracker rows not updated for this many days are moved to gzip NDJSON archives under ARCHIVE_DIR every COMPACTION_INTERVAL_SECONDS, an interval of 0 disables the job
+REQUEST_TRACKER_RETENTION_DAYS = int(os.environ.get('REQUEST_TRACKER_RETENTION_DAYS', 30))
+COMPACTION_INTERVAL_SECONDS = int(os.environ.get('COMPACTION_INTERVAL_SECONDS', 3600))
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', 'archives')
 # AWS service configuration
 AWS_REGION = os.environ.get('AWS_REGION', 'ap-test')
 AWS_ACCESS_ID = os.environ.get('AWS_ACCESS_ID', 'dummy')
@@ -0,0 +1,104 @@
+import asyncio
+import copy
+from typing import Any, Optional
+
+from app.server.config import config
+from app.server.database import profiles
+from app.server.static.enums import ReadProfile
+from app.server.utils import query_utils
+
+
+class _Batch:
+    def __init__(self, collection_name: str, options: Optional[dict[str, Any]], read_profile: Optional[ReadProfile]) -> None:
+        self.collection_name = collection_name
+        self.options = options
+        self.read_profile = read_profile
+        self.waiters: dict[tuple[str, Any], tuple[Any, list[asyncio.Future]]] = {}
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class BatchLoader:
+    """Collects the `_id` lookups issued within `window` seconds and reads each collection and projection with a single
+    find({'_id': {'$in': [...]}}). A window of 0 batches the lookups made in the same event loop iteration.
+
+    Callers asking for the same _id share the read and receive their own copy of the document.
+    """
+
+    def __init__(self, window: float, max_batch_size: int, enabled: bool = True) -> None:
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.enabled = enabled
+        self._batches: dict[str, _Batch] = {}
+        self.calls = 0
+        self.batches = 0
+        self.documents = 0
+
+    async def load(self, collection_name: str, document_id: Any, options: Optional[dict[str, Any]] = None, read_profile: Optional[ReadProfile] = None) -> Optional[dict[str, Any]]:
+        """Reads a document by _id as part of the next batch of its collection and projection
+
+        Args:
+            collection_name (str): collection name
+            document_id (Any): _id of the document
+            options (dict, optional): projection, lookups with different projections are batched separately
+            read_profile (ReadProfile, optional): read preference, lookups with different profiles are batched separately
+
+        Returns:
+            Optional[dict]: document, None if it does not exist
+        """
+        self.calls += 1
+        batch_key = query_utils.get_query_key(collection_name, options, read_profile)
+        batch = self._batches.get(batch_key)
+        if batch is None:
+            batch = self._batches[batch_key] = _Batch(collection_name, options, read_profile)
+            loop = asyncio.get_running_loop()
+            if self.window > 0:
+                batch.timer = loop.call_later(self.window, self._dispatch, batch_key)
+            else:
+                batch.timer = loop.call_soon(self._dispatch, batch_key)
+
+        future = asyncio.get_running_loop().create_future()
+        # 1 and '1' are different _ids, the type keeps them apart
+        _, waiters = batch.waiters.setdefault((type(document_id).__name__, document_id), (document_id, []))
+        waiters.append(future)
+        if len(batch.waiters) >= self.max_batch_size:
+            batch.timer.cancel()
+            self._dispatch(batch_key)
+        return await future
+
+    def _dispatch(self, batch_key: str) -> None:
+        batch = self._batches.pop(batch_key, None)
+        if batch is not None:
+            asyncio.ensure_future(self._fetch(batch))
+
+    async def _fetch(self, batch: _Batch) -> None:
+        self.batches += 1
+        projection = dict(batch.options) if batch.options else None
+        # _id is needed to fan the documents out, it is removed again below when the projection excludes it
+        exclude_id = bool(projection) and not projection.get('_id', 1)
+        if exclude_id:
+            del projection['_id']
+        ids = [document_id for document_id, _ in batch.waiters.values()]
+        try:
+            documents = await profiles.get_read_collection(batch.collection_name, batch.read_profile).find({'_id': {'$in': ids}}, projection or None).to_list(None)
+        except Exception as error:  # pylint: disable=broad-except
+            for _, waiters in batch.waiters.values():
+                for future in waiters:
+                    if not future.done():
+                        future.set_exception(error)
+            return
+
+        self.documents += len(documents)
+        found = {(type(document['_id']).__name__, document['_id']): document for document in documents}
+        for key, (_, waiters) in batch.waiters.items():
+            document = found.get(key)
+            if document is not None and exclude_id:
+                document.pop('_id')
+            for index, future in enumerate(waiters):
+                if not future.done():
+                    future.set_result(document if index == 0 or document is None else copy.deepcopy(document))
+
+    def stats(self) -> dict[str, Any]:
+        return {'calls': self.calls, 'batches': self.batches, 'documents': self.documents, 'pending_batches': len(self._batches)}
+
+
+batch_loader = BatchLoader(config.BATCH_LOADER_WINDOW_MS / 1000, config.BATCH_LOADER_MAX_BATCH_SIZE, config.BATCH_LOADER_ENABLED)
@@ -0,0 +1,130 @@
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from app.server.config import config
+from app.server.database.single_flight import read_flight
+
+
+class LRUCache:
+    """Bounded in-process cache with least-recently-used eviction and per-entry expiry
+
+    Every `clear` bumps the cache generation. A reader that captured the generation before going to the
+    database can pass it back to `set` so a value fetched before an invalidation is never stored after it.
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        """
+        Args:
+            max_size (int): maximum number of entries kept before the least recently used one is evicted
+            ttl (float): default entry lifetime in seconds
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the cached value or None when the key is missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, generation: Optional[int] = None) -> None:
+        """Stores a value, evicting the least recently used entries when the cache is full
+
+        Args:
+            key (str): cache key
+            value (Any): value to be cached
+            ttl (float, optional): entry lifetime in seconds. Defaults to the cache ttl.
+            generation (int, optional): generation captured before the value was fetched. The value is dropped if the cache was cleared since.
+        """
+        if self.max_size <= 0 or (generation is not None and generation != self.generation):
+            return
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.generation += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+# read-through document caches used by core_data.read_one, one per collection
+document_caches: dict[str, LRUCache] = {}
+
+
+def get_document_cache(collection_name: str) -> LRUCache:
+    if collection_name not in document_caches:
+        document_caches[collection_name] = LRUCache(config.DOCUMENT_CACHE_MAX_SIZE, config.DOCUMENT_CACHE_TTL_SECONDS)
+    return document_caches[collection_name]
+
+
+def invalidate_collection(collection_name: str) -> None:
+    """Drops every cached document of a collection and its reads in flight. Called by core_data after each write on that collection."""
+    read_flight.forget(collection_name)
+    if collection_name in document_caches:
+        document_caches[collection_name].clear()
+
+
+# total counts of paginated aggregations keyed by pipeline fingerprint. Entries are not invalidated by writes,
+# the ttl bounds how stale a cached total can be.
+count_cache = LRUCache(config.COUNT_CACHE_MAX_SIZE, config.COUNT_CACHE_TTL_SECONDS)
+
+
+# query plan cost estimates of query_guard keyed by collection and filter shape, cleared when indexes are created
+plan_cache = LRUCache(config.QUERY_PLAN_CACHE_MAX_SIZE, config.QUERY_PLAN_CACHE_TTL_SECONDS)
+
+# verified claims of JWTs keyed by token digest, every entry expires with its token
+claims_cache = LRUCache(config.JWT_CLAIMS_CACHE_MAX_SIZE, 0)
+
+# users of access tokens resolved by token_util.JWTAuthUser keyed by token digest
+auth_user_cache = LRUCache(config.AUTH_USER_CACHE_MAX_SIZE, config.AUTH_USER_CACHE_TTL_SECONDS)
+
+
+def get_cache_stats() -> dict[str, Any]:
+    """Returns hit/miss/eviction counters of the document cache of every collection, of the count, plan, JWT claims and auth user caches"""
+    return {
+        'documents': {collection_name: cache.stats() for collection_name, cache in document_caches.items()},
+        'counts': count_cache.stats(),
+        'plans': plan_cache.stats(),
+        'jwt_claims': claims_cache.stats(),
+        'auth_users': auth_user_cache.stats(),
+    }
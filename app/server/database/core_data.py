@@ -1,40 +1,111 @@
+import asyncio
+import contextlib
 import copy
-from typing import Any, Optional, Union
+import time
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, TypeVar, Union
 
 from bson.objectid import ObjectId
 from fastapi import HTTPException, status
 from fastapi.encoders import jsonable_encoder
 from motor.motor_asyncio import AsyncIOMotorClientSession
-from pymongo import UpdateOne
-from pymongo.errors import DuplicateKeyError
+from pymongo import DeleteMany, DeleteOne, InsertOne, UpdateOne, timeout
+from pymongo.errors import BulkWriteError, DuplicateKeyError, ExecutionTimeout, PyMongoError
 
+from app.server.config import config
+from app.server.database import cache, profiles, query_guard
+from app.server.database.batch_loader import batch_loader
 from app.server.database.db import client, mongo
+from app.server.database.single_flight import read_flight
 from app.server.models.core_data import CreateData
-from app.server.utils import date_utils
+from app.server.static.enums import CountStrategy, PaginationMode, ReadProfile, WriteProfile
+from app.server.utils import bulk_utils, date_utils, pagination_utils, query_utils
+
+T = TypeVar('T')
+# callbacks run after the writes of a collection, see register_write_hook
+_write_hooks: dict[str, list[Callable[[str, Optional[set[str]]], None]]] = {}
 
 # crud operations
 
 
+_NATIVE_SCALARS = (str, int, float, bool, type(None))
+# top level fields kept as BSON dates for their TTL indexes, every other datetime is encoded by jsonable_encoder
+_DATE_FIELDS = ('expires_at',)
+# marks a value the fast path cannot encode like jsonable_encoder
+_NOT_NATIVE = object()
+
+
+def _copy_native(value: Any) -> Any:
+    """Copies a JSON-native value, returns _NOT_NATIVE if it holds anything else (ObjectId, Enum, datetime, tuple, ...)"""
+    value_type = type(value)
+    if value_type in _NATIVE_SCALARS:
+        return value
+    if value_type is dict:
+        copied = {}
+        for key, item in value.items():
+            copied[key] = _copy_native(item)
+            if copied[key] is _NOT_NATIVE or type(key) is not str:  # pylint: disable=unidiomatic-typecheck
+                return _NOT_NATIVE
+        return copied
+    if value_type is list:
+        copied_list = [_copy_native(item) for item in value]
+        return _NOT_NATIVE if any(item is _NOT_NATIVE for item in copied_list) else copied_list
+    return _NOT_NATIVE
+
+
+def _prepare_document(data: dict[str, Any], timestamp: int) -> dict[str, Any]:
+    """
+    Prepare a document for insertion: stamps _id, created_at, updated_at and is_deleted.
+    JSON-native documents are stamped directly, anything the fast path cannot reproduce exactly
+    goes through CreateData validation and jsonable_encoder. Datetimes in the _DATE_FIELDS are stored as dates either way.
+
+    Args:
+        data (dict): The document to insert.
+        timestamp (int): The timestamp used for missing created_at and updated_at.
+
+    Returns:
+        dict: A new document ready to be inserted.
+    """
+    dates = {field: data[field] for field in _DATE_FIELDS if isinstance(data.get(field), datetime)}
+    document = _copy_native({key: value for key, value in data.items() if key not in dates} if dates else data)
+    document_id = data.get('_id')
+    if (
+        document is _NOT_NATIVE
+        or 'id' in data
+        or (document_id is not None and not (type(document_id) is str and ObjectId.is_valid(document_id)))  # pylint: disable=unidiomatic-typecheck
+        or type(data.get('is_deleted', False)) is not bool  # pylint: disable=unidiomatic-typecheck
+        or not all(data.get(field) is None or type(data[field]) is int for field in ('created_at', 'updated_at'))  # pylint: disable=unidiomatic-typecheck
+    ):
+        return {**jsonable_encoder(CreateData.parse_obj(data)), **dates}
+
+    document['_id'] = document_id or str(ObjectId())
+    document['created_at'] = document.get('created_at') or timestamp
+    document['updated_at'] = document.get('updated_at') or timestamp
+    document.setdefault('is_deleted', False)
+    document.update(dates)
+    return document
+
+
 def _prepare_update(update: dict[str, Any], timestamp: int) -> dict[str, Any]:
     """
     Prepare an update dictionary by adding a '$set' key if it doesn't exist,
     and updating the 'updated_at' field with the provided timestamp.
+    The given update is not modified, only the '$set' level is copied.
 
     Args:
         update (dict): The update dictionary.
         timestamp (int): The timestamp to update the 'updated_at' field with.
 
     Returns:
-        dict: The modified update dictionary.
+        dict: The prepared update dictionary.
     """
-    update.setdefault('$set', {})
-    update['$set'].update({'updated_at': timestamp})
-    return update
+    return {**update, '$set': {**update.get('$set', {}), 'updated_at': timestamp}}
 
 
 def _prepare_upsert(update: dict[str, Any], timestamp: int) -> dict[str, Any]:
     """
     Generate a dictionary update for upsert operations.
+    The given update is not modified, only the '$setOnInsert' level is copied.
 
     Args:
         update (dict): The dictionary update.
@@ -43,25 +114,139 @@ def _prepare_upsert(update: dict[str, Any], timestamp: int) -> dict[str, Any]:
     Returns:
         dict: The updated dictionary.
     """
-    update.setdefault('$setOnInsert', {})
-    update['$setOnInsert'].update({'_id': str(ObjectId()), 'created_at': timestamp})
+    set_on_insert = {**update.get('$setOnInsert', {}), '_id': str(ObjectId()), 'created_at': timestamp}
 
     if 'is_deleted' not in update['$set']:
-        update['$setOnInsert'].update({'is_deleted': False})
+        set_on_insert['is_deleted'] = False
+
+    return {**update, '$setOnInsert': set_on_insert}
 
-    return update
+
+def register_write_hook(collection_name: str, hook: Callable[[str, Optional[set[str]]], None]) -> None:
+    """Registers a callback run after every write on a collection, e.g. to drop a cache derived from its documents.
+    The callback receives the operation (insert, update or delete) and, for updates, the top-level fields written or None when unknown.
+
+    Args:
+        collection_name (str): collection name
+        hook (Callable): callback taking the operation and the updated fields
+    """
+    _write_hooks.setdefault(collection_name, []).append(hook)
+
+
+def _get_updated_fields(update: Any) -> Optional[set[str]]:
+    if not isinstance(update, dict):
+        # aggregation pipeline update
+        return None
+    if not any(key.startswith('$') for key in update):
+        # replacement document
+        return set(update)
+    return {field.split('.')[0] for fields in update.values() if isinstance(fields, dict) for field in fields}
+
+
+def _run_write_hooks(collection_name: str, operation: str, fields: Optional[set[str]] = None) -> None:
+    for hook in _write_hooks.get(collection_name, ()):
+        hook(operation, fields)
+
+
+def _run_bulk_write_hooks(collection_name: str, operations: list[Any]) -> None:
+    if collection_name not in _write_hooks:
+        return
+    inserted = deleted = updated = False
+    fields: Optional[set[str]] = set()
+    for operation in operations:
+        if isinstance(operation, InsertOne):
+            inserted = True
+        elif isinstance(operation, (DeleteOne, DeleteMany)):
+            deleted = True
+        else:
+            updated = True
+            operation_fields = _get_updated_fields(getattr(operation, '_doc', None))
+            fields = None if fields is None or operation_fields is None else fields | operation_fields
+    if inserted:
+        _run_write_hooks(collection_name, 'insert')
+    if updated:
+        _run_write_hooks(collection_name, 'update', fields)
+    if deleted:
+        _run_write_hooks(collection_name, 'delete')
 
 
 async def get_session() -> AsyncIOMotorClientSession:
     return await client.start_session()
 
 
-async def create_one(collection_name: str, data: dict[str, Any], options: dict[str, Any] = None, session: AsyncIOMotorClientSession = None) -> dict[str, Any]:
+@contextlib.asynccontextmanager
+async def causal_session() -> AsyncIterator[AsyncIOMotorClientSession]:
+    """Causally consistent session for read-your-writes flows: reads passed this session observe the writes made
+    with it before, even when the read profile routes them to a secondary"""
+    async with await client.start_session(causal_consistency=True) as session:
+        yield session
+
+
+def _has_error_label(error: BaseException, label: str) -> bool:
+    """Checks the error labels of a driver error, also when core_data re-raised it as an HTTPException"""
+    while error is not None:
+        if isinstance(error, PyMongoError) and error.has_error_label(label):
+            return True
+        error = error.__cause__
+    return False
+
+
+async def run_transaction(callback: Callable[[AsyncIOMotorClientSession], Awaitable[T]], timeout: Optional[float] = None) -> T:
+    """Runs `callback(session)` in a transaction and commits it. The whole transaction is retried while it fails with a
+    TransientTransactionError (write conflicts, primary elections) and the commit alone while its outcome is unknown
+    (UnknownTransactionCommitResult), until `timeout` seconds have passed. The callback may run more than once.
+
+    Args:
+        callback (Callable): coroutine function receiving the session, its writes must pass the session
+        timeout (float, optional): seconds to keep retrying. Defaults to TRANSACTION_RETRY_SECONDS.
+
+    Returns:
+        T: return value of the callback of the committed attempt
+    """
+    deadline = time.monotonic() + (config.TRANSACTION_RETRY_SECONDS if timeout is None else timeout)
+    async with await get_session() as session:
+        while True:
+            session.start_transaction()
+            try:
+                result = await callback(session)
+            except BaseException as error:
+                if session.in_transaction:
+                    await session.abort_transaction()
+                if _has_error_label(error, 'TransientTransactionError') and time.monotonic() < deadline:
+                    continue
+                raise
+
+            while True:
+                try:
+                    await session.commit_transaction()
+                    return result
+                except PyMongoError as error:
+                    # a commit that ran out of time must not be retried, it could commit twice
+                    if error.has_error_label('UnknownTransactionCommitResult') and getattr(error, 'code', None) != 50 and time.monotonic() < deadline:
+                        continue
+                    if error.has_error_label('TransientTransactionError') and time.monotonic() < deadline:
+                        break
+                    raise
+
+
+# pylint: disable=too-many-arguments
+async def create_one(
+    collection_name: str,
+    data: dict[str, Any],
+    options: dict[str, Any] = None,
+    session: AsyncIOMotorClientSession = None,
+    reread: bool = False,
+    write_profile: Optional[WriteProfile] = None,
+) -> dict[str, Any]:
     """Insert one operation on database
 
     Args:
         collection_name (str): collection name
         data (dict): document to be inserted
+        options (dict): dictionary of fields with value 1 or 0. 1 - to select, 0 - de-select
+        reread (bool): read the document back from the database instead of returning the prepared document,
+            only needed when the server adds to what was inserted
+        write_profile (WriteProfile, optional): write concern of the insert, defaults to the client write concern
 
     Raises:
         CustomException: custom exception if document insertion fails
@@ -69,20 +254,22 @@ async def create_one(collection_name: str, data: dict[str, Any], options: dict[s
     Returns:
         dict[str, Any]: inserted document
     """
-    collection = mongo.get_collection(collection_name)
-    data = CreateData.parse_obj(data)
-    data = jsonable_encoder(data)
+    collection = profiles.get_write_collection(collection_name, write_profile, session)
+    data = _prepare_document(data, date_utils.get_current_timestamp())
     model = None
     try:
         model = await collection.insert_one(data, session=session)
+        cache.invalidate_collection(collection_name)
+        _run_write_hooks(collection_name, 'insert')
     except DuplicateKeyError as error:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f'{collection_name}: + {error.details}') from error
     if not model.inserted_id:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f'{collection_name}: Failed to create')
     if session:
         return {'_id': model.inserted_id}
-    model = await collection.find_one({'_id': model.inserted_id}, options)
-    return model
+    if reread:
+        return await collection.find_one({'_id': model.inserted_id}, options or None)
+    return query_utils.apply_projection(data, options)
 
 
 async def create_many(collection_name: str, data: list[dict[str, Any]], session: AsyncIOMotorClientSession = None) -> dict[str, Any]:
@@ -99,25 +286,60 @@ async def create_many(collection_name: str, data: list[dict[str, Any]], session:
         dict[str, Any]: dictionary with createdCount
     """
     collection = mongo.get_collection(collection_name)
-    data = [CreateData.parse_obj(indi_data) for indi_data in data]
-    data = jsonable_encoder(data)
+    timestamp = date_utils.get_current_timestamp()
+    data = [_prepare_document(indi_data, timestamp) for indi_data in data]
     model = None
     try:
         model = await collection.insert_many(data, session=session)
     except Exception as error:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f'{collection_name}: + {str(error)}') from error
+    finally:
+        cache.invalidate_collection(collection_name)
+        _run_write_hooks(collection_name, 'insert')
     if not model.inserted_ids:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f'{collection_name}: Failed to create')
     return {'ids': model.inserted_ids}
 
 
-async def read_one(collection_name: str, data_filter: Union[dict[str, Any], str], options: dict[str, Any] = None) -> dict[str, Any]:
+def _is_id_lookup(data_filter: Union[dict[str, Any], str]) -> bool:
+    return isinstance(data_filter, dict) and list(data_filter) == ['_id'] and not isinstance(data_filter['_id'], (dict, list))
+
+
+async def _find_one(
+    collection_name: str, data_filter: Union[dict[str, Any], str], options: Optional[dict[str, Any]], read_profile: Optional[ReadProfile], session: AsyncIOMotorClientSession
+) -> Optional[dict[str, Any]]:
+    """find_one shared with concurrent callers: plain _id lookups are batched by the batch loader, other filters are single-flighted.
+    Reads made within a session are not shared."""
+    collection = profiles.get_read_collection(collection_name, read_profile, session)
+    if session is not None:
+        return await collection.find_one(data_filter, options, session=session)
+    read_profile = profiles.get_read_profile(collection_name, read_profile)
+    if batch_loader.enabled and _is_id_lookup(data_filter):
+        return await batch_loader.load(collection_name, data_filter['_id'], options, read_profile)
+    flight_key = query_utils.get_query_key('read_one', collection_name, data_filter, options, read_profile)
+    return await read_flight.do(flight_key, lambda: collection.find_one(data_filter, options), collection_name)
+
+
+# pylint: disable=too-many-arguments
+async def read_one(
+    collection_name: str,
+    data_filter: Union[dict[str, Any], str],
+    options: dict[str, Any] = None,
+    use_cache: bool = False,
+    read_profile: Optional[ReadProfile] = None,
+    session: AsyncIOMotorClientSession = None,
+) -> dict[str, Any]:
     """Read One operation on database
 
     Args:
         collection_name (str): collection name
         data_filter (dict): dictionary of fields to apply filter for
         options (dict): dictionary of fields with value 1 or 0. 1 - to select, 0 - de-select
+        use_cache (bool): serve the document from the per-collection LRU/TTL cache, which is invalidated by every write on the collection made by this process.
+            Writes of other workers show after the ttl, so reads deciding authentication or authorization must not use it.
+            Concurrent reads share round trips either way: {'_id': x} lookups are batched by batch_loader, identical filters share one read_flight.
+        read_profile (ReadProfile, optional): read preference of this read, defaults to the collection profile from MONGO_READ_PROFILES
+        session (AsyncIOMotorClientSession, optional): session to read with, e.g. a causal_session for read-your-writes
 
     Raises:
         CustomException: custom exception if document not found
@@ -125,16 +347,37 @@ async def read_one(collection_name: str, data_filter: Union[dict[str, Any], str]
     Returns:
         dict[str, Any]: document
     """
-    collection = mongo.get_collection(collection_name)
     if not options:
         options = None
-    model = await collection.find_one(data_filter, options)
-    return model or {}
+    if not use_cache:
+        model = await _find_one(collection_name, data_filter, options, read_profile, session)
+        return model or {}
+
+    document_cache = cache.get_document_cache(collection_name)
+    # a secondary read must not serve a later primary read, the profile is resolved so equivalent reads share their entry
+    cache_key = query_utils.get_query_key(data_filter, options, profiles.get_read_profile(collection_name, read_profile, session))
+    if (model := document_cache.get(cache_key)) is not None:
+        return copy.deepcopy(model)
+    generation = document_cache.generation
+    model = await _find_one(collection_name, data_filter, options, read_profile, session)
+    if not model:
+        # misses are not cached so a document created by another worker is visible immediately
+        return {}
+    document_cache.set(cache_key, model, generation=generation)
+    return copy.deepcopy(model)
 
 
 # pylint: disable=too-many-arguments
 async def read_many(
-    collection_name: str, data_filter: dict[str, Any], options: dict[str, Any] = None, sort: dict[str, Any] = None, page: Optional[int] = None, page_size: Optional[int] = None
+    collection_name: str,
+    data_filter: dict[str, Any],
+    options: dict[str, Any] = None,
+    sort: dict[str, Any] = None,
+    page: Optional[int] = None,
+    page_size: Optional[int] = None,
+    read_profile: Optional[ReadProfile] = None,
+    session: AsyncIOMotorClientSession = None,
+    guard: bool = False,
 ) -> list[dict[str, Any]]:
     """Read many operation on database
 
@@ -142,17 +385,31 @@ async def read_many(
         collection_name (str): collection name
         data_filter (dict): dictionary of fields to apply filter for
         options (dict): dictionary of fields with value 1 or 0. 1 - to select, 0 - de-select
+        read_profile (ReadProfile, optional): read preference of this read, defaults to the collection profile
+        session (AsyncIOMotorClientSession, optional): session to read with
+        guard (bool, optional): checks the cost of a user supplied filter with query_guard and stops the read after QUERY_GUARD_MAX_TIME_MS
+
+    Raises:
+        HTTPException: custom exception if the guarded filter is too expensive or runs out of time
 
     Returns:
         list[dict[str, Any]]: document list
     """
-    collection = mongo.get_collection(collection_name)
+    collection = profiles.get_read_collection(collection_name, read_profile, session)
     model_list = []
 
     if not options:
         options = None
 
-    models = collection.find(data_filter, options)
+    if guard:
+        # a page reads the documents of the pages before it too
+        limit = page_size * max(page or 1, 1) if page_size and page_size > 0 else None
+        await query_guard.check_filter(collection_name, data_filter, sort=sort, limit=limit)
+
+    models = collection.find(data_filter, options, session=session)
+
+    if guard:
+        models.max_time_ms(config.QUERY_GUARD_MAX_TIME_MS)
 
     if sort:
         sort_query = list(sort.items())
@@ -165,11 +422,190 @@ async def read_many(
     if page_size and page_size > 0:
         models.limit(page_size)
 
-    async for model in models:
-        model_list.append(model)
+    try:
+        async for model in models:
+            model_list.append(model)
+    except ExecutionTimeout as error:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f'{collection_name}: query exceeded {config.QUERY_GUARD_MAX_TIME_MS} ms, narrow the filter') from error
     return model_list
 
 
+# pylint: disable=too-many-arguments
+async def stream_many(
+    collection_name: str,
+    data_filter: dict[str, Any],
+    options: dict[str, Any] = None,
+    sort: dict[str, Any] = None,
+    limit: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    read_profile: Optional[ReadProfile] = None,
+) -> AsyncIterator[dict[str, Any]]:
+    """Streaming read many operation on database. Documents are yielded as the cursor fetches them in batches,
+    so memory use does not grow with the size of the result set.
+
+    Args:
+        collection_name (str): collection name
+        data_filter (dict): dictionary of fields to apply filter for
+        options (dict): dictionary of fields with value 1 or 0. 1 - to select, 0 - de-select
+        sort (dict): sort spec
+        limit (int, optional): maximum number of documents
+        batch_size (int, optional): number of documents per cursor batch. Defaults to STREAM_BATCH_SIZE.
+        read_profile (ReadProfile, optional): read preference of this read, defaults to the collection profile
+
+    Yields:
+        dict[str, Any]: document
+    """
+    collection = profiles.get_read_collection(collection_name, read_profile)
+    models = collection.find(data_filter, options or None, batch_size=batch_size or config.STREAM_BATCH_SIZE)
+    if sort:
+        models.sort(list(sort.items()))
+    if limit:
+        models.limit(limit)
+    async for model in models:
+        yield model
+
+
+async def stream_query(
+    collection_name: str, aggregate: list[dict[str, Any]], batch_size: Optional[int] = None, allow_disk_use: bool = False, read_profile: Optional[ReadProfile] = None
+) -> AsyncIterator[dict[str, Any]]:
+    """Streaming aggregation read operation on database, see `stream_many`
+
+    Args:
+        collection_name (str): collection name
+        aggregate (list): aggregation pipeline
+        batch_size (int, optional): number of documents per cursor batch. Defaults to STREAM_BATCH_SIZE.
+        allow_disk_use (bool): let blocking stages such as $sort spill to disk instead of failing on the memory limit
+        read_profile (ReadProfile, optional): read preference of this read, defaults to the collection profile
+
+    Yields:
+        dict[str, Any]: document
+    """
+    collection = profiles.get_read_collection(collection_name, read_profile)
+    async for model in collection.aggregate(aggregate, allowDiskUse=allow_disk_use, batchSize=batch_size or config.STREAM_BATCH_SIZE):
+        yield model
+
+
+# pylint: disable=too-many-arguments
+async def read_page(
+    collection_name: str,
+    data_filter: dict[str, Any],
+    options: dict[str, Any] = None,
+    sort: dict[str, Any] = None,
+    page_size: Optional[int] = None,
+    cursor: Optional[str] = None,
+    last_id: Optional[str] = None,
+    read_profile: Optional[ReadProfile] = None,
+    session: AsyncIOMotorClientSession = None,
+    guard: bool = False,
+) -> dict[str, Any]:
+    """Keyset (cursor) paginated read operation on database. Every page costs the same index seek regardless of its depth.
+
+    Args:
+        collection_name (str): collection name
+        data_filter (dict): dictionary of fields to apply filter for
+        options (dict): dictionary of fields with value 1 or 0. 1 - to select, 0 - de-select
+        sort (dict): sort spec, `_id` is appended as the tie breaker. Defaults to _id ascending.
+        page_size (int, optional): number of documents per page, capped at 100
+        cursor (str, optional): next_cursor/prev_cursor from the metadata of the previous page
+        last_id (str, optional): _id of the last document already read (QueryData.lastId), used when no cursor is given
+        read_profile (ReadProfile, optional): read preference of this read, defaults to the collection profile
+        session (AsyncIOMotorClientSession, optional): session to read with
+        guard (bool, optional): checks the cost of a user supplied filter with query_guard and stops the read after QUERY_GUARD_MAX_TIME_MS
+
+    Raises:
+        HTTPException: custom exception if the cursor or lastId is invalid, or if the guarded filter is too expensive or runs out of time
+
+    Returns:
+        dict[str, Any]: page data and metadata with next/prev cursors
+    """
+    collection = profiles.get_read_collection(collection_name, read_profile, session)
+    page_size = pagination_utils.get_page_size(page_size)
+    sort_fields = pagination_utils.get_sort_fields(sort)
+    if guard:
+        await query_guard.check_filter(collection_name, data_filter, sort=pagination_utils.get_sort_spec(sort_fields), limit=page_size + 1)
+
+    if options:
+        # sort keys must be present in the documents to build the cursors
+        if any(value for field, value in options.items() if field != '_id'):
+            options = {**options, **{field: 1 for field, _ in sort_fields}}
+        else:
+            options = {field: value for field, value in options.items() if field not in dict(sort_fields)} or None
+    else:
+        options = None
+
+    direction = None
+    values = None
+    if cursor:
+        values, direction = pagination_utils.decode_cursor(cursor, sort_fields)
+    elif last_id:
+        last_document = await collection.find_one({'_id': last_id}, {field: 1 for field, _ in sort_fields}, session=session)
+        if not last_document:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f'{collection_name}: lastId not found')
+        values, direction = [pagination_utils.get_field_value(last_document, field) for field, _ in sort_fields], pagination_utils.CURSOR_NEXT
+
+    backward = direction == pagination_utils.CURSOR_PREV
+    if values is not None:
+        keyset_filter = pagination_utils.get_keyset_filter(sort_fields, values, backward=backward)
+        data_filter = {'$and': [data_filter, keyset_filter]} if data_filter else keyset_filter
+
+    models = collection.find(data_filter, options, session=session).sort(list(pagination_utils.get_sort_spec(sort_fields, backward).items())).limit(page_size + 1)
+    if guard:
+        models.max_time_ms(config.QUERY_GUARD_MAX_TIME_MS)
+    try:
+        documents = [model async for model in models]
+    except ExecutionTimeout as error:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f'{collection_name}: query exceeded {config.QUERY_GUARD_MAX_TIME_MS} ms, narrow the filter') from error
+    return pagination_utils.get_keyset_page(documents, sort_fields, page_size, direction)
+
+
+# pylint: disable=too-many-arguments
+async def read_changes(
+    collection_name: str,
+    data_filter: Optional[dict[str, Any]] = None,
+    options: dict[str, Any] = None,
+    since: Optional[int] = None,
+    cursor: Optional[str] = None,
+    page_size: Optional[int] = None,
+    read_profile: Optional[ReadProfile] = None,
+) -> dict[str, Any]:
+    """Reads the documents created, updated or soft deleted (is_deleted) after a change cursor, in (updated_at, _id) order.
+
+    Documents updated within the last CHANGES_SAFETY_WINDOW_SECONDS are held back: updated_at is stamped by the writer before the
+    write commits, so a slower concurrent write can still land behind a cursor that already passed its timestamp.
+
+    Args:
+        collection_name (str): collection name
+        data_filter (dict, optional): dictionary of fields to apply filter for
+        options (dict, optional): dictionary of fields with value 1 or 0. 1 - to select, 0 - de-select
+        since (int, optional): timestamp in milliseconds to read the changes after when no cursor is given, all documents otherwise
+        cursor (str, optional): next_cursor from the metadata of the previous call
+        page_size (int, optional): number of documents per page, capped at 100
+        read_profile (ReadProfile, optional): read preference of this read, defaults to the collection profile
+
+    Returns:
+        dict[str, Any]: changed documents and metadata with has_more and the next_cursor to poll with, the given cursor when nothing changed after it
+    """
+    sort = {'updated_at': 1}
+    settled = date_utils.get_timestamp(expires_delta=-timedelta(seconds=config.CHANGES_SAFETY_WINDOW_SECONDS))
+    updated_at_filter = {'$lte': settled}
+    if since is not None and not cursor:
+        updated_at_filter['$gt'] = since
+    changes_filter = {'updated_at': updated_at_filter}
+    if data_filter:
+        changes_filter = {'$and': [data_filter, changes_filter]}
+
+    page = await read_page(collection_name, changes_filter, options=options, sort=sort, page_size=page_size, cursor=cursor, read_profile=read_profile)
+    data = page['data']
+    next_cursor = cursor
+    if data:
+        next_cursor = pagination_utils.encode_cursor(data[-1], pagination_utils.get_sort_fields(sort), pagination_utils.CURSOR_NEXT)
+    elif not cursor:
+        # nothing changed up to the settled bound, the next poll starts there. A null _id sorts first, the documents stamped at the bound are read again
+        boundary = {'updated_at': settled if since is None else max(since, settled), '_id': None}
+        next_cursor = pagination_utils.encode_cursor(boundary, pagination_utils.get_sort_fields(sort), pagination_utils.CURSOR_NEXT)
+    return {'data': data, 'metadata': {'page_size': page['metadata']['page_size'], 'has_more': page['metadata']['has_next_page'], 'next_cursor': next_cursor}}
+
+
 # pylint: disable=too-many-arguments
 async def update_one(
     collection_name: str,
@@ -179,6 +615,7 @@ async def update_one(
     options: dict[str, Any] = None,
     upsert: bool = False,
     session: AsyncIOMotorClientSession = None,
+    write_profile: Optional[WriteProfile] = None,
 ) -> dict[str, Any]:  # pylint: disable=too-many-arguments
     """Find one and update operation on database
 
@@ -188,6 +625,7 @@ async def update_one(
         filter (dict): dictionary of fields to apply filter for
         update (dict): dictionary of field data to be updated
         options (dict): dictionary of fields with value 1 or 0. 1 - to select, 0 - de-select
+        write_profile (WriteProfile, optional): write concern of the update, defaults to the client write concern
 
     Raises:
         HTTPException: custom exception if filter dict is not set
@@ -197,7 +635,7 @@ async def update_one(
     Returns:
         dict[str, Any]: document
     """
-    collection = mongo.get_collection(collection_name)
+    collection = profiles.get_write_collection(collection_name, write_profile, session)
 
     if record_id:
         data_filter = {'_id': record_id}
@@ -208,8 +646,7 @@ async def update_one(
 
     timestamp = date_utils.get_current_timestamp()
 
-    update_data = copy.deepcopy(update)
-    update_data = _prepare_update(update_data, timestamp)
+    update_data = _prepare_update(update, timestamp)
 
     if upsert:
         update_data = _prepare_upsert(update_data, timestamp)
@@ -219,6 +656,8 @@ async def update_one(
 
     try:
         model = await collection.find_one_and_update(data_filter, update_data, options, upsert=upsert, return_document=True, session=session)
+        cache.invalidate_collection(collection_name)
+        _run_write_hooks(collection_name, 'update', _get_updated_fields(update_data))
     except DuplicateKeyError as error:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f'{collection_name}: {error.details}') from error
     if not model:
@@ -227,17 +666,29 @@ async def update_one(
     return model
 
 
-async def update_many(collection_name: str, data_filter: dict[str, Any], update: dict[str, Any], upsert: bool = False, session: AsyncIOMotorClientSession = None) -> dict[str, Any]:
+# pylint: disable=too-many-arguments
+async def update_many(
+    collection_name: str,
+    data_filter: dict[str, Any],
+    update: dict[str, Any],
+    upsert: bool = False,
+    session: AsyncIOMotorClientSession = None,
+    write_profile: Optional[WriteProfile] = None,
+    guard: bool = False,
+) -> dict[str, Any]:
     """Update Many operation on database
 
     Args:
         collection_name (str): collection name
         data_filter (dict): dictionary of fields to apply filter for
         update (dict): dictionary of field data to be updated
+        write_profile (WriteProfile, optional): write concern of the update, defaults to the client write concern
+        guard (bool, optional): checks the cost of a user supplied filter with query_guard and stops the update after QUERY_GUARD_MAX_TIME_MS
 
     Raises:
         HTTPException: custom exception if filter dict is not set
         HTTPException: custom exception if update dict is not set
+        HTTPException: custom exception if the guarded filter is too expensive or runs out of time
         HTTPException: custom exception if update fails
 
     Returns:
@@ -247,7 +698,10 @@ async def update_many(collection_name: str, data_filter: dict[str, Any], update:
         empty_param = 'update' if data_filter else 'data_filter'
         raise HTTPException(422, f'{collection_name}: {empty_param} param cannot be empty')
 
-    collection = mongo.get_collection(collection_name)
+    if guard:
+        await query_guard.check_filter(collection_name, data_filter)
+
+    collection = profiles.get_write_collection(collection_name, write_profile, session)
     timestamp = date_utils.get_current_timestamp()
 
     # Prepare update fields
@@ -258,9 +712,16 @@ async def update_many(collection_name: str, data_filter: dict[str, Any], update:
         update = _prepare_upsert(update, timestamp)
 
     try:
-        model = await collection.update_many(data_filter, update, upsert=upsert, session=session)
+        # update_many takes no max_time_ms, the client side timeout sends maxTimeMS with the command
+        with timeout(config.QUERY_GUARD_MAX_TIME_MS / 1000) if guard else contextlib.nullcontext():
+            model = await collection.update_many(data_filter, update, upsert=upsert, session=session)
     except Exception as error:
+        if guard and isinstance(error, PyMongoError) and error.timeout:
+            raise HTTPException(422, f'{collection_name}: update exceeded {config.QUERY_GUARD_MAX_TIME_MS} ms, narrow the filter') from error
         raise HTTPException(422, f'{collection_name}: Failed to update') from error
+    finally:
+        cache.invalidate_collection(collection_name)
+        _run_write_hooks(collection_name, 'update', _get_updated_fields(update))
 
     return {'modified_count': model.modified_count}
 
@@ -288,6 +749,8 @@ async def delete_one(collection_name: str, record_id: str = None, data_filter: d
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f'{collection_name}: filter params cannot be empty')
 
     model = await collection.find_one_and_delete(data_filter, session=session)
+    cache.invalidate_collection(collection_name)
+    _run_write_hooks(collection_name, 'delete')
 
     if not model:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f'{collection_name}: Failed to delete')
@@ -314,16 +777,19 @@ async def delete_many(collection_name: str, data_filter: dict[str, Any], session
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f'{collection_name}: filter cannot be empty')
 
     model = await collection.delete_many(data_filter, session=session)
+    cache.invalidate_collection(collection_name)
+    _run_write_hooks(collection_name, 'delete')
 
     return {'deleted_count': model.deleted_count}
 
 
-async def count(collection_name: str, data_filter: dict[str, Any], session: AsyncIOMotorClientSession = None) -> dict[str, Any]:
+async def count(collection_name: str, data_filter: dict[str, Any], session: AsyncIOMotorClientSession = None, read_profile: Optional[ReadProfile] = None) -> dict[str, Any]:
     """Count operation on database
 
     Args:
         collection_name (str): collection name
         data_filter (dict): dictionary of fields to apply filter for
+        read_profile (ReadProfile, optional): read preference of this read, defaults to the collection profile
 
     Raises:
         HTTPException: custom exception if filter dict is not set
@@ -331,54 +797,15 @@ async def count(collection_name: str, data_filter: dict[str, Any], session: Asyn
     Returns:
         dict[str, Any]: dictionary with count
     """
-    collection = mongo.get_collection(collection_name)
+    collection = profiles.get_read_collection(collection_name, read_profile, session)
 
     doc_count = await collection.count_documents(data_filter, session=session)
     return {'count': doc_count}
 
 
-async def query_read(collection_name: str, aggregate: list[dict[str, Any]], page: Optional[int] = None, page_size: Optional[int] = None, paging_data: bool = False):
-    collection = mongo.get_collection(collection_name)
-    page_size = min(page_size, 100) if page_size else 10
-    page = page or 1
-    skip = (page - 1) * page_size
-
-    if not aggregate:
-        aggregate = []
-
-    if paging_data:
-        aggregate += [
-            {'$facet': {'data': [{'$skip': skip}, {'$limit': page_size + 1}], 'total_count': [{'$count': 'total'}]}},
-            {
-                '$addFields': {
-                    'metadata': {
-                        'current_page': page,
-                        'page_size': page_size,
-                        'total_records': {'$ifNull': [{'$arrayElemAt': ['$total_count.total', 0]}, 0]},
-                        'has_next_page': {'$gt': [{'$size': '$data'}, page_size]},
-                    }
-                }
-            },
-            {'$project': {'data': {'$slice': ['$data', page_size]}, 'metadata': 1}},  # Limit the result size to page_size
-        ]
-        result = await collection.aggregate(aggregate).to_list(None)
-        return result[0]
-    aggregate += [{'$skip': skip}, {'$limit': page_size}]
-
-    return await collection.aggregate(aggregate).to_list(None)
-
-
-async def aggregate_pipeline(collection_name: str, aggregate: list[dict[str, Any]], page: Optional[int] = None, page_size: Optional[int] = None) -> list[dict[str, Any]]:
-    collection = mongo.get_collection(collection_name)
-    # model_list = []
-    page_size = min(page_size, 100) if page_size else 10
-    page = page or 1
+def _get_paging_stages(page: int, page_size: int) -> list[dict[str, Any]]:
     skip = (page - 1) * page_size
-
-    if not aggregate:
-        aggregate = []
-
-    aggregate += [
+    return [
         {'$facet': {'data': [{'$skip': skip}, {'$limit': page_size + 1}], 'total_count': [{'$count': 'total'}]}},
         {
             '$addFields': {
@@ -393,12 +820,193 @@ async def aggregate_pipeline(collection_name: str, aggregate: list[dict[str, Any
         {'$project': {'data': {'$slice': ['$data', page_size]}, 'metadata': 1}},  # Limit the result size to page_size
     ]
 
-    result = await collection.aggregate(aggregate).to_list(None)
-    return result[0]
 
+# stages that never change the number of documents flowing through a pipeline
+_COUNT_PRESERVING_STAGES = {'$sort', '$project', '$addFields', '$set', '$unset', '$lookup'}
 
-async def distinct(collection_name: str, field: str) -> dict[str, Any]:
-    collection = mongo.get_collection(collection_name)
+
+async def _count_total(
+    collection_name: str, aggregate: list[dict[str, Any]], count_strategy: CountStrategy, read_profile: Optional[ReadProfile] = None, session: AsyncIOMotorClientSession = None
+) -> Optional[int]:
+    """Counts the documents matched by a pipeline according to the count strategy
+
+    Args:
+        collection_name (str): collection name
+        aggregate (list): aggregation pipeline without the paging stages
+        count_strategy (CountStrategy): exact runs a $count, cached reuses an exact count for COUNT_CACHE_TTL_SECONDS,
+            estimated uses collection metadata when the pipeline has no filter (falls back to cached) and none skips counting
+
+    Returns:
+        Optional[int]: total records, None for CountStrategy.NONE
+    """
+    if count_strategy == CountStrategy.NONE:
+        return None
+    collection = profiles.get_read_collection(collection_name, read_profile, session)
+    # $sort never affects the count, leave it out of both the count pipeline and its fingerprint
+    count_pipeline = [stage for stage in aggregate if '$sort' not in stage]
+
+    if count_strategy == CountStrategy.ESTIMATED and all(next(iter(stage)) in _COUNT_PRESERVING_STAGES or stage == {'$match': {}} for stage in count_pipeline):
+        return await collection.estimated_document_count(session=session)
+
+    fingerprint = query_utils.get_pipeline_fingerprint(collection_name, count_pipeline)
+    if count_strategy != CountStrategy.EXACT and (total := cache.count_cache.get(fingerprint)) is not None:
+        return total
+
+    result = await collection.aggregate([*count_pipeline, {'$count': 'total'}], session=session).to_list(None)
+    total = result[0]['total'] if result else 0
+    cache.count_cache.set(fingerprint, total)
+    return total
+
+
+# pylint: disable=too-many-arguments
+async def _offset_aggregate(
+    collection_name: str,
+    aggregate: list[dict[str, Any]],
+    page: int,
+    page_size: int,
+    count_strategy: CountStrategy,
+    read_profile: Optional[ReadProfile] = None,
+    session: AsyncIOMotorClientSession = None,
+) -> dict[str, Any]:
+    """Reads one $skip/$limit page of an aggregation along with its metadata"""
+    collection = profiles.get_read_collection(collection_name, read_profile, session)
+    if count_strategy == CountStrategy.EXACT:
+        result = await collection.aggregate([*aggregate, *_get_paging_stages(page, page_size)], session=session).to_list(None)
+        return result[0]
+
+    documents, total_records = await asyncio.gather(
+        collection.aggregate([*aggregate, {'$skip': (page - 1) * page_size}, {'$limit': page_size + 1}], session=session).to_list(None),
+        _count_total(collection_name, aggregate, count_strategy, read_profile, session),
+    )
+    metadata = {'current_page': page, 'page_size': page_size, 'total_records': total_records, 'has_next_page': len(documents) > page_size}
+    return {'data': documents[:page_size], 'metadata': metadata}
+
+
+# pylint: disable=too-many-arguments
+async def _keyset_aggregate(
+    collection_name: str,
+    aggregate: list[dict[str, Any]],
+    page_size: int,
+    cursor: Optional[str],
+    sort: Optional[dict[str, Any]],
+    count_strategy: CountStrategy,
+    read_profile: Optional[ReadProfile] = None,
+    session: AsyncIOMotorClientSession = None,
+) -> dict[str, Any]:
+    """Reads one page of an aggregation by seeking past the sort key encoded in the cursor instead of skipping documents.
+    If `sort` is not given, a trailing $sort stage of the pipeline is used as the page order."""
+    collection = profiles.get_read_collection(collection_name, read_profile, session)
+    pipeline = list(aggregate)
+    if sort is None and pipeline and '$sort' in pipeline[-1]:
+        sort = pipeline.pop()['$sort']
+    sort_fields = pagination_utils.get_sort_fields(sort)
+    count_pipeline = list(pipeline)
+
+    direction = None
+    if cursor:
+        values, direction = pagination_utils.decode_cursor(cursor, sort_fields)
+        pipeline.append({'$match': pagination_utils.get_keyset_filter(sort_fields, values, backward=direction == pagination_utils.CURSOR_PREV)})
+    backward = direction == pagination_utils.CURSOR_PREV
+    pipeline += [{'$sort': pagination_utils.get_sort_spec(sort_fields, backward)}, {'$limit': page_size + 1}]
+
+    documents, total_records = await asyncio.gather(
+        collection.aggregate(pipeline, session=session).to_list(None), _count_total(collection_name, count_pipeline, count_strategy, read_profile, session)
+    )
+    page_data = pagination_utils.get_keyset_page(documents, sort_fields, page_size, direction)
+    if total_records is not None:
+        page_data['metadata']['total_records'] = total_records
+    return page_data
+
+
+# pylint: disable=too-many-arguments
+async def query_read(
+    collection_name: str,
+    aggregate: list[dict[str, Any]],
+    page: Optional[int] = None,
+    page_size: Optional[int] = None,
+    paging_data: bool = False,
+    pagination_mode: PaginationMode = PaginationMode.OFFSET,
+    cursor: Optional[str] = None,
+    sort: Optional[dict[str, Any]] = None,
+    count_strategy: Optional[CountStrategy] = None,
+    read_profile: Optional[ReadProfile] = None,
+    session: AsyncIOMotorClientSession = None,
+):
+    """Aggregation read operation on database. Identical concurrent calls share one execution, see single_flight.read_flight.
+
+    Args:
+        collection_name (str): collection name
+        aggregate (list): aggregation pipeline
+        page (int, optional): page number for offset pagination
+        page_size (int, optional): number of documents per page, capped at 100
+        paging_data (bool): return the page along with its metadata instead of a plain list
+        pagination_mode (PaginationMode): offset ($skip) or cursor (keyset seek on the sort fields plus _id) pagination.
+            Cursor mode always returns data with metadata holding next_cursor/prev_cursor.
+        cursor (str, optional): cursor returned in the metadata of the previous page, implies cursor mode
+        sort (dict, optional): keyset sort spec for cursor mode. Defaults to the trailing $sort stage of the pipeline.
+        count_strategy (CountStrategy, optional): how total_records is computed for paged results. Defaults to exact in offset mode and none in cursor mode.
+        read_profile (ReadProfile, optional): read preference of this read, defaults to the collection profile
+        session (AsyncIOMotorClientSession, optional): session to read with, reads within a session are not shared with concurrent callers
+
+    Returns:
+        list or dict: documents or page with metadata
+    """
+    collection = profiles.get_read_collection(collection_name, read_profile, session)
+    read_profile = profiles.get_read_profile(collection_name, read_profile, session)
+    page_size = pagination_utils.get_page_size(page_size)
+    page = page or 1
+
+    if not aggregate:
+        aggregate = []
+
+    flight_key = None if session else query_utils.get_query_key('query_read', collection_name, aggregate, page, page_size, paging_data, pagination_mode, cursor, sort, count_strategy, read_profile)
+
+    if cursor or pagination_mode == PaginationMode.CURSOR:
+        return await read_flight.do(
+            flight_key, lambda: _keyset_aggregate(collection_name, aggregate, page_size, cursor, sort, count_strategy or CountStrategy.NONE, read_profile, session), collection_name
+        )
+
+    if paging_data:
+        return await read_flight.do(
+            flight_key, lambda: _offset_aggregate(collection_name, aggregate, page, page_size, count_strategy or CountStrategy.EXACT, read_profile, session), collection_name
+        )
+    aggregate += [{'$skip': (page - 1) * page_size}, {'$limit': page_size}]
+
+    return await read_flight.do(flight_key, lambda: collection.aggregate(aggregate, session=session).to_list(None), collection_name)
+
+
+# pylint: disable=too-many-arguments
+async def aggregate_pipeline(
+    collection_name: str,
+    aggregate: list[dict[str, Any]],
+    page: Optional[int] = None,
+    page_size: Optional[int] = None,
+    pagination_mode: PaginationMode = PaginationMode.OFFSET,
+    cursor: Optional[str] = None,
+    sort: Optional[dict[str, Any]] = None,
+    count_strategy: Optional[CountStrategy] = None,
+    read_profile: Optional[ReadProfile] = None,
+    session: AsyncIOMotorClientSession = None,
+) -> dict[str, Any]:
+    """Paginated aggregation read operation on database, see `query_read` for the pagination, read profile and session arguments
+
+    Returns:
+        dict[str, Any]: page data with metadata
+    """
+    page_size = pagination_utils.get_page_size(page_size)
+    page = page or 1
+
+    if not aggregate:
+        aggregate = []
+
+    if cursor or pagination_mode == PaginationMode.CURSOR:
+        return await _keyset_aggregate(collection_name, aggregate, page_size, cursor, sort, count_strategy or CountStrategy.NONE, read_profile, session)
+
+    return await _offset_aggregate(collection_name, aggregate, page, page_size, count_strategy or CountStrategy.EXACT, read_profile, session)
+
+
+async def distinct(collection_name: str, field: str, read_profile: Optional[ReadProfile] = None) -> dict[str, Any]:
+    collection = profiles.get_read_collection(collection_name, read_profile)
 
     return await collection.distinct(field)
 
@@ -414,8 +1022,7 @@ def update_query(record_id: str = None, data_filter: dict[str, Any] = None, upda
     if not update:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail='update params cannot be empty')
 
-    update_data = copy.deepcopy(update)
-    update_data = _prepare_update(update_data, timestamp)
+    update_data = _prepare_update(update, timestamp)
 
     if upsert:
         update_data = _prepare_upsert(update_data, timestamp)
@@ -423,6 +1030,87 @@ def update_query(record_id: str = None, data_filter: dict[str, Any] = None, upda
     return UpdateOne(filter=data_filter, update=update_data, upsert=upsert)
 
 
-async def bulk_write(collection_name: str, operations: list[Any]) -> list[dict[str, Any]]:
-    collection = mongo.get_collection(collection_name)
-    return await collection.bulk_write(operations)
+def _merge_bulk_result(result: dict[str, Any], chunk_result: dict[str, Any], offset: int) -> None:
+    """Adds the raw result of one chunk to the aggregated result, shifting operation indexes by the chunk offset"""
+    for field, key in (('inserted_count', 'nInserted'), ('matched_count', 'nMatched'), ('modified_count', 'nModified'), ('deleted_count', 'nRemoved'), ('upserted_count', 'nUpserted')):
+        result[field] += chunk_result.get(key, 0)
+    for upserted in chunk_result.get('upserted', []):
+        result['upserted_ids'][offset + upserted['index']] = upserted['_id']
+    for error in chunk_result.get('writeErrors', []):
+        result['errors'].append({'index': offset + error['index'], 'code': error.get('code'), 'message': error.get('errmsg')})
+    for error in chunk_result.get('writeConcernErrors', []):
+        result['write_concern_errors'].append({'code': error.get('code'), 'message': error.get('errmsg')})
+
+
+# pylint: disable=too-many-arguments
+async def bulk_write(
+    collection_name: str,
+    operations: list[Any],
+    ordered: bool = True,
+    write_profile: Optional[WriteProfile] = None,
+    chunk_size: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+    session: AsyncIOMotorClientSession = None,
+) -> dict[str, Any]:
+    """Bulk write operation on database. Operations are sent in chunks bounded by count and BULK_WRITE_CHUNK_BYTES.
+    Ordered writes run the chunks one after the other and stop at the first failing operation. Unordered writes run up
+    to `max_concurrency` chunks at once and keep going past failures, one at a time when a session is given.
+
+    Args:
+        collection_name (str): collection name
+        operations (list): pymongo InsertOne/UpdateOne/DeleteOne/... operations, e.g. from update_query
+        ordered (bool): preserve the order of the operations and stop at the first error
+        write_profile (WriteProfile, optional): write concern of the operations, defaults to the client write concern
+        chunk_size (int, optional): maximum number of operations per chunk. Defaults to BULK_WRITE_CHUNK_SIZE.
+        max_concurrency (int, optional): unordered chunks written at once. Defaults to BULK_WRITE_CONCURRENCY.
+        session (AsyncIOMotorClientSession, optional): session to write with
+
+    Returns:
+        dict[str, Any]: counts, upserted_ids by operation index, per-operation errors with the index of the operation and,
+            for ordered writes, the number of operations not attempted after an error
+    """
+    collection = profiles.get_write_collection(collection_name, write_profile, session)
+    result: dict[str, Any] = {
+        'inserted_count': 0,
+        'matched_count': 0,
+        'modified_count': 0,
+        'deleted_count': 0,
+        'upserted_count': 0,
+        'upserted_ids': {},
+        'errors': [],
+        'write_concern_errors': [],
+        'unprocessed_count': 0,
+    }
+    chunks = list(bulk_utils.chunk_operations(operations, chunk_size or config.BULK_WRITE_CHUNK_SIZE, config.BULK_WRITE_CHUNK_BYTES))
+
+    async def write_chunk(offset: int, chunk: list[Any]) -> None:
+        try:
+            chunk_result = await collection.bulk_write(chunk, ordered=ordered, session=session)
+        except BulkWriteError as error:
+            _merge_bulk_result(result, error.details, offset)
+            return
+        if chunk_result.acknowledged:
+            _merge_bulk_result(result, chunk_result.bulk_api_result, offset)
+
+    try:
+        if ordered:
+            for offset, chunk in chunks:
+                await write_chunk(offset, chunk)
+                if result['errors']:
+                    # an ordered write stops at its first error
+                    result['unprocessed_count'] = len(operations) - result['errors'][0]['index'] - 1
+                    break
+        else:
+            # a session runs one operation at a time
+            semaphore = asyncio.Semaphore(1 if session else max_concurrency or config.BULK_WRITE_CONCURRENCY)
+
+            async def write_bounded(offset: int, chunk: list[Any]) -> None:
+                async with semaphore:
+                    await write_chunk(offset, chunk)
+
+            await asyncio.gather(*(write_bounded(offset, chunk) for offset, chunk in chunks))
+    finally:
+        cache.invalidate_collection(collection_name)
+        _run_bulk_write_hooks(collection_name, operations)
+    result['errors'].sort(key=lambda error: error['index'])
+    return result
@@ -1,7 +1,12 @@
 import motor.motor_asyncio
 
 from app.server.config import config
+from app.server.database.memory import MemoryClient
+from app.server.database.monitoring import command_monitor
 
-client = motor.motor_asyncio.AsyncIOMotorClient(config.MONGO_URI)
+if config.DATABASE_BACKEND == 'memory':
+    client = MemoryClient(config.MONGO_URI)
+else:
+    client = motor.motor_asyncio.AsyncIOMotorClient(config.MONGO_URI, event_listeners=[command_monitor])
 
 mongo = client.get_database()
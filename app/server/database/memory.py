@@ -0,0 +1,821 @@
+"""In-memory storage engine implementing the subset of the Motor API used by core_data.
+
+It supports the filters, update operators and aggregation stages this codebase uses, so the full request path can be
+profiled deterministically without a running mongod. It is single process, keeps no indexes besides the unique constraints,
+and transactions provide no isolation or rollback.
+"""
+import copy
+import datetime
+import re
+from typing import Any, Callable, Optional
+from urllib.parse import urlparse
+
+from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+from app.server.utils import query_utils
+
+_MISSING = object()
+
+
+# value helpers
+
+
+def _type_order(value: Any) -> int:
+    """BSON comparison order of the type of a value"""
+    if value is None or value is _MISSING:
+        return 1
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, str):
+        return 3
+    if isinstance(value, dict):
+        return 4
+    if isinstance(value, list):
+        return 5
+    if isinstance(value, ObjectId):
+        return 7
+    if isinstance(value, datetime.datetime):
+        return 9
+    return 10
+
+
+def _sort_key(value: Any) -> tuple[int, Any]:
+    order = _type_order(value)
+    if order == 1:
+        return (order, 0)
+    if order in (4, 5, 10):
+        return (order, repr(value))
+    return (order, value)
+
+
+def _compare(left: Any, right: Any) -> int:
+    left_key, right_key = _sort_key(left), _sort_key(right)
+    return (left_key > right_key) - (left_key < right_key)
+
+
+def _get_path_values(value: Any, parts: list[str]) -> list[Any]:
+    """Resolves a dotted path for query matching. Arrays of sub documents fan out into one candidate per element."""
+    if not parts:
+        return [value]
+    if isinstance(value, dict):
+        return _get_path_values(value[parts[0]], parts[1:]) if parts[0] in value else [_MISSING]
+    if isinstance(value, list):
+        if parts[0].isdigit():
+            index = int(parts[0])
+            return _get_path_values(value[index], parts[1:]) if index < len(value) else [_MISSING]
+        candidates = [candidate for item in value if isinstance(item, dict) for candidate in _get_path_values(item, parts)]
+        return candidates or [_MISSING]
+    return [_MISSING]
+
+
+def _expand(values: list[Any]) -> list[Any]:
+    """Adds the elements of array values, a query condition on an array field matches any of its elements"""
+    expanded = []
+    for value in values:
+        expanded.append(value)
+        if isinstance(value, list):
+            expanded.extend(value)
+    return expanded
+
+
+def get_field(document: Any, path: str) -> Any:
+    """Resolves a dotted path for expressions. Arrays of sub documents map to the array of their field values."""
+    value = document
+    for part in path.split('.'):
+        if isinstance(value, dict):
+            value = value.get(part)
+        elif isinstance(value, list):
+            value = [item.get(part) for item in value if isinstance(item, dict) and part in item]
+        else:
+            return None
+    return value
+
+
+def set_field(document: dict[str, Any], path: str, value: Any) -> None:
+    *parents, field = path.split('.')
+    for parent in parents:
+        document = document.setdefault(parent, {})
+    document[field] = value
+
+
+def unset_field(document: dict[str, Any], path: str) -> None:
+    *parents, field = path.split('.')
+    for parent in parents:
+        document = document.get(parent)
+        if not isinstance(document, dict):
+            return
+    document.pop(field, None)
+
+
+# query matching
+
+
+def _regex(pattern: Any, options: str = '') -> re.Pattern:
+    if isinstance(pattern, re.Pattern):
+        return pattern
+    flags = 0
+    for option, flag in (('i', re.IGNORECASE), ('m', re.MULTILINE), ('s', re.DOTALL), ('x', re.VERBOSE)):
+        if option in options:
+            flags |= flag
+    return re.compile(pattern, flags)
+
+
+def _equals(value: Any, expected: Any) -> bool:
+    if expected is None:
+        return value is None or value is _MISSING
+    if isinstance(expected, re.Pattern):
+        return isinstance(value, str) and bool(expected.search(value))
+    return _type_order(value) == _type_order(expected) and value == expected
+
+
+def _match_operator(operator: str, argument: Any, values: list[Any], condition: dict[str, Any]) -> bool:
+    expanded = _expand(values)
+    if operator == '$eq':
+        return any(_equals(value, argument) for value in expanded)
+    if operator == '$ne':
+        return not any(_equals(value, argument) for value in expanded)
+    if operator in ('$gt', '$gte', '$lt', '$lte'):
+        bracketed = [value for value in expanded if value is not _MISSING and _type_order(value) == _type_order(argument)]
+        checks = {'$gt': lambda result: result > 0, '$gte': lambda result: result >= 0, '$lt': lambda result: result < 0, '$lte': lambda result: result <= 0}
+        return any(checks[operator](_compare(value, argument)) for value in bracketed)
+    if operator == '$in':
+        return any(_equals(value, item) for value in expanded for item in argument)
+    if operator == '$nin':
+        return not any(_equals(value, item) for value in expanded for item in argument)
+    if operator == '$exists':
+        return any(value is not _MISSING for value in values) == bool(argument)
+    if operator == '$regex':
+        pattern = _regex(argument, condition.get('$options', ''))
+        return any(isinstance(value, str) and pattern.search(value) for value in expanded)
+    if operator == '$options':
+        return True
+    if operator == '$not':
+        return not _match_condition(values, argument)
+    if operator == '$all':
+        return all(any(_equals(value, item) for value in expanded) for item in argument)
+    if operator == '$size':
+        return any(isinstance(value, list) and len(value) == argument for value in values)
+    if operator == '$elemMatch':
+        return any(isinstance(value, list) and any(match(item, argument) if isinstance(item, dict) else _match_condition([item], argument) for item in value) for value in values)
+    raise OperationFailure(f'unknown operator: {operator}')
+
+
+def _is_operator_dict(condition: Any) -> bool:
+    return isinstance(condition, dict) and bool(condition) and all(key.startswith('$') for key in condition)
+
+
+def _match_condition(values: list[Any], condition: Any) -> bool:
+    if _is_operator_dict(condition):
+        return all(_match_operator(operator, argument, values, condition) for operator, argument in condition.items())
+    if isinstance(condition, re.Pattern):
+        return any(_equals(value, condition) for value in _expand(values))
+    return any(_equals(value, condition) for value in _expand(values))
+
+
+def _match_text(document: dict[str, Any], search: str) -> bool:
+    terms = [term.lower() for term in search.split()]
+    words = set()
+    for value in document.values():
+        if isinstance(value, str):
+            words.update(value.lower().split())
+    return any(term in words for term in terms)
+
+
+def match(document: dict[str, Any], query: Optional[dict[str, Any]], variables: Optional[dict[str, Any]] = None) -> bool:
+    """Returns True if the document matches the mongo filter"""
+    for key, condition in (query or {}).items():
+        if key == '$and':
+            matched = all(match(document, sub_query, variables) for sub_query in condition)
+        elif key == '$or':
+            matched = any(match(document, sub_query, variables) for sub_query in condition)
+        elif key == '$nor':
+            matched = not any(match(document, sub_query, variables) for sub_query in condition)
+        elif key == '$expr':
+            matched = _truthy(evaluate(document, condition, variables or {}))
+        elif key == '$text':
+            matched = _match_text(document, condition['$search'])
+        elif key == '$comment':
+            matched = True
+        else:
+            matched = _match_condition(_get_path_values(document, key.split('.')), condition)
+        if not matched:
+            return False
+    return True
+
+
+# aggregation expressions
+
+
+def _truthy(value: Any) -> bool:
+    return value not in (None, False, 0, _MISSING)
+
+
+def _evaluate_operator(document: dict[str, Any], operator: str, argument: Any, variables: dict[str, Any]) -> Any:
+    if operator == '$literal':
+        return argument
+    if operator == '$meta':
+        return document.get('_score', 0)
+    args = evaluate(document, argument, variables)
+    if operator == '$and':
+        return all(_truthy(arg) for arg in args)
+    if operator == '$or':
+        return any(_truthy(arg) for arg in args)
+    if operator == '$not':
+        return not _truthy(args[0] if isinstance(args, list) else args)
+    comparisons: dict[str, Callable[[int], bool]] = {
+        '$eq': lambda result: result == 0,
+        '$ne': lambda result: result != 0,
+        '$gt': lambda result: result > 0,
+        '$gte': lambda result: result >= 0,
+        '$lt': lambda result: result < 0,
+        '$lte': lambda result: result <= 0,
+    }
+    if operator in comparisons:
+        return comparisons[operator](_compare(args[0], args[1]))
+    if operator == '$cmp':
+        return _compare(args[0], args[1])
+    if operator == '$ifNull':
+        return next((arg for arg in args[:-1] if arg is not None), args[-1])
+    if operator == '$cond':
+        if isinstance(args, dict):
+            return args['then'] if _truthy(args['if']) else args['else']
+        return args[1] if _truthy(args[0]) else args[2]
+    if operator == '$arrayElemAt':
+        array, index = args
+        return array[index] if isinstance(array, list) and -len(array) <= index < len(array) else None
+    if operator == '$size':
+        return len(args[0] if isinstance(args, list) and len(args) == 1 and isinstance(args[0], list) else args)
+    if operator == '$slice':
+        array, *bounds = args
+        if len(bounds) == 1:
+            return array[: bounds[0]] if bounds[0] >= 0 else array[bounds[0] :]
+        return array[bounds[0] : bounds[0] + bounds[1]]
+    if operator == '$in':
+        return any(_equals(item, args[0]) for item in args[1])
+    if operator == '$setIntersection':
+        first, *others = args
+        return [item for item in dict.fromkeys(first or []) if all(item in (other or []) for other in others)]
+    if operator == '$concat':
+        return None if any(arg is None for arg in args) else ''.join(args)
+    if operator in ('$toLower', '$toUpper'):
+        value = args[0] if isinstance(args, list) else args
+        return (value or '').lower() if operator == '$toLower' else (value or '').upper()
+    if operator in ('$add', '$sum'):
+        return sum(arg for arg in (args if isinstance(args, list) else [args]) if isinstance(arg, (int, float)))
+    if operator == '$subtract':
+        return args[0] - args[1]
+    if operator == '$multiply':
+        result = 1
+        for arg in args:
+            result *= arg
+        return result
+    raise OperationFailure(f'unknown expression operator: {operator}')
+
+
+def evaluate(document: dict[str, Any], expression: Any, variables: dict[str, Any]) -> Any:
+    """Evaluates an aggregation expression against a document"""
+    if isinstance(expression, str) and expression.startswith('$$'):
+        name, _, path = expression[2:].partition('.')
+        base = document if name in ('ROOT', 'CURRENT') else variables.get(name)
+        return get_field(base, path) if path else base
+    if isinstance(expression, str) and expression.startswith('$'):
+        return get_field(document, expression[1:])
+    if isinstance(expression, list):
+        return [evaluate(document, item, variables) for item in expression]
+    if isinstance(expression, dict):
+        if len(expression) == 1 and next(iter(expression)).startswith('$'):
+            operator, argument = next(iter(expression.items()))
+            return _evaluate_operator(document, operator, argument, variables)
+        return {key: evaluate(document, value, variables) for key, value in expression.items()}
+    return expression
+
+
+# aggregation stages
+
+
+def sort_documents(documents: list[dict[str, Any]], sort: list[tuple[str, int]]) -> list[dict[str, Any]]:
+    documents = list(documents)
+    for field, direction in reversed(sort):
+        documents.sort(key=lambda document, field=field: _sort_key(get_field(document, field)), reverse=direction == -1)
+    return documents
+
+
+def _project(document: dict[str, Any], spec: dict[str, Any], variables: dict[str, Any]) -> dict[str, Any]:
+    # 0/1/True/False are inclusion flags, anything else is an expression computing the field
+    computed = {key: value for key, value in spec.items() if not isinstance(value, (bool, int))}
+    flags = {key: value for key, value in spec.items() if key not in computed}
+    if not computed and not any(value for key, value in flags.items() if key != '_id'):
+        return query_utils.apply_projection(document, flags)
+    projected = query_utils.apply_projection(document, {**{key: 1 for key in computed}, **flags}) if any(flags.values()) else {}
+    if flags.get('_id', 1) and '_id' in document:
+        projected['_id'] = document['_id']
+    for key, expression in computed.items():
+        set_field(projected, key, evaluate(document, expression, variables))
+    return projected
+
+
+def _unwind(documents: list[dict[str, Any]], spec: Any) -> list[dict[str, Any]]:
+    options = spec if isinstance(spec, dict) else {'path': spec}
+    path = options['path'][1:]
+    preserve = options.get('preserveNullAndEmptyArrays', False)
+    unwound = []
+    for document in documents:
+        value = get_field(document, path)
+        if isinstance(value, list) and value:
+            for item in value:
+                copied = copy.copy(document)
+                set_field(copied, path, item)
+                unwound.append(copied)
+        elif isinstance(value, list) or value is None:
+            if preserve:
+                copied = copy.copy(document)
+                unset_field(copied, path)
+                unwound.append(copied)
+        else:
+            unwound.append(document)
+    return unwound
+
+
+class MemoryDatabase:
+    """Database holding MemoryCollection instances, created on first use like mongo collections"""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._collections: dict[str, 'MemoryCollection'] = {}
+
+    def get_collection(self, name: str, **_options: Any) -> 'MemoryCollection':
+        # read preference, read concern and write concern options have no meaning for a single in-process copy
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(self, name)
+        return self._collections[name]
+
+    def __getitem__(self, name: str) -> 'MemoryCollection':
+        return self.get_collection(name)
+
+    async def command(self, command: dict[str, Any], **_kwargs: Any) -> dict[str, Any]:
+        if 'ping' in command:
+            return {'ok': 1.0}
+        if 'explain' in command:
+            explained = command['explain']
+            return self.get_collection(explained['find']).explain(explained.get('filter', {}), explained.get('sort'), explained.get('limit'))
+        raise OperationFailure(f'command not supported by the memory backend: {list(command)[0]}')
+
+    async def list_collection_names(self, **_kwargs: Any) -> list[str]:
+        return list(self._collections)
+
+    def run_pipeline(self, documents: list[dict[str, Any]], pipeline: list[dict[str, Any]], variables: Optional[dict[str, Any]] = None) -> list[dict[str, Any]]:
+        """Runs aggregation stages over a list of documents"""
+        variables = variables or {}
+        for stage in pipeline:
+            (name, spec), = stage.items()
+            if name == '$match':
+                documents = [document for document in documents if match(document, spec, variables)]
+            elif name == '$sort':
+                documents = sort_documents(documents, list(spec.items()))
+            elif name == '$skip':
+                documents = documents[spec:]
+            elif name == '$limit':
+                documents = documents[:spec]
+            elif name == '$count':
+                documents = [{spec: len(documents)}] if documents else []
+            elif name == '$project':
+                documents = [_project(document, spec, variables) for document in documents]
+            elif name in ('$addFields', '$set'):
+                documents = [self._add_fields(document, spec, variables) for document in documents]
+            elif name == '$unset':
+                documents = [query_utils.apply_projection(document, {field: 0 for field in ([spec] if isinstance(spec, str) else spec)}) for document in documents]
+            elif name == '$lookup':
+                documents = [self._lookup(document, spec, variables) for document in documents]
+            elif name == '$unwind':
+                documents = _unwind(documents, spec)
+            elif name in ('$replaceRoot', '$replaceWith'):
+                new_root = spec['newRoot'] if name == '$replaceRoot' else spec
+                documents = [evaluate(document, new_root, variables) for document in documents]
+            elif name == '$facet':
+                documents = [{key: self.run_pipeline(documents, sub_pipeline, variables) for key, sub_pipeline in spec.items()}]
+            else:
+                raise OperationFailure(f'stage not supported by the memory backend: {name}')
+        return documents
+
+    @staticmethod
+    def _add_fields(document: dict[str, Any], spec: dict[str, Any], variables: dict[str, Any]) -> dict[str, Any]:
+        updated = copy.copy(document)
+        for key, expression in spec.items():
+            set_field(updated, key, evaluate(document, expression, variables))
+        return updated
+
+    def _lookup(self, document: dict[str, Any], spec: dict[str, Any], variables: dict[str, Any]) -> dict[str, Any]:
+        foreign_documents = list(self.get_collection(spec['from']).documents.values())
+        if 'localField' in spec:
+            local_values = _expand([get_field(document, spec['localField'])])
+            foreign_documents = [
+                foreign for foreign in foreign_documents if any(_equals(value, local) for value in _expand([get_field(foreign, spec['foreignField'])]) for local in local_values)
+            ]
+        if 'pipeline' in spec:
+            lookup_variables = {**variables, **{name: evaluate(document, expression, variables) for name, expression in spec.get('let', {}).items()}}
+            foreign_documents = self.run_pipeline(foreign_documents, spec['pipeline'], lookup_variables)
+        joined = copy.copy(document)
+        set_field(joined, spec['as'], copy.deepcopy(foreign_documents))
+        return joined
+
+
+class MemoryCursor:
+    """find() cursor supporting sort, skip, limit and async iteration"""
+
+    def __init__(self, collection: 'MemoryCollection', data_filter: Optional[dict[str, Any]], projection: Optional[dict[str, Any]]) -> None:
+        self._collection = collection
+        self._filter = data_filter
+        self._projection = projection
+        self._sort: list[tuple[str, int]] = []
+        self._skip = 0
+        self._limit = 0
+        self._results: Optional[list[dict[str, Any]]] = None
+
+    def sort(self, key_or_list: Any, direction: int = 1) -> 'MemoryCursor':
+        self._sort = list(key_or_list) if isinstance(key_or_list, list) else [(key_or_list, direction)]
+        return self
+
+    def skip(self, skip: int) -> 'MemoryCursor':
+        self._skip = skip
+        return self
+
+    def limit(self, limit: int) -> 'MemoryCursor':
+        self._limit = limit
+        return self
+
+    def batch_size(self, _batch_size: int) -> 'MemoryCursor':
+        return self
+
+    def max_time_ms(self, _max_time_ms: Optional[int]) -> 'MemoryCursor':
+        return self
+
+    def _evaluate(self) -> list[dict[str, Any]]:
+        documents = [document for document in self._collection.documents.values() if match(document, self._filter)]
+        if self._sort:
+            documents = sort_documents(documents, self._sort)
+        documents = documents[self._skip :]
+        if self._limit:
+            documents = documents[: self._limit]
+        return [query_utils.apply_projection(copy.deepcopy(document), self._projection) for document in documents]
+
+    def __aiter__(self) -> 'MemoryCursor':
+        if self._results is None:
+            # reversed so __anext__ pops from the end
+            self._results = self._evaluate()[::-1]
+        return self
+
+    async def __anext__(self) -> dict[str, Any]:
+        if not self._results:
+            raise StopAsyncIteration
+        return self._results.pop()
+
+    async def to_list(self, length: Optional[int] = None) -> list[dict[str, Any]]:
+        results = self._evaluate()
+        return results[:length] if length else results
+
+
+class MemoryCommandCursor:
+    """aggregate() cursor over precomputed results"""
+
+    def __init__(self, results: list[dict[str, Any]]) -> None:
+        self._results = results
+        self._position = 0
+
+    def __aiter__(self) -> 'MemoryCommandCursor':
+        return self
+
+    async def __anext__(self) -> dict[str, Any]:
+        if self._position >= len(self._results):
+            raise StopAsyncIteration
+        self._position += 1
+        return self._results[self._position - 1]
+
+    async def to_list(self, length: Optional[int] = None) -> list[dict[str, Any]]:
+        end = self._position + length if length else len(self._results)
+        results, self._position = self._results[self._position : end], min(end, len(self._results))
+        return results
+
+
+# pylint: disable=too-many-public-methods
+class MemoryCollection:
+    """Collection keeping documents in an insertion ordered dict keyed by _id"""
+
+    def __init__(self, database: MemoryDatabase, name: str) -> None:
+        self.database = database
+        self.name = name
+        self.documents: dict[Any, dict[str, Any]] = {}
+        self._indexes: dict[str, dict[str, Any]] = {'_id_': {'key': [('_id', 1)], 'v': 2}}
+
+    # indexes
+
+    async def index_information(self) -> dict[str, dict[str, Any]]:
+        return copy.deepcopy(self._indexes)
+
+    async def create_indexes(self, indexes: list[Any], **_kwargs: Any) -> list[str]:
+        names = []
+        for index in indexes:
+            document = dict(index.document)
+            name = document.pop('name')
+            self._indexes[name] = {**document, 'key': list(document['key'].items()), 'v': 2}
+            names.append(name)
+        return names
+
+    async def create_index(self, keys: Any, **kwargs: Any) -> str:
+        keys = [(keys, 1)] if isinstance(keys, str) else list(keys)
+        name = kwargs.pop('name', '_'.join(f'{field}_{direction}' for field, direction in keys))
+        kwargs.pop('background', None)
+        self._indexes[name] = {**kwargs, 'key': keys, 'v': 2}
+        return name
+
+    def explain(self, data_filter: dict[str, Any], sort: Optional[dict[str, Any]] = None, limit: Optional[int] = None) -> dict[str, Any]:
+        """Approximates the query planner: an index is usable when the filter constrains its first field or the sort starts with it.
+        The filter on the fields other than the first field of the index is left to the FETCH stage."""
+        # indexes on a filtered field are preferred over an index on the sort
+        for fields in (set(data_filter), {next(iter(sort))} if sort else set()):
+            index_name = next((name for name, index in self._indexes.items() if index['key'][0][0] in fields and index['key'][0][1] != 'text'), None)
+            if index_name:
+                break
+        examined = len(self.documents)
+        returned = sum(1 for document in self.documents.values() if match(document, data_filter))
+        if index_name:
+            first_field = self._indexes[index_name]['key'][0][0]
+            bounds = ['[MinKey, MaxKey]'] if first_field not in data_filter else ['[?, ?]']
+            plan = {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN', 'indexName': index_name, 'indexBounds': {first_field: bounds}}}
+            residual = {field: value for field, value in data_filter.items() if field != first_field}
+            examined = returned
+        else:
+            plan = {'stage': 'COLLSCAN'}
+            residual = data_filter
+        if residual:
+            plan['filter'] = residual
+        if sort and (not index_name or first_field != next(iter(sort))):
+            plan = {'stage': 'SORT', 'inputStage': plan}
+        if limit:
+            plan = {'stage': 'LIMIT', 'limitAmount': limit, 'inputStage': plan}
+        return {'queryPlanner': {'winningPlan': plan}, 'executionStats': {'nReturned': returned, 'totalDocsExamined': examined}, 'ok': 1.0}
+
+    def _check_unique(self, document: dict[str, Any], ignore_id: Any = _MISSING) -> None:
+        for name, index in self._indexes.items():
+            if not index.get('unique') or name == '_id_':
+                continue
+            partial = index.get('partialFilterExpression')
+            if partial and not match(document, partial):
+                continue
+            key = [get_field(document, field) for field, _ in index['key']]
+            for other_id, other in self.documents.items():
+                if other_id == ignore_id or (partial and not match(other, partial)):
+                    continue
+                if [get_field(other, field) for field, _ in index['key']] == key:
+                    raise DuplicateKeyError(f'E11000 duplicate key error collection: {self.name} index: {name}', 11000, {'keyValue': dict(zip([f for f, _ in index['key']], key))})
+
+    # writes
+
+    def _insert(self, document: dict[str, Any]) -> Any:
+        document = copy.deepcopy(document)
+        document.setdefault('_id', ObjectId())
+        if document['_id'] in self.documents:
+            raise DuplicateKeyError(f'E11000 duplicate key error collection: {self.name} index: _id_', 11000, {'keyValue': {'_id': document['_id']}})
+        self._check_unique(document)
+        self.documents[document['_id']] = document
+        return document['_id']
+
+    @staticmethod
+    def _apply_update(document: dict[str, Any], update: dict[str, Any], is_insert: bool) -> dict[str, Any]:
+        if not any(key.startswith('$') for key in update):
+            return {'_id': document['_id'], **copy.deepcopy(update)}
+        updated = copy.deepcopy(document)
+        for operator, fields in update.items():
+            for path, value in fields.items():
+                current = get_field(updated, path)
+                if operator == '$set' or operator == '$setOnInsert' and is_insert:
+                    set_field(updated, path, copy.deepcopy(value))
+                elif operator == '$unset':
+                    unset_field(updated, path)
+                elif operator == '$inc':
+                    set_field(updated, path, (current or 0) + value)
+                elif operator == '$min' and (current is None or _compare(value, current) < 0) or operator == '$max' and (current is None or _compare(value, current) > 0):
+                    set_field(updated, path, value)
+                elif operator in ('$push', '$addToSet'):
+                    items = value['$each'] if isinstance(value, dict) and '$each' in value else [value]
+                    array = list(current or [])
+                    array += [item for item in items if operator == '$push' or item not in array]
+                    set_field(updated, path, array)
+                elif operator == '$pull':
+                    set_field(updated, path, [item for item in current or [] if not (match(item, value) if isinstance(value, dict) else _equals(item, value))])
+                elif operator not in ('$setOnInsert', '$min', '$max'):
+                    raise OperationFailure(f'update operator not supported by the memory backend: {operator}')
+        return updated
+
+    @staticmethod
+    def _upsert_seed(data_filter: dict[str, Any]) -> dict[str, Any]:
+        """Equality conditions of the filter become fields of the upserted document"""
+        seed: dict[str, Any] = {}
+        for key, condition in data_filter.items():
+            if key == '$and':
+                for sub_filter in condition:
+                    seed.update(MemoryCollection._upsert_seed(sub_filter))
+            elif not key.startswith('$') and not _is_operator_dict(condition):
+                set_field(seed, key, copy.deepcopy(condition))
+            elif isinstance(condition, dict) and '$eq' in condition:
+                set_field(seed, key, copy.deepcopy(condition['$eq']))
+        return seed
+
+    def _update(self, data_filter: dict[str, Any], update: dict[str, Any], upsert: bool, multi: bool) -> tuple[int, int, Any, Optional[dict[str, Any]], Optional[dict[str, Any]]]:
+        """Returns matched count, modified count, upserted id, last document before and after the update"""
+        matched = modified = 0
+        before = after = None
+        for document_id, document in list(self.documents.items()):
+            if not match(document, data_filter):
+                continue
+            matched += 1
+            updated = self._apply_update(document, update, is_insert=False)
+            if updated != document:
+                self._check_unique(updated, ignore_id=document_id)
+                self.documents[document_id] = updated
+                modified += 1
+            before, after = document, updated
+            if not multi:
+                break
+        if matched or not upsert:
+            return matched, modified, None, before, after
+        seed = self._upsert_seed(data_filter)
+        seed.setdefault('_id', None)
+        inserted = self._apply_update(seed, update, is_insert=True)
+        if inserted.get('_id') is None:
+            inserted['_id'] = ObjectId()
+        self._insert(inserted)
+        return 0, 0, inserted['_id'], None, inserted
+
+    async def insert_one(self, document: dict[str, Any], session: Any = None, **_kwargs: Any) -> InsertOneResult:
+        return InsertOneResult(self._insert(document), True)
+
+    async def insert_many(self, documents: list[dict[str, Any]], ordered: bool = True, session: Any = None, **_kwargs: Any) -> InsertManyResult:
+        result = await self.bulk_write([_Operation('InsertOne', document=document) for document in documents], ordered=ordered)
+        return InsertManyResult([operation['_id'] for operation in result.bulk_api_result['inserted']], True)
+
+    async def update_one(self, data_filter: dict[str, Any], update: dict[str, Any], upsert: bool = False, session: Any = None, **_kwargs: Any) -> UpdateResult:
+        matched, modified, upserted_id, _, _ = self._update(data_filter, update, upsert, multi=False)
+        return UpdateResult({'n': matched or int(upserted_id is not None), 'nModified': modified, **({'upserted': upserted_id} if upserted_id is not None else {})}, True)
+
+    async def update_many(self, data_filter: dict[str, Any], update: dict[str, Any], upsert: bool = False, session: Any = None, **_kwargs: Any) -> UpdateResult:
+        matched, modified, upserted_id, _, _ = self._update(data_filter, update, upsert, multi=True)
+        return UpdateResult({'n': matched or int(upserted_id is not None), 'nModified': modified, **({'upserted': upserted_id} if upserted_id is not None else {})}, True)
+
+    # pylint: disable=too-many-arguments
+    async def find_one_and_update(
+        self, data_filter: dict[str, Any], update: dict[str, Any], projection: Optional[dict[str, Any]] = None, upsert: bool = False, return_document: bool = False, session: Any = None, **_kwargs: Any
+    ) -> Optional[dict[str, Any]]:
+        _, _, _, before, after = self._update(data_filter, update, upsert, multi=False)
+        document = after if return_document else before
+        return query_utils.apply_projection(copy.deepcopy(document), projection) if document else None
+
+    async def replace_one(self, data_filter: dict[str, Any], replacement: dict[str, Any], upsert: bool = False, session: Any = None, **_kwargs: Any) -> UpdateResult:
+        return await self.update_one(data_filter, replacement, upsert=upsert)
+
+    def _delete(self, data_filter: dict[str, Any], multi: bool) -> list[dict[str, Any]]:
+        deleted = []
+        for document_id, document in list(self.documents.items()):
+            if match(document, data_filter):
+                deleted.append(self.documents.pop(document_id))
+                if not multi:
+                    break
+        return deleted
+
+    async def find_one_and_delete(self, data_filter: dict[str, Any], projection: Optional[dict[str, Any]] = None, session: Any = None, **_kwargs: Any) -> Optional[dict[str, Any]]:
+        deleted = self._delete(data_filter, multi=False)
+        return query_utils.apply_projection(deleted[0], projection) if deleted else None
+
+    async def delete_one(self, data_filter: dict[str, Any], session: Any = None, **_kwargs: Any) -> DeleteResult:
+        return DeleteResult({'n': len(self._delete(data_filter, multi=False))}, True)
+
+    async def delete_many(self, data_filter: dict[str, Any], session: Any = None, **_kwargs: Any) -> DeleteResult:
+        return DeleteResult({'n': len(self._delete(data_filter, multi=True))}, True)
+
+    async def bulk_write(self, requests: list[Any], ordered: bool = True, session: Any = None, **_kwargs: Any) -> BulkWriteResult:
+        """Applies pymongo InsertOne/UpdateOne/UpdateMany/ReplaceOne/DeleteOne/DeleteMany requests"""
+        result: dict[str, Any] = {'nInserted': 0, 'nUpserted': 0, 'nMatched': 0, 'nModified': 0, 'nRemoved': 0, 'upserted': [], 'inserted': [], 'writeErrors': [], 'writeConcernErrors': []}
+        for index, request in enumerate(requests):
+            kind = request.kind if isinstance(request, _Operation) else type(request).__name__
+            try:
+                if kind == 'InsertOne':
+                    document = request.document if isinstance(request, _Operation) else request._doc  # pylint: disable=protected-access
+                    result['inserted'].append({'index': index, '_id': self._insert(document)})
+                    result['nInserted'] += 1
+                elif kind in ('UpdateOne', 'UpdateMany', 'ReplaceOne'):
+                    # pylint: disable=protected-access
+                    matched, modified, upserted_id, _, _ = self._update(request._filter, request._doc, request._upsert, multi=kind == 'UpdateMany')
+                    result['nMatched'] += matched
+                    result['nModified'] += modified
+                    if upserted_id is not None:
+                        result['nUpserted'] += 1
+                        result['upserted'].append({'index': index, '_id': upserted_id})
+                elif kind in ('DeleteOne', 'DeleteMany'):
+                    result['nRemoved'] += len(self._delete(request._filter, multi=kind == 'DeleteMany'))  # pylint: disable=protected-access
+                else:
+                    raise OperationFailure(f'bulk operation not supported by the memory backend: {kind}')
+            except (DuplicateKeyError, OperationFailure) as error:
+                result['writeErrors'].append({'index': index, 'code': error.code or 2, 'errmsg': str(error), 'op': request})
+                if ordered:
+                    break
+        if result['writeErrors']:
+            raise BulkWriteError(result)
+        return BulkWriteResult(result, True)
+
+    # reads
+
+    async def find_one(self, data_filter: Any = None, projection: Optional[dict[str, Any]] = None, session: Any = None, **_kwargs: Any) -> Optional[dict[str, Any]]:
+        if data_filter is not None and not isinstance(data_filter, dict):
+            data_filter = {'_id': data_filter}
+        results = await MemoryCursor(self, data_filter, projection).limit(1).to_list(1)
+        return results[0] if results else None
+
+    def find(self, data_filter: Optional[dict[str, Any]] = None, projection: Optional[dict[str, Any]] = None, session: Any = None, **_kwargs: Any) -> MemoryCursor:
+        return MemoryCursor(self, data_filter, projection)
+
+    def aggregate(self, pipeline: list[dict[str, Any]], session: Any = None, **_kwargs: Any) -> MemoryCommandCursor:
+        results = self.database.run_pipeline(list(self.documents.values()), pipeline)
+        return MemoryCommandCursor(copy.deepcopy(results))
+
+    async def count_documents(self, data_filter: dict[str, Any], session: Any = None, **_kwargs: Any) -> int:
+        return sum(1 for document in self.documents.values() if match(document, data_filter))
+
+    async def estimated_document_count(self, **_kwargs: Any) -> int:
+        return len(self.documents)
+
+    async def distinct(self, key: str, data_filter: Optional[dict[str, Any]] = None, session: Any = None, **_kwargs: Any) -> list[Any]:
+        values: list[Any] = []
+        for document in self.documents.values():
+            if match(document, data_filter):
+                for value in _expand([get_field(document, key)]):
+                    if value is not None and not isinstance(value, list) and value not in values:
+                        values.append(value)
+        return values
+
+
+class _Operation:
+    """Internal bulk request used by insert_many"""
+
+    def __init__(self, kind: str, document: dict[str, Any]) -> None:
+        self.kind = kind
+        self.document = document
+
+
+class MemoryTransaction:
+    def __init__(self, session: 'MemorySession') -> None:
+        self.session = session
+
+    async def __aenter__(self) -> 'MemoryTransaction':
+        return self
+
+    async def __aexit__(self, *_exc_info: Any) -> None:
+        self.session.in_transaction = False
+
+
+class MemorySession:
+    """Session accepted wherever core_data takes a session. Transactions are accepted but provide no isolation or rollback."""
+
+    def __init__(self) -> None:
+        self.in_transaction = False
+
+    def start_transaction(self, **_kwargs: Any) -> MemoryTransaction:
+        self.in_transaction = True
+        return MemoryTransaction(self)
+
+    async def commit_transaction(self) -> None:
+        self.in_transaction = False
+
+    async def abort_transaction(self) -> None:
+        self.in_transaction = False
+
+    async def end_session(self) -> None:
+        return None
+
+    async def __aenter__(self) -> 'MemorySession':
+        return self
+
+    async def __aexit__(self, *_exc_info: Any) -> None:
+        return None
+
+
+class MemoryClient:
+    """Drop-in replacement of AsyncIOMotorClient backed by MemoryDatabase"""
+
+    def __init__(self, uri: str = '', **_kwargs: Any) -> None:
+        self._default_database = urlparse(uri).path.lstrip('/') or 'test'
+        self._databases: dict[str, MemoryDatabase] = {}
+
+    def get_database(self, name: Optional[str] = None, **_options: Any) -> MemoryDatabase:
+        name = name or self._default_database
+        if name not in self._databases:
+            self._databases[name] = MemoryDatabase(name)
+        return self._databases[name]
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        return self.get_database(name)
+
+    async def start_session(self, **_kwargs: Any) -> MemorySession:
+        return MemorySession()
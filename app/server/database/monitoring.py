@@ -0,0 +1,145 @@
+import bisect
+import threading
+from typing import Any
+
+from pymongo import monitoring
+
+from app.server.config import config
+from app.server.logger.custom_logger import logger
+from app.server.utils import query_utils
+
+# upper bounds in milliseconds of the latency histogram buckets, the last bucket is unbounded
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# handshake, auth and session housekeeping commands are not part of the application workload
+IGNORED_COMMANDS = {'hello', 'ismaster', 'isMaster', 'ping', 'saslStart', 'saslContinue', 'authenticate', 'getnonce', 'buildInfo', 'buildinfo', 'endSessions'}
+# part of each command holding the query, used to fingerprint slow commands
+QUERY_FIELDS = {
+    'find': 'filter',
+    'aggregate': 'pipeline',
+    'count': 'query',
+    'distinct': 'query',
+    'findAndModify': 'query',
+    'update': 'updates',
+    'delete': 'deletes',
+}
+
+
+def _get_collection_name(command_name: str, command: dict[str, Any]) -> str:
+    if command_name == 'getMore':
+        return command.get('collection', '')
+    collection_name = command.get(command_name)
+    return collection_name if isinstance(collection_name, str) else '<database>'
+
+
+def _get_document_count(command_name: str, reply: dict[str, Any]) -> int:
+    if cursor := reply.get('cursor'):
+        return len(cursor.get('firstBatch', cursor.get('nextBatch', [])))
+    if command_name == 'findAndModify':
+        return 1 if reply.get('value') else 0
+    if command_name == 'distinct':
+        return len(reply.get('values', []))
+    return reply.get('n', 0)
+
+
+def _get_fingerprint(command_name: str, command: dict[str, Any]) -> str:
+    query = command.get(QUERY_FIELDS.get(command_name, ''), {})
+    if command_name in ('update', 'delete'):
+        query = [statement.get('q', {}) for statement in query[:1]]
+    return query_utils.get_query_shape(query)
+
+
+class CommandStats:
+    """Latency histogram and counters of one command on one collection"""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.failures = 0
+        self.documents = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record(self, duration_ms: float, documents: int = 0, failed: bool = False) -> None:
+        self.count += 1
+        self.failures += failed
+        self.documents += documents
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, duration_ms)] += 1
+
+    def to_dict(self) -> dict[str, Any]:
+        labels = [f'le_{bound}ms' for bound in LATENCY_BUCKETS_MS] + ['gt_5000ms']
+        return {
+            'count': self.count,
+            'failures': self.failures,
+            'documents': self.documents,
+            'avg_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'max_ms': round(self.max_ms, 3),
+            'histogram': dict(zip(labels, self.buckets)),
+        }
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """pymongo command listener recording per-collection, per-command latency histograms, document counts and failures.
+    Commands slower than `slow_threshold_ms` are logged and aggregated by their normalized query fingerprint.
+
+    Listener callbacks run on the driver threads used by Motor, hence the lock.
+    """
+
+    def __init__(self, slow_threshold_ms: float, max_slow_fingerprints: int = 500) -> None:
+        self.slow_threshold_ms = slow_threshold_ms
+        self.max_slow_fingerprints = max_slow_fingerprints
+        self._lock = threading.Lock()
+        self._in_flight: dict[tuple[Any, int], tuple[str, dict[str, Any]]] = {}
+        self._stats: dict[tuple[str, str], CommandStats] = {}
+        self._slow: dict[str, dict[str, Any]] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        with self._lock:
+            self._in_flight[(event.connection_id, event.request_id)] = (_get_collection_name(event.command_name, event.command), event.command)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event, _get_document_count(event.command_name, event.reply), failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event, 0, failed=True)
+
+    def _finish(self, event: Any, documents: int, failed: bool) -> None:
+        duration_ms = event.duration_micros / 1000
+        with self._lock:
+            started = self._in_flight.pop((event.connection_id, event.request_id), None)
+            if started is None:
+                return
+            collection_name, command = started
+            key = (collection_name, event.command_name)
+            if key not in self._stats:
+                self._stats[key] = CommandStats()
+            self._stats[key].record(duration_ms, documents, failed)
+            if duration_ms < self.slow_threshold_ms:
+                return
+            fingerprint = _get_fingerprint(event.command_name, command)
+            slow = self._slow.get(fingerprint)
+            if slow is None and len(self._slow) < self.max_slow_fingerprints:
+                slow = self._slow[fingerprint] = {'collection': collection_name, 'command': event.command_name, 'fingerprint': fingerprint, 'count': 0, 'max_ms': 0.0}
+            if slow is not None:
+                slow['count'] += 1
+                slow['max_ms'] = max(slow['max_ms'], round(duration_ms, 3))
+        logger.bind(collection=collection_name, command=event.command_name, duration_ms=duration_ms, fingerprint=fingerprint).warning('Slow mongo command')
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            collections: dict[str, dict[str, Any]] = {}
+            for (collection_name, command_name), command_stats in sorted(self._stats.items()):
+                collections.setdefault(collection_name, {})[command_name] = command_stats.to_dict()
+            slow_commands = sorted(self._slow.values(), key=lambda slow: slow['max_ms'], reverse=True)
+            return {'slow_threshold_ms': self.slow_threshold_ms, 'collections': collections, 'slow_commands': [dict(slow) for slow in slow_commands]}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+
+
+command_monitor = CommandMonitor(config.MONGO_SLOW_COMMAND_MS)
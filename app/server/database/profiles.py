@@ -0,0 +1,89 @@
+from typing import Any, Optional, Union
+
+from motor.motor_asyncio import AsyncIOMotorClientSession
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import Nearest, Primary, SecondaryPreferred
+from pymongo.write_concern import WriteConcern
+
+from app.server.config import config
+from app.server.database.db import mongo
+from app.server.static.enums import ReadProfile, WriteProfile
+
+READ_PROFILES = {
+    ReadProfile.SECONDARY_PREFERRED: {'read_preference': SecondaryPreferred(max_staleness=config.MONGO_MAX_STALENESS_SECONDS)},
+    ReadProfile.NEAREST: {'read_preference': Nearest(max_staleness=config.MONGO_MAX_STALENESS_SECONDS)},
+    # only returns data acknowledged by a majority, the read side of critical writes
+    ReadProfile.PRIMARY_MAJORITY: {'read_preference': Primary(), 'read_concern': ReadConcern('majority')},
+}
+WRITE_PROFILES = {
+    # fire-and-forget counters and timestamps, losing the last writes on a primary failover is acceptable
+    WriteProfile.TELEMETRY: {'write_concern': WriteConcern(w=config.TELEMETRY_WRITE_CONCERN_W)},
+    # credentials and tokens, acknowledged once journaled on a majority so they survive a failover
+    WriteProfile.CRITICAL: {'write_concern': WriteConcern(w='majority', j=True)},
+}
+
+
+def _parse_collection_profiles(value: str) -> dict[str, ReadProfile]:
+    """Parses 'collection:profile' pairs separated by commas"""
+    profiles = {}
+    for pair in filter(None, (pair.strip() for pair in value.split(','))):
+        collection_name, _, profile = pair.partition(':')
+        profiles[collection_name.strip()] = ReadProfile(profile.strip())
+    return profiles
+
+
+COLLECTION_READ_PROFILES = _parse_collection_profiles(config.MONGO_READ_PROFILES)
+
+# collections bound to a non default profile, built once per collection and profile
+_collections: dict[tuple[str, Union[ReadProfile, WriteProfile]], Any] = {}
+
+
+def _get_profile_collection(collection_name: str, profile: Union[ReadProfile, WriteProfile], options: dict[str, Any]) -> Any:
+    key = (collection_name, profile)
+    if key not in _collections:
+        _collections[key] = mongo.get_collection(collection_name, **options)
+    return _collections[key]
+
+
+def get_read_profile(collection_name: str, read_profile: Optional[ReadProfile] = None, session: AsyncIOMotorClientSession = None) -> ReadProfile:
+    """Resolves the read profile of a read: the per-call profile, else the collection default, else primary.
+    Reads inside a transaction always use the primary."""
+    if session is not None and session.in_transaction:
+        return ReadProfile.PRIMARY
+    return read_profile or COLLECTION_READ_PROFILES.get(collection_name, ReadProfile.PRIMARY)
+
+
+def get_read_collection(collection_name: str, read_profile: Optional[ReadProfile] = None, session: AsyncIOMotorClientSession = None) -> Any:
+    """
+    Returns the collection to read from with the read preference and read concern of the resolved read profile.
+
+    Args:
+        collection_name (str): collection name
+        read_profile (ReadProfile, optional): per-call profile overriding the collection default
+        session (AsyncIOMotorClientSession, optional): session of the read
+
+    Returns:
+        AsyncIOMotorCollection: collection
+    """
+    profile = get_read_profile(collection_name, read_profile, session)
+    if profile == ReadProfile.PRIMARY:
+        return mongo.get_collection(collection_name)
+    return _get_profile_collection(collection_name, profile, READ_PROFILES[profile])
+
+
+def get_write_collection(collection_name: str, write_profile: Optional[WriteProfile] = None, session: AsyncIOMotorClientSession = None) -> Any:
+    """
+    Returns the collection to write to with the write concern of the write profile. Without a profile the client
+    default applies. Writes inside a transaction use the concern of the transaction, operation level concerns are not allowed there.
+
+    Args:
+        collection_name (str): collection name
+        write_profile (WriteProfile, optional): write profile
+        session (AsyncIOMotorClientSession, optional): session of the write
+
+    Returns:
+        AsyncIOMotorCollection: collection
+    """
+    if write_profile is None or (session is not None and session.in_transaction):
+        return mongo.get_collection(collection_name)
+    return _get_profile_collection(collection_name, write_profile, WRITE_PROFILES[write_profile])
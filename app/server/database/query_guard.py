@@ -0,0 +1,100 @@
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException, status
+
+from app.server.config import config
+from app.server.database.cache import plan_cache
+from app.server.database.db import mongo
+from app.server.utils import mongo_utils, query_utils
+
+# operators running server side javascript for every document
+_FORBIDDEN_OPERATORS = ('$where', '$function', '$accumulator')
+# index bounds of a field the filter does not restrict
+_FULL_RANGE = ['[MinKey, MaxKey]']
+
+
+def _find_forbidden_operator(value: Any) -> str:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key in _FORBIDDEN_OPERATORS:
+                return key
+            operator = _find_forbidden_operator(item)
+            if operator:
+                return operator
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            operator = _find_forbidden_operator(item)
+            if operator:
+                return operator
+    return ''
+
+
+def _has_stage(plan: dict[str, Any], predicate: Callable[[dict[str, Any]], bool]) -> bool:
+    if predicate(plan):
+        return True
+    children = [plan[key] for key in ('inputStage', 'queryPlan') if key in plan] + plan.get('inputStages', [])
+    return any(_has_stage(child, predicate) for child in children)
+
+
+def _scans_whole_index(stage: dict[str, Any]) -> bool:
+    # an IXSCAN reading every key of its index, e.g. an index picked for the sort or for a filter on a later field of it
+    return stage.get('stage') == 'IXSCAN' and bool(stage.get('indexBounds')) and all(bounds == _FULL_RANGE for bounds in stage['indexBounds'].values())
+
+
+def _filters_documents(stage: dict[str, Any]) -> bool:
+    # a filter the index bounds do not cover, documents read may be discarded
+    return bool(stage.get('filter'))
+
+
+async def _estimate_cost(collection_name: str, data_filter: dict[str, Any], sort: Optional[dict[str, Any]], limit: Optional[int]) -> dict[str, Any]:
+    """
+    Estimates the cost of a find from its query plan without running it. A limited find returning every document it reads
+    in the sort order, without a blocking SORT, examines at most `limit` documents. Otherwise a collection scan or a scan
+    of a whole index examines every document of the collection, other index scans are bounded by maxTimeMS.
+
+    Returns:
+        dict[str, Any]: plan stages and the estimated number of documents examined (None for bounded index scans)
+    """
+    explain = await mongo_utils.explain_find(collection_name, data_filter, sort=sort, limit=limit)
+    winning_plan = explain['queryPlanner']['winningPlan']
+    stages = mongo_utils.get_plan_stages(winning_plan)
+    docs_examined = None
+    if limit and 'SORT' not in stages and not _has_stage(winning_plan, _filters_documents):
+        docs_examined = limit
+    elif 'COLLSCAN' in stages or _has_stage(winning_plan, _scans_whole_index):
+        docs_examined = await mongo.get_collection(collection_name).estimated_document_count()
+    return {'stages': stages, 'docs_examined': docs_examined}
+
+
+async def check_filter(collection_name: str, data_filter: dict[str, Any], sort: Optional[dict[str, Any]] = None, limit: Optional[int] = None) -> None:
+    """
+    Rejects a user supplied filter that would scan more than QUERY_GUARD_MAX_DOCS_EXAMINED documents. The find is explained
+    with its sort and limit once per filter shape and collection, filters differing only by their values share the cached estimate.
+
+    Args:
+        collection_name (str): collection name
+        data_filter (dict): filter to check
+        sort (dict, optional): sort of the find
+        limit (int, optional): number of documents the find returns at most, e.g. the page size
+
+    Raises:
+        HTTPException: if the filter runs javascript or needs a collection scan over the docs examined budget
+    """
+    if not config.QUERY_GUARD_ENABLED:
+        return
+    operator = _find_forbidden_operator(data_filter)
+    if operator:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f'{collection_name}: {operator} is not allowed in filters')
+
+    shape_key = query_utils.get_query_key(collection_name, query_utils.get_query_shape(data_filter or {}), sort, limit)
+    generation = plan_cache.generation
+    cost = plan_cache.get(shape_key)
+    if cost is None:
+        cost = await _estimate_cost(collection_name, data_filter or {}, sort, limit)
+        plan_cache.set(shape_key, cost, generation=generation)
+
+    if cost['docs_examined'] is not None and cost['docs_examined'] > config.QUERY_GUARD_MAX_DOCS_EXAMINED:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f'{collection_name}: filter needs a full scan of about {cost["docs_examined"]} documents, filter on an indexed field',
+        )
@@ -0,0 +1,77 @@
+import asyncio
+import copy
+from typing import Any, Awaitable, Callable, Optional
+
+from app.server.config import config
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Future, collection_name: Optional[str]) -> None:
+        self.task = task
+        self.collection_name = collection_name
+        self.joiners = 0
+
+
+class SingleFlight:
+    """Coalesces identical concurrent reads: the first caller of a key runs the read, callers arriving while it is in flight
+    await the same result instead of issuing their own.
+
+    The shared read is shielded, so a cancelled caller does not cancel it for the others. When a result was shared every
+    caller receives its own deep copy, since callers are free to mutate what they get back. A write on a collection
+    calls `forget`, so a read issued after the write never joins one that may have read the collection before it.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._flights: dict[str, _Flight] = {}
+        self.calls = 0
+        self.executed = 0
+        self.saved = 0
+
+    async def do(self, key: Optional[str], read: Callable[[], Awaitable[Any]], collection_name: Optional[str] = None) -> Any:
+        """Runs `read` unless a read with the same key is already in flight
+
+        Args:
+            key (str, optional): key of the read, e.g. collection name with the query_utils.get_query_key of its arguments.
+                None runs the read unshared, e.g. for reads bound to a session.
+            read (Callable): returns the awaitable performing the read
+            collection_name (str, optional): collection read, its writes stop new callers from joining the read
+
+        Returns:
+            Any: result of the read
+        """
+        if not self.enabled or key is None:
+            return await read()
+
+        self.calls += 1
+        flight = self._flights.get(key)
+        if flight is not None:
+            flight.joiners += 1
+            self.saved += 1
+            return copy.deepcopy(await asyncio.shield(flight.task))
+
+        self.executed += 1
+        flight = self._flights[key] = _Flight(asyncio.ensure_future(read()), collection_name)
+        # registered before anyone awaits the task, so the key is gone before any caller resumes
+        flight.task.add_done_callback(lambda task: self._land(key, flight, task))
+        result = await asyncio.shield(flight.task)
+        return copy.deepcopy(result) if flight.joiners else result
+
+    def _land(self, key: str, flight: _Flight, task: asyncio.Future) -> None:
+        # the key may already hold a newer flight started after a write
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not task.cancelled():
+            # marks the exception as retrieved when every caller was cancelled before the read failed
+            task.exception()
+
+    def forget(self, collection_name: str) -> None:
+        """Stops new callers from joining the reads of a collection in flight, their callers still receive the result"""
+        for key in [key for key, flight in self._flights.items() if flight.collection_name == collection_name]:
+            del self._flights[key]
+
+    def stats(self) -> dict[str, Any]:
+        return {'in_flight': len(self._flights), 'calls': self.calls, 'executed': self.executed, 'saved': self.saved}
+
+
+read_flight = SingleFlight(config.SINGLE_FLIGHT_ENABLED)
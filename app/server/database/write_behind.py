@@ -0,0 +1,142 @@
+import asyncio
+import contextlib
+import copy
+from typing import Any, Optional
+
+from app.server.config import config
+from app.server.database import core_data
+from app.server.logger.custom_logger import logger
+from app.server.static.enums import WriteProfile
+from app.server.utils import query_utils
+
+MERGEABLE_OPERATORS = ('$inc', '$set', '$setOnInsert')
+
+
+def _merge_update(target: dict[str, Any], update: dict[str, Any]) -> None:
+    """Folds an update into the pending update of the same document.
+    $inc deltas are summed, $set is last-write-wins and $setOnInsert keeps the first value since only the first upsert inserts."""
+    for operator, fields in update.items():
+        merged = target.setdefault(operator, {})
+        for field, value in fields.items():
+            if operator == '$inc':
+                merged[field] = merged.get(field, 0) + value
+            elif operator == '$setOnInsert':
+                merged.setdefault(field, value)
+            else:
+                merged[field] = value
+
+
+class WriteBehindBuffer:
+    """Buffers fire-and-forget updates in memory and writes them as coalesced UpdateOne batches.
+
+    Updates targeting the same collection, filter and upsert flag are merged into a single operation. The buffer is flushed
+    when it holds `max_batch_size` documents, every `flush_interval` seconds and on shutdown. Once `max_pending` documents are
+    waiting, new documents are dropped and counted instead of growing memory without bound.
+    """
+
+    def __init__(self, max_batch_size: int, max_pending: int, flush_interval: float) -> None:
+        self.max_batch_size = max_batch_size
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self._pending: dict[str, dict[str, dict[str, Any]]] = {}
+        self._pending_count = 0
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._interval_task: Optional[asyncio.Task] = None
+        self.enqueued = 0
+        self.coalesced = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+
+    def enqueue(self, collection_name: str, data_filter: dict[str, Any], update: dict[str, Any], upsert: bool = False) -> None:
+        """Queues an update to be written with the next flush
+
+        Args:
+            collection_name (str): collection name
+            data_filter (dict): filter of the document to update
+            update (dict): update using only $inc, $set and $setOnInsert
+            upsert (bool): insert the document if it does not exist
+
+        Raises:
+            ValueError: if the update uses an operator that cannot be merged
+        """
+        if unsupported := [operator for operator in update if operator not in MERGEABLE_OPERATORS]:
+            raise ValueError(f'{collection_name}: operators {unsupported} cannot be buffered')
+
+        self.enqueued += 1
+        pending = self._pending.setdefault(collection_name, {})
+        key = query_utils.get_query_key(data_filter, upsert)
+        entry = pending.get(key)
+        if entry is None:
+            if self._pending_count >= self.max_pending:
+                self.dropped += 1
+                logger.warning(f'{collection_name}: write-behind buffer full, update dropped')
+                return
+            entry = pending[key] = {'filter': copy.deepcopy(data_filter), 'update': {}, 'upsert': upsert}
+            self._pending_count += 1
+        else:
+            self.coalesced += 1
+        _merge_update(entry['update'], update)
+
+        if self._pending_count >= self.max_batch_size and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self) -> None:
+        """Writes every pending update with one unordered bulk write per collection, in chunks of at most max_batch_size"""
+        if self._flush_lock is None:
+            # created lazily so the lock binds to the running event loop on python < 3.10
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            pending, self._pending, self._pending_count = self._pending, {}, 0
+            if not pending:
+                return
+            for collection_name, entries in pending.items():
+                operations = [core_data.update_query(data_filter=entry['filter'], update=entry['update'], upsert=entry['upsert']) for entry in entries.values()]
+                try:
+                    result = await core_data.bulk_write(collection_name, operations, ordered=False, write_profile=WriteProfile.TELEMETRY, chunk_size=self.max_batch_size)
+                except Exception as error:  # pylint: disable=broad-except
+                    self.failed += len(operations)
+                    logger.exception(error)
+                    continue
+                self.written += len(operations) - len(result['errors'])
+                self.failed += len(result['errors'])
+                if result['errors']:
+                    logger.warning(f"{collection_name}: {len(result['errors'])} buffered updates failed, first error: {result['errors'][0]['message']}")
+            self.flushes += 1
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as error:  # pylint: disable=broad-except
+                logger.exception(error)
+
+    def start(self) -> None:
+        if self._interval_task is None or self._interval_task.done():
+            self._interval_task = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self) -> None:
+        """Stops the interval flush and writes whatever is still pending"""
+        if self._interval_task:
+            self._interval_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._interval_task
+            self._interval_task = None
+        await self.flush()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'pending': self._pending_count,
+            'enqueued': self.enqueued,
+            'coalesced': self.coalesced,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'flushes': self.flushes,
+        }
+
+
+write_buffer = WriteBehindBuffer(config.WRITE_BEHIND_MAX_BATCH_SIZE, config.WRITE_BEHIND_MAX_PENDING, config.WRITE_BEHIND_FLUSH_INTERVAL_SECONDS)
@@ -1,8 +1,9 @@
-from fastapi import Header
-from user_agents import parse
+from fastapi import Request
 
+from app.server.utils.token_util import get_auth_context
 
-async def get_user_agent(user_agent: str = Header(None)):
+
+async def get_user_agent(request: Request):
     """
     Asynchronously gets the user agent details, including the operating system, device, and browser.
     The user agent information is captured along with the access token generation, allowing the tracking of the token's origin.
@@ -10,10 +11,9 @@ async def get_user_agent(user_agent: str = Header(None)):
     This would render all previously generated access tokens and refresh tokens invalid, since they were generated from the now-revoked refresh token.
 
     Args:
-        user_agent (str, optional): The user agent string to parse. Defaults to None.
+        request (Request): The request whose User-Agent header is parsed, once per request.
 
     Returns:
         dict: A dictionary containing the user agent details, including the operating system, device, and browser.
     """
-    agent_details = parse(user_agent)
-    return {'os': agent_details.os.family, 'device': f'{agent_details.device.brand}:{agent_details.device.model}', 'browser': f'{agent_details.browser.family}:{agent_details.browser.version_string}'}
+    return get_auth_context(request).agent
@@ -4,7 +4,7 @@ import contextlib
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 
-import app.server.database.core_data as core_service
+from app.server.database.write_behind import write_buffer
 from app.server.logger.custom_logger import logger
 from app.server.static.collections import Collections
 from app.server.utils import token_util
@@ -34,19 +34,16 @@ async def logging_api_requests(request: Request, response: Response):
 async def tract_request_address(request: Request):
     host = ''
     user_id = ''
-    # extract user id from authorization header of the request
-    if 'authorization' in request.headers:
-        token = request.headers.get('authorization')
-        parts = token.split()
-        if len(parts) == 2 and parts[0].lower() == 'bearer' and parts[1] not in ['', ' ', 'null']:
-            token = token.split(' ')[-1]
-            with contextlib.suppress(Exception):
-                if user := token_util.verify_jwt_token(token):
-                    user_id = user['user_id']
+    # extract user id from authorization header of the request, the verified claims are reused by JWTAuthUser
+    context = token_util.get_auth_context(request)
+    if context.token:
+        with contextlib.suppress(Exception):
+            if user := context.get_claims():
+                user_id = user['user_id']
     if forwarded := request.headers.get('X-Forwarded-For'):
         host = forwarded.split(',')[0]
     else:
         host = request.client.host
 
     data = {'user_id': user_id, 'ip': host, 'path': f"{request.scope['method']}:{request.scope['path']}"}
-    await core_service.update_one(Collections.REQUEST_TRACKER, data_filter=data, update={'$inc': {'count': 1}}, upsert=True)
+    write_buffer.enqueue(Collections.REQUEST_TRACKER, data_filter=data, update={'$inc': {'count': 1}}, upsert=True)
@@ -19,7 +19,8 @@ class CreateData(DictWithObjectIdStr, DateTimeModelMixin):
 
 
 class QueryData(BaseModel):
-    """Model class to accept filter and options dict which can be directly used to query database
+    """Model class to accept filter and options dict which can be directly used to query database.
+    lastId and cursor are used for keyset pagination with core_data.read_page. The filter is user supplied, read it with guard=True
 
     Args:
         BaseModel (class): Model to extend from
@@ -29,10 +30,12 @@ class QueryData(BaseModel):
     options: Optional[dict[str, Any]] = None
     pageSize: Optional[int] = None
     lastId: Optional[str] = None
+    cursor: Optional[str] = None
 
 
 class UpdateData(BaseModel):
-    """Model class to accept filter, update and options dict which can be directly used to updated database
+    """Model class to accept filter, update and options dict which can be directly used to updated database.
+    The filter is user supplied, update with guard=True
 
     Args:
         BaseModel (class): Model to extend from
@@ -1,8 +1,12 @@
-from typing import Optional
+from datetime import datetime
+from typing import Any, Optional
+
+from pydantic.class_validators import validator
 
 from app.server.models.custom_types import EmailStr
 from app.server.models.generic import BaseModel
 from app.server.static.enums import Role
+from app.server.utils import date_utils
 
 
 class PassportCreateDB(BaseModel):
@@ -17,6 +21,15 @@ class PassportTempCreateDB(BaseModel):
     user_type: Role
     is_used: bool = False
     expiry: int
+    # BSON date copy of expiry read by the TTL index of temp_passport
+    expires_at: Optional[datetime] = None
+
+    # pylint: disable=no-self-argument
+    @validator('expires_at', pre=True, always=True)
+    def default_expires_at(cls, value: Optional[datetime], values: dict[str, Any]) -> Optional[datetime]:
+        if value or 'expiry' not in values:
+            return value
+        return date_utils.get_date_time_from_timestamp(values['expiry'])
 
 
 class SendPasswordRequest(BaseModel):
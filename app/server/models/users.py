@@ -22,6 +22,11 @@ class UserUpdateRequest(BaseModel):
     phone: Optional[constr(min_length=1, max_length=30, strip_whitespace=True)]
 
 
+class UserAccessUpdateRequest(BaseModel):
+    user_type: Optional[Role]
+    account_status: Optional[AccountStatus]
+
+
 class UserCreateDB(BaseModel):
     first_name: str
     last_name: str
@@ -1,13 +1,17 @@
 from typing import Any, Optional
 
-from fastapi import APIRouter, Body, Depends
+from fastapi import APIRouter, Body, Depends, Request
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials
 
 from app.server.middlewares.headers import get_user_agent
 from app.server.models.auth import EmailLoginRequest
+from app.server.models.core_data import QueryData
 from app.server.models.passport import ForgotPasswordRequest, SendPasswordRequest
-from app.server.models.users import UserCreateRequest
+from app.server.models.users import UserAccessUpdateRequest, UserCreateRequest, UserUpdateRequest
 from app.server.services import auth_manager
-from app.server.static.enums import Role
+from app.server.static.enums import CountStrategy, ImportFormat, PaginationMode, Role, StreamFormat
+from app.server.utils import response_utils
 from app.server.utils.token_util import JWTAuthUser
 
 router = APIRouter()
@@ -19,6 +23,36 @@ async def create_user(params: UserCreateRequest) -> dict[str, Any]:
     return {'data': data, 'status': 'SUCCESS'}
 
 
+@router.get('/users/{user_id}', summary='Gets the profile of a user')
+async def get_user(user_id: str, _token=Depends(JWTAuthUser(list(Role)))) -> dict[str, Any]:
+    data = await auth_manager.get_user(user_id)
+    return {'data': data, 'status': 'SUCCESS'}
+
+
+@router.put('/users/{user_id}', summary='Updates the profile of a user')
+async def update_user(user_id: str, params: UserUpdateRequest, _token=Depends(JWTAuthUser([Role.SUPER_ADMIN]))) -> dict[str, Any]:
+    data = await auth_manager.update_user(user_id, params)
+    return {'data': data, 'status': 'SUCCESS'}
+
+
+@router.put('/users/{user_id}/access', summary='Changes the role or account status of a user and revokes its access tokens')
+async def update_user_access(user_id: str, params: UserAccessUpdateRequest, _token=Depends(JWTAuthUser([Role.SUPER_ADMIN]))) -> dict[str, Any]:
+    data = await auth_manager.update_user_access(user_id, params)
+    return {'data': data, 'status': 'SUCCESS'}
+
+
+@router.delete('/users/{user_id}', summary='Deletes a user and revokes its access tokens')
+async def delete_user(user_id: str, _token=Depends(JWTAuthUser([Role.SUPER_ADMIN]))) -> dict[str, Any]:
+    data = await auth_manager.delete_user(user_id)
+    return {'data': data, 'status': 'SUCCESS'}
+
+
+@router.post('/users/import', summary='Creates users in bulk from a CSV or NDJSON request body, reporting the failed rows')
+async def import_users(request: Request, import_format: ImportFormat = ImportFormat.CSV, _token=Depends(JWTAuthUser([Role.SUPER_ADMIN]))) -> dict[str, Any]:
+    data = await auth_manager.import_users(request.stream(), import_format)
+    return {'data': data, 'status': 'SUCCESS'}
+
+
 @router.post('/auth/refresh', summary='Creates new access token for session maintenance')
 async def refresh_access_token(refresh_token: str = Body(..., embed=True)) -> dict[str, Any]:
     data = await auth_manager.refresh_access_token(refresh_token)
@@ -31,6 +65,12 @@ async def individual_login(params: EmailLoginRequest, user_agent: dict[str, Any]
     return {'data': data, 'status': 'SUCCESS'}
 
 
+@router.post('/auth/users/logout', summary='Invalidates the access token of the request')
+async def logout(credentials: HTTPAuthorizationCredentials = Depends(JWTAuthUser.security), token_data=Depends(JWTAuthUser(list(Role)))) -> dict[str, Any]:
+    data = await auth_manager.logout(token_data, credentials.credentials)
+    return {'data': data, 'status': 'SUCCESS'}
+
+
 @router.post('/auth/users/password/send', summary='Creates a new default password and sends it to the user on registered email')
 async def individual_default_password(params: SendPasswordRequest, _token=Depends(JWTAuthUser([Role.SUPER_ADMIN]))) -> dict[str, Any]:
     data = await auth_manager.individual_default_password(params.user_id, email=params.email)
@@ -44,6 +84,32 @@ async def individual_forgot_password(params: ForgotPasswordRequest) -> dict[str,
 
 
 @router.get('/auth/users/paginated', summary='Gets all users in paginated form')
-async def get_all_industry_paginated(page: int = 1, page_size: int = 10, search_query: Optional[str] = None) -> dict[str, Any]:
-    data = await auth_manager.get_users_paginated(page=page, page_size=page_size, search_query=search_query)
+async def get_all_industry_paginated(
+    page: int = 1,
+    page_size: int = 10,
+    search_query: Optional[str] = None,
+    pagination_mode: PaginationMode = PaginationMode.OFFSET,
+    cursor: Optional[str] = None,
+    count_strategy: CountStrategy = CountStrategy.CACHED,
+) -> dict[str, Any]:
+    data = await auth_manager.get_users_paginated(
+        page=page, page_size=page_size, search_query=search_query, pagination_mode=pagination_mode, cursor=cursor, count_strategy=count_strategy
+    )
     return {'data': data, 'status': 'SUCCESS'}
+
+
+@router.get('/auth/users/changes', summary='Gets the users created, updated or deleted after a change cursor')
+async def get_user_changes(since: Optional[int] = None, cursor: Optional[str] = None, page_size: int = 100, _token=Depends(JWTAuthUser([Role.SUPER_ADMIN]))) -> dict[str, Any]:
+    data = await auth_manager.get_user_changes(since=since, cursor=cursor, page_size=page_size)
+    return {'data': data, 'status': 'SUCCESS'}
+
+
+@router.post('/auth/users/query', summary='Gets a page of the users matching a filter')
+async def query_users(params: QueryData, _token=Depends(JWTAuthUser([Role.SUPER_ADMIN]))) -> dict[str, Any]:
+    data = await auth_manager.query_users(params)
+    return {'data': data, 'status': 'SUCCESS'}
+
+
+@router.get('/auth/users/export', summary='Streams all users as NDJSON or JSON')
+async def export_users(stream_format: StreamFormat = StreamFormat.NDJSON, _token=Depends(JWTAuthUser([Role.SUPER_ADMIN]))) -> StreamingResponse:
+    return response_utils.stream_response(auth_manager.stream_users(), stream_format)
@@ -0,0 +1,36 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends
+
+from app.server.database import cache
+from app.server.database.batch_loader import batch_loader
+from app.server.database.monitoring import command_monitor
+from app.server.database.single_flight import read_flight
+from app.server.database.write_behind import write_buffer
+from app.server.services.revocation import revoked_tokens
+from app.server.utils.token_util import authorize_docs
+
+router = APIRouter()
+
+
+@router.get('/diagnostics/mongo', summary='Per-collection mongo command latency histograms and slow command fingerprints')
+async def get_mongo_stats(_username: str = Depends(authorize_docs)) -> dict[str, Any]:
+    return {'data': command_monitor.stats(), 'status': 'SUCCESS'}
+
+
+@router.delete('/diagnostics/mongo', summary='Resets the mongo command statistics')
+async def reset_mongo_stats(_username: str = Depends(authorize_docs)) -> dict[str, Any]:
+    command_monitor.reset()
+    return {'data': {'message': 'Mongo command statistics reset'}, 'status': 'SUCCESS'}
+
+
+@router.get('/diagnostics/cache', summary='Document cache, count cache, read coalescing and write-behind buffer counters')
+async def get_cache_stats(_username: str = Depends(authorize_docs)) -> dict[str, Any]:
+    data = {
+        **cache.get_cache_stats(),
+        'single_flight': read_flight.stats(),
+        'batch_loader': batch_loader.stats(),
+        'write_behind': write_buffer.stats(),
+        'revoked_tokens': revoked_tokens.stats(),
+    }
+    return {'data': data, 'status': 'SUCCESS'}
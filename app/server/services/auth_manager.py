@@ -1,18 +1,41 @@
 import asyncio
+import contextlib
 from datetime import timedelta
-from typing import Any, Optional
+from typing import Any, AsyncIterator, Optional
 
 from fastapi import HTTPException, status
+from jose import JWTError
+from pydantic import ValidationError
 
 import app.server.database.core_data as core_service
+from app.server.config import config
+from app.server.database.write_behind import write_buffer
+from app.server.logger.custom_logger import logger
 from app.server.models.auth import EmailLoginRequest
+from app.server.models.core_data import QueryData
 from app.server.models.custom_types import EmailStr
 from app.server.models.passport import PassportTempCreateDB
-from app.server.models.users import UserCreateDB, UserCreateRequest
+from app.server.models.users import UserAccessUpdateRequest, UserCreateDB, UserCreateRequest, UserUpdateRequest
+from app.server.services import revocation
 from app.server.static import localization
 from app.server.static.collections import Collections
-from app.server.static.enums import Role, TokenType
-from app.server.utils import crypto_utils, date_utils, password_utils, token_util
+from app.server.static.enums import CountStrategy, ImportFormat, PaginationMode, ReadProfile, Role, TokenType, WriteProfile
+from app.server.utils import crypto_utils, date_utils, import_utils, mongo_utils, password_utils, search_utils, token_util
+
+SEARCH_BACKFILL_LOCK = 'backfill_user_search_fields'
+
+_backfill_task: Optional[asyncio.Task] = None
+
+
+def _get_temp_passport(user_id: str, user_type: Role, encrypted_password: str) -> dict[str, Any]:
+    passport_data = {
+        'user_id': user_id,
+        'user_type': user_type,
+        'password': encrypted_password,
+        'is_used': False,
+        'expiry': date_utils.get_timestamp(expires_delta=timedelta(hours=1)),
+    }
+    return PassportTempCreateDB(**passport_data).dict(exclude_none=True)
 
 
 async def create_user(params: UserCreateRequest) -> dict[str, Any]:
@@ -31,7 +54,7 @@ async def create_user(params: UserCreateRequest) -> dict[str, Any]:
     """
     user_data = params.dict()
 
-    existing_user = await core_service.read_one(Collections.USERS, data_filter={'email': params.email})
+    existing_user = await core_service.read_one(Collections.USERS, data_filter={'email': params.email, 'is_deleted': False})
     if existing_user:
         raise HTTPException(status.HTTP_409_CONFLICT, localization.EXCEPTION_EMAIL_IN_USE)
 
@@ -39,22 +62,17 @@ async def create_user(params: UserCreateRequest) -> dict[str, Any]:
     password = password_utils.generate_random_password(8)
     encrypted_password = crypto_utils.sha1(password)
     encrypted_password = crypto_utils.sha256(encrypted_password)
+    user_data = UserCreateDB(**user_data).dict(exclude_none=True)
+    user_data.update(search_utils.get_user_search_fields(user_data))
+
     # Running transactions in mongo. Transactions require cluster setup.
-    # If any db operation within the content of a transaction fails, the entire transaction is rolled back.
-    async with await core_service.get_session() as session:
-        async with session.start_transaction():
-            user_data = UserCreateDB(**user_data).dict(exclude_none=True)
-            create_user_res = await core_service.update_one(Collections.USERS, data_filter={'email': params.email}, update={'$set': user_data}, upsert=True, session=session)
-            passport_data = {
-                'user_id': create_user_res['_id'],
-                'user_type': user_data['user_type'],
-                'password': encrypted_password,
-                'is_used': False,
-                'expiry': date_utils.get_timestamp(expires_delta=timedelta(hours=1)),
-            }
-            passport_data = PassportTempCreateDB(**passport_data)
-            passport_data = passport_data.dict(exclude_none=True)
-            await core_service.update_one(Collections.TEMP_PASSPORT, data_filter={'user_id': create_user_res['_id']}, update={'$set': passport_data}, upsert=True, session=session)
+    # If any db operation within the content of a transaction fails, the entire transaction is rolled back and retried when the failure is transient.
+    async def create(session) -> None:
+        create_user_res = await core_service.update_one(Collections.USERS, data_filter={'email': params.email, 'is_deleted': False}, update={'$set': user_data}, upsert=True, session=session)
+        passport_data = _get_temp_passport(create_user_res['_id'], user_data['user_type'], encrypted_password)
+        await core_service.update_one(Collections.TEMP_PASSPORT, data_filter={'user_id': create_user_res['_id']}, update={'$set': passport_data}, upsert=True, session=session)
+
+    await core_service.run_transaction(create)
 
     # send email with default password and unique id
     # template = await template_util.get_template(
@@ -64,6 +82,140 @@ async def create_user(params: UserCreateRequest) -> dict[str, Any]:
     return {'message': 'User created successfully'}
 
 
+async def _import_user_chunk(rows: list[tuple[int, dict[str, Any]]]) -> tuple[int, list[dict[str, Any]]]:
+    """Creates the valid users of one import chunk with their temp passports in one transaction"""
+    errors = []
+    users = {}
+    for row, record in rows:
+        try:
+            params = UserCreateRequest.parse_obj(record)
+        except ValidationError as error:
+            errors.append({'row': row, 'message': '; '.join(f"{'.'.join(map(str, detail['loc']))}: {detail['msg']}" for detail in error.errors())})
+            continue
+        if params.email in users:
+            errors.append({'row': row, 'email': params.email, 'message': f'{localization.EXCEPTION_EMAIL_IN_USE} (row {users[params.email][0]})'})
+            continue
+        user_data = UserCreateDB(**params.dict(), user_type=Role.TALENT).dict(exclude_none=True)
+        user_data.update(search_utils.get_user_search_fields(user_data))
+        users[params.email] = (row, user_data)
+
+    async def create(session) -> tuple[int, list[dict[str, Any]]]:
+        # a write error aborts the transaction, so existing emails are filtered out before writing
+        existing_users = await core_service.read_many(Collections.USERS, data_filter={'email': {'$in': list(users)}, 'is_deleted': False}, options={'email': 1}, session=session)
+        existing_emails = {user['email'] for user in existing_users}
+        chunk_errors = [{'row': row, 'email': email, 'message': localization.EXCEPTION_EMAIL_IN_USE} for email, (row, _) in users.items() if email in existing_emails]
+        new_users = [user_data for email, (_, user_data) in users.items() if email not in existing_emails]
+        if not new_users:
+            return 0, chunk_errors
+
+        operations = [core_service.update_query(data_filter={'email': user_data['email'], 'is_deleted': False}, update={'$setOnInsert': user_data}, upsert=True) for user_data in new_users]
+        result = await core_service.bulk_write(Collections.USERS, operations, ordered=False, session=session)
+        if result['errors'] or result['upserted_count'] != len(new_users):
+            raise HTTPException(status.HTTP_409_CONFLICT, result['errors'][0]['message'] if result['errors'] else localization.EXCEPTION_EMAIL_IN_USE)
+
+        passport_operations = []
+        for index, user_id in result['upserted_ids'].items():
+            encrypted_password = crypto_utils.sha256(crypto_utils.sha1(password_utils.generate_random_password(8)))
+            passport_data = _get_temp_passport(user_id, new_users[index]['user_type'], encrypted_password)
+            passport_operations.append(core_service.update_query(data_filter={'user_id': user_id}, update={'$set': passport_data}, upsert=True))
+        result = await core_service.bulk_write(Collections.TEMP_PASSPORT, passport_operations, ordered=False, session=session)
+        if result['errors']:
+            raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, result['errors'][0]['message'])
+        return len(new_users), chunk_errors
+
+    if not users:
+        return 0, errors
+    try:
+        created, chunk_errors = await core_service.run_transaction(create)
+    except HTTPException as error:
+        # the transaction was rolled back, none of the rows of the chunk were created
+        return 0, errors + [{'row': row, 'email': email, 'message': error.detail} for email, (row, _) in users.items()]
+    return created, errors + chunk_errors
+
+
+async def import_users(chunks: AsyncIterator[bytes], import_format: ImportFormat) -> dict[str, Any]:
+    """
+    Creates users in bulk from a CSV or NDJSON upload with the fields of UserCreateRequest, like create_user does for one user.
+    The upload is streamed and processed in chunks of USER_IMPORT_CHUNK_SIZE rows, each chunk is created in one transaction.
+    Invalid rows and rows whose email is in use are skipped and reported.
+
+    Args:
+        chunks (AsyncIterator[bytes]): The upload body.
+        import_format (ImportFormat): csv (with a header row) or ndjson.
+
+    Returns:
+        dict[str, Any]: The number of created and failed rows, and the errors with the line number of each failed row.
+    """
+    created = 0
+    errors = []
+    rows = []
+    async for row, record in import_utils.iter_records(chunks, import_format):
+        if isinstance(record, str):
+            errors.append({'row': row, 'message': record})
+            continue
+        rows.append((row, record))
+        if len(rows) >= config.USER_IMPORT_CHUNK_SIZE:
+            chunk_created, chunk_errors = await _import_user_chunk(rows)
+            created += chunk_created
+            errors += chunk_errors
+            rows = []
+    if rows:
+        chunk_created, chunk_errors = await _import_user_chunk(rows)
+        created += chunk_created
+        errors += chunk_errors
+
+    errors.sort(key=lambda error: error['row'])
+    return {'created': created, 'failed': len(errors), 'errors': errors}
+
+
+async def get_user(user_id: str) -> dict[str, Any]:
+    """
+    Gets the profile of an active user. Served from the document cache, so changes made by other workers
+    show after DOCUMENT_CACHE_TTL_SECONDS.
+
+    Args:
+        user_id (str): ID of the user.
+
+    Returns:
+        dict[str, Any]: The user document without its search fields.
+
+    Raises:
+        HTTPException 404 (Not Found): If the user is not found.
+    """
+    user = await core_service.read_one(Collections.USERS, data_filter={'_id': user_id, 'is_deleted': False}, options=search_utils.SEARCH_FIELDS_PROJECTION, use_cache=True)
+    if not user:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, localization.EXCEPTION_USER_NOT_FOUND)
+    return user
+
+
+async def update_user(user_id: str, params: UserUpdateRequest) -> dict[str, Any]:
+    """
+    Updates the profile of a user. The search fields are recomputed when the name changes.
+
+    Args:
+        user_id (str): ID of the user to update.
+        params (UserUpdateRequest): Request body containing the fields to update.
+
+    Returns:
+        dict[str, Any]: Dictionary containing the updated user data.
+
+    Raises:
+        HTTPException 404 (Not Found): If the user is not found.
+    """
+    user_data = params.dict(exclude_none=True)
+    search_fields = {field: 1 for field in search_utils.USER_SEARCH_SOURCE_FIELDS}
+    existing_user = await core_service.read_one(Collections.USERS, data_filter={'_id': user_id, 'is_deleted': False}, options=search_fields)
+    if not existing_user:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, localization.EXCEPTION_USER_NOT_FOUND)
+    if not user_data:
+        return {'message': 'User updated successfully'}
+
+    if search_fields.keys() & user_data.keys():
+        user_data.update(search_utils.get_user_search_fields({**existing_user, **user_data}))
+    await core_service.update_one(Collections.USERS, data_filter={'_id': user_id, 'is_deleted': False}, update={'$set': user_data})
+    return {'message': 'User updated successfully'}
+
+
 async def create_login_token(token_payload: dict[str, Any], user_agent: Optional[dict[str, Any]]) -> dict[str, Any]:
     """
     Creates a login token and stores it in the database.
@@ -75,8 +227,16 @@ async def create_login_token(token_payload: dict[str, Any], user_agent: Optional
         dict[str, Any]: A dictionary containing the access and refresh tokens.
     """
     access_token, access_token_expiry = token_util.create_jwt_token(token_payload, timedelta(days=1), token_type=TokenType.BEARER)
-    refresh_token, _ = token_util.create_jwt_token(token_payload, timedelta(days=30), token_type=TokenType.REFRESH)
-    await core_service.create_one(Collections.ACCESS_TOKENS, {**token_payload, 'access_token': access_token, 'refresh_token': refresh_token, 'metadata': user_agent})
+    refresh_token, refresh_token_expiry = token_util.create_jwt_token(token_payload, timedelta(days=30), token_type=TokenType.REFRESH)
+    token_data = {
+        **token_payload,
+        'access_token': access_token,
+        'refresh_token': refresh_token,
+        'metadata': user_agent,
+        # removed by the TTL index once the refresh token has expired
+        'expires_at': date_utils.get_date_time_from_timestamp(refresh_token_expiry),
+    }
+    await core_service.create_one(Collections.ACCESS_TOKENS, token_data, write_profile=WriteProfile.CRITICAL)
     return {'access_token': access_token, 'access_token_expiry': access_token_expiry, 'refresh_token': refresh_token}
 
 
@@ -93,7 +253,8 @@ async def refresh_access_token(token: str):
     Returns:
         dict: A dictionary containing the new access token and its expiry time.
     """
-    refresh_token_payload = token_util.verify_jwt_token(token, remove_reserved_claims=True)
+    refresh_token_claims = token_util.verify_jwt_token(token)
+    refresh_token_payload = {key: value for key, value in refresh_token_claims.items() if key not in token_util.RESERVED_CLAIMS}
     if refresh_token_payload['token_type'] != TokenType.REFRESH:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=localization.EXCEPTION_REFRESH_TOKEN_INVALID)
     existing_refresh_token = await core_service.read_one(Collections.ACCESS_TOKENS, data_filter={'user_id': refresh_token_payload['user_id'], 'refresh_token': token})
@@ -101,10 +262,108 @@ async def refresh_access_token(token: str):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=localization.EXCEPTION_REFRESH_TOKEN_INVALID)
     access_token, access_token_expiry = token_util.create_jwt_token(refresh_token_payload, timedelta(days=1))
     del refresh_token_payload['token_type']
-    await core_service.create_one(Collections.ACCESS_TOKENS, {**refresh_token_payload, 'access_token': access_token, 'refresh_token': token})
+    expires_at = date_utils.get_date_time_from_timestamp(refresh_token_claims['exp'] * 1000)
+    await core_service.create_one(
+        Collections.ACCESS_TOKENS, {**refresh_token_payload, 'access_token': access_token, 'refresh_token': token, 'expires_at': expires_at}, write_profile=WriteProfile.CRITICAL
+    )
     return {'access_token': access_token, 'access_token_expiry': access_token_expiry}
 
 
+async def logout(token_data: dict[str, Any], token: str) -> dict[str, Any]:
+    """
+    Invalidates an access token: deletes its access_tokens rows and revokes its jti for the stateless mode.
+
+    Args:
+        token_data (dict[str, Any]): The verified claims of the access token.
+        token (str): The access token.
+
+    Returns:
+        dict[str, Any]: A message confirming the logout.
+    """
+    await core_service.delete_many(Collections.ACCESS_TOKENS, {'user_id': token_data['user_id'], 'access_token': token})
+    if 'jti' in token_data:
+        await revocation.revoke(token_data['jti'], token_data['exp'])
+    return {'message': 'Logged out successfully'}
+
+
+async def revoke_user_tokens(user_id: str) -> int:
+    """
+    Invalidates every access token of a user, e.g. after deactivating the account, which the stateless mode does not check.
+    Only the access_tokens rows whose jti was revoked are deleted, a token issued meanwhile keeps its row and stays checkable.
+
+    Args:
+        user_id (str): The ID of the user.
+
+    Returns:
+        int: The number of access tokens revoked.
+    """
+    revoked = 0
+    token_ids = []
+    async for row in core_service.stream_many(Collections.ACCESS_TOKENS, {'user_id': user_id}, options={'access_token': 1}):
+        with contextlib.suppress(JWTError):
+            claims = token_util.verify_jwt_token(row['access_token'])
+            if 'jti' in claims:
+                await revocation.revoke(claims['jti'], claims['exp'])
+                revoked += 1
+        # expired and invalid tokens are deleted as well
+        token_ids.append(row['_id'])
+        if len(token_ids) >= config.STREAM_BATCH_SIZE:
+            await core_service.delete_many(Collections.ACCESS_TOKENS, {'_id': {'$in': token_ids}})
+            token_ids = []
+    if token_ids:
+        await core_service.delete_many(Collections.ACCESS_TOKENS, {'_id': {'$in': token_ids}})
+    return revoked
+
+
+async def update_user_access(user_id: str, params: UserAccessUpdateRequest) -> dict[str, Any]:
+    """
+    Changes the role or account status of a user. The access tokens of the user are revoked when either changes,
+    their claims no longer match the account.
+
+    Args:
+        user_id (str): ID of the user to update.
+        params (UserAccessUpdateRequest): Request body containing the new user_type and/or account_status.
+
+    Returns:
+        dict[str, Any]: A message with the number of access tokens revoked.
+
+    Raises:
+        HTTPException 404 (Not Found): If the user is not found.
+    """
+    access_data = params.dict(exclude_none=True)
+    existing_user = await core_service.read_one(Collections.USERS, data_filter={'_id': user_id, 'is_deleted': False}, options={'user_type': 1, 'account_status': 1})
+    if not existing_user:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, localization.EXCEPTION_USER_NOT_FOUND)
+    access_data = {field: value for field, value in access_data.items() if existing_user.get(field) != value}
+    if not access_data:
+        return {'message': 'User access unchanged', 'revoked_tokens': 0}
+
+    await core_service.update_one(Collections.USERS, data_filter={'_id': user_id, 'is_deleted': False}, update={'$set': access_data})
+    revoked = await revoke_user_tokens(user_id)
+    return {'message': 'User access updated successfully', 'revoked_tokens': revoked}
+
+
+async def delete_user(user_id: str) -> dict[str, Any]:
+    """
+    Soft deletes a user and revokes its access tokens.
+
+    Args:
+        user_id (str): ID of the user to delete.
+
+    Returns:
+        dict[str, Any]: A message with the number of access tokens revoked.
+
+    Raises:
+        HTTPException 404 (Not Found): If the user is not found.
+    """
+    existing_user = await core_service.read_one(Collections.USERS, data_filter={'_id': user_id, 'is_deleted': False}, options={'_id': 1})
+    if not existing_user:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, localization.EXCEPTION_USER_NOT_FOUND)
+    await core_service.update_one(Collections.USERS, data_filter={'_id': user_id, 'is_deleted': False}, update={'$set': {'is_deleted': True}})
+    revoked = await revoke_user_tokens(user_id)
+    return {'message': 'User deleted successfully', 'revoked_tokens': revoked}
+
+
 async def individual_login(params: EmailLoginRequest, user_agent: dict[str, Any]) -> dict[str, Any]:
     """
     Authenticates a user by email and password.
@@ -132,7 +391,7 @@ async def individual_login(params: EmailLoginRequest, user_agent: dict[str, Any]
     )
     if existing_passport:
         # mark the temp password as used
-        await core_service.update_one(Collections.TEMP_PASSPORT, data_filter={'user_id': existing_user['_id']}, update={'$set': {'is_used': True}})
+        await core_service.update_one(Collections.TEMP_PASSPORT, data_filter={'user_id': existing_user['_id']}, update={'$set': {'is_used': True}}, write_profile=WriteProfile.CRITICAL)
 
     if not existing_passport:
         existing_passport = await core_service.read_one(Collections.PASSPORT, data_filter={'user_id': existing_user['_id']})
@@ -142,7 +401,7 @@ async def individual_login(params: EmailLoginRequest, user_agent: dict[str, Any]
     password_utils.check_password(params.password, existing_passport['password'])
     token_payload = {'user_id': existing_user['_id'], 'user_type': existing_user['user_type']}
     token_data = await create_login_token(token_payload, user_agent)
-    asyncio.create_task(core_service.update_one(Collections.USERS, data_filter={'_id': existing_user['_id']}, update={'$set': {'last_login': date_utils.get_current_timestamp()}}))
+    write_buffer.enqueue(Collections.USERS, data_filter={'_id': existing_user['_id']}, update={'$set': {'last_login': date_utils.get_current_timestamp()}})
     return {**token_data, 'user_id': existing_user['_id'], 'user_type': existing_user['user_type']}
 
 
@@ -181,7 +440,7 @@ async def individual_default_password(user_id: str, email: Optional[EmailStr] =
     }
     passport_data = PassportTempCreateDB(**passport_data)
     passport_data = passport_data.dict(exclude_none=True)
-    await core_service.update_one(Collections.TEMP_PASSPORT, data_filter={'user_id': user_id}, update={'$set': passport_data}, upsert=True)
+    await core_service.update_one(Collections.TEMP_PASSPORT, data_filter={'user_id': user_id}, update={'$set': passport_data}, upsert=True, write_profile=WriteProfile.CRITICAL)
     # template = await template_util.get_template(
     #     'app/server/templates/account_details.html',
     #     user_name=f"{existing_user['first_name']} {existing_user['last_name']}",
@@ -204,7 +463,7 @@ async def individual_forgot_password(email: EmailStr):
     Raises:
       HTTPException: If the user is not found in the database.
     """
-    existing_user = await core_service.read_one(Collections.USERS, data_filter={'email': email, 'user_type': {'$in': [user_type.value for user_type in Role]}})
+    existing_user = await core_service.read_one(Collections.USERS, data_filter={'email': email, 'is_deleted': False, 'user_type': {'$in': [user_type.value for user_type in Role]}})
     if not existing_user:
         raise HTTPException(status.HTTP_404_NOT_FOUND, localization.EXCEPTION_USER_NOT_FOUND)
 
@@ -221,7 +480,9 @@ async def individual_forgot_password(email: EmailStr):
     }
     passport_data = PassportTempCreateDB(**passport_data)
     passport_data = passport_data.dict(exclude_none=True)
-    await core_service.update_one(Collections.TEMP_PASSPORT, data_filter={'user_id': existing_user['_id']}, update={'$set': passport_data}, upsert=True)
+    await core_service.update_one(
+        Collections.TEMP_PASSPORT, data_filter={'user_id': existing_user['_id']}, update={'$set': passport_data}, upsert=True, write_profile=WriteProfile.CRITICAL
+    )
     # send email with default password and unique id
     # template = await template_util.get_template(
     #     'app/server/templates/forgot_password.html', user_name=f'{existing_user["first_name"]} {existing_user["last_name"]}', password=password, company_name='Wow Labz'
@@ -230,14 +491,26 @@ async def individual_forgot_password(email: EmailStr):
     return {'message': 'Password successfully sent'}
 
 
-async def get_users_paginated(page: int, page_size: int, search_query: Optional[str]) -> list[dict[str, Any]]:
+async def get_users_paginated(
+    page: int,
+    page_size: int,
+    search_query: Optional[str],
+    pagination_mode: PaginationMode = PaginationMode.OFFSET,
+    cursor: Optional[str] = None,
+    count_strategy: CountStrategy = CountStrategy.CACHED,
+) -> list[dict[str, Any]]:
     """
-    Get a paginated list of users.
+    Get a paginated list of the active users.
 
     Args:
         page (int): The page number to retrieve.
         page_size (int): The number of items to retrieve per page.
-        search_query (Optional[str]): A query string to filter the users by name.
+        search_query (Optional[str]): Words matched as prefixes of the first name, last name and email of the users, best matches first.
+            Words of one character are ignored, see search_utils.get_search_pipeline.
+        pagination_mode (PaginationMode): Offset or cursor pagination. Cursor pages cost the same regardless of depth.
+        cursor (Optional[str]): next_cursor/prev_cursor from the metadata of the previous page.
+        count_strategy (CountStrategy): How total_records is computed. Defaults to a cached exact count to avoid a full scan on every page turn.
+            Pages and counts are read from secondaries when available, a listing tolerates the replication lag.
 
     Returns:
         list[dict[str, Any]]: A list of dictionaries representing the users.
@@ -245,6 +518,125 @@ async def get_users_paginated(page: int, page_size: int, search_query: Optional[
     Raises:
         None
     """
-    aggregate_query: list[dict[str, Any]] = [{'$match': {'name': {'$regex': search_query, '$options': 'i'}}}, {'$sort': {'name': 1}}] if search_query else [{'$sort': {'name': 1}}]
+    aggregate_query = search_utils.get_search_pipeline(search_query) if search_query else []
+    if not aggregate_query:
+        aggregate_query = [{'$match': {'is_deleted': False}}, {'$project': search_utils.SEARCH_FIELDS_PROJECTION}, {'$sort': search_utils.NAME_SORT}]
+
+    return await core_service.query_read(
+        collection_name=Collections.USERS,
+        aggregate=aggregate_query,
+        page=page,
+        page_size=page_size,
+        paging_data=True,
+        pagination_mode=pagination_mode,
+        cursor=cursor,
+        count_strategy=count_strategy,
+        read_profile=ReadProfile.SECONDARY_PREFERRED,
+    )
+
+
+async def get_user_changes(since: Optional[int] = None, cursor: Optional[str] = None, page_size: int = 100) -> dict[str, Any]:
+    """
+    Get the users created, updated or deleted since the previous poll, deleted users have is_deleted set.
+
+    Args:
+        since (Optional[int]): Timestamp in milliseconds to start from on the first poll, all users when omitted.
+        cursor (Optional[str]): next_cursor from the metadata of the previous poll.
+        page_size (int): The number of users per page, poll again right away while has_more is set.
+
+    Returns:
+        dict[str, Any]: The changed users and metadata with the next_cursor to poll with.
+    """
+    return await core_service.read_changes(Collections.USERS, options=search_utils.SEARCH_FIELDS_PROJECTION, since=since, cursor=cursor, page_size=page_size)
+
 
-    return await core_service.query_read(collection_name=Collections.USERS, aggregate=aggregate_query, page=page, page_size=page_size, paging_data=True)
+async def query_users(params: QueryData) -> dict[str, Any]:
+    """
+    Reads a page of users matching a filter supplied by the caller. The filter is checked by the query guard
+    and the read is stopped after QUERY_GUARD_MAX_TIME_MS.
+
+    Args:
+        params (QueryData): Request body containing the filter, options and the pageSize, cursor or lastId of the page.
+
+    Returns:
+        dict[str, Any]: The users of the page and metadata with the next and previous cursors.
+
+    Raises:
+        HTTPException 422 (Unprocessable Entity): If the filter is too expensive or the read runs out of time.
+    """
+    return await core_service.read_page(
+        Collections.USERS,
+        params.filter,
+        options=params.options or search_utils.SEARCH_FIELDS_PROJECTION,
+        page_size=params.pageSize,
+        cursor=params.cursor,
+        last_id=params.lastId,
+        read_profile=ReadProfile.SECONDARY_PREFERRED,
+        guard=True,
+    )
+
+
+def stream_users() -> AsyncIterator[dict[str, Any]]:
+    """
+    Streams all active users in _id order without loading them in memory.
+
+    Returns:
+        AsyncIterator[dict[str, Any]]: An async iterator over the user documents.
+    """
+    return core_service.stream_many(Collections.USERS, data_filter={'is_deleted': False}, options=search_utils.SEARCH_FIELDS_PROJECTION, sort={'_id': 1})
+
+
+async def backfill_user_search_fields() -> int:
+    """
+    Stores the search fields on the users written before they existed, in batches of STREAM_BATCH_SIZE.
+    Runs under a cross-worker lock renewed after every batch, once every user has them it only reads the search_ngrams index.
+
+    Returns:
+        int: The number of users updated, 0 when another worker holds the lock.
+    """
+    if not await mongo_utils.acquire_lock(SEARCH_BACKFILL_LOCK):
+        return 0
+    try:
+        updated = 0
+        operations = []
+        search_fields = {field: 1 for field in search_utils.USER_SEARCH_SOURCE_FIELDS}
+        users = core_service.stream_many(Collections.USERS, data_filter={'search_ngrams': {'$exists': False}}, options=search_fields)
+        async for user in users:
+            operations.append(core_service.update_query(record_id=user['_id'], update={'$set': search_utils.get_user_search_fields(user)}))
+            if len(operations) >= config.STREAM_BATCH_SIZE:
+                updated += (await core_service.bulk_write(Collections.USERS, operations, ordered=False))['modified_count']
+                operations = []
+                if not await mongo_utils.extend_lock(SEARCH_BACKFILL_LOCK):
+                    # expired and taken over by another worker, which continues the backfill
+                    return updated
+        if operations:
+            updated += (await core_service.bulk_write(Collections.USERS, operations, ordered=False))['modified_count']
+        return updated
+    finally:
+        await mongo_utils.release_lock(SEARCH_BACKFILL_LOCK)
+
+
+async def _backfill_in_background() -> None:
+    try:
+        updated = await backfill_user_search_fields()
+    except Exception as error:  # pylint: disable=broad-except
+        logger.exception(error)
+        return
+    if updated:
+        logger.info(f'{Collections.USERS}: stored the search fields of {updated} users')
+
+
+def start_search_backfill() -> None:
+    """Runs backfill_user_search_fields in the background, the worker serves requests meanwhile"""
+    global _backfill_task  # pylint: disable=global-statement
+    if _backfill_task is None or _backfill_task.done():
+        _backfill_task = asyncio.create_task(_backfill_in_background())
+
+
+async def stop_search_backfill() -> None:
+    global _backfill_task  # pylint: disable=global-statement
+    if _backfill_task:
+        _backfill_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _backfill_task
+        _backfill_task = None
@@ -0,0 +1,95 @@
+import asyncio
+import contextlib
+import gzip
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+import orjson
+
+import app.server.database.core_data as core_service
+from app.server.config import config
+from app.server.logger.custom_logger import logger
+from app.server.static.collections import Collections
+from app.server.utils import date_utils, mongo_utils
+
+COMPACTION_LOCK = 'compact_request_tracker'
+
+_compaction_task: Optional[asyncio.Task] = None
+
+
+def _write_lines(archive: gzip.GzipFile, lines: list[bytes]) -> None:
+    archive.write(b''.join(lines))
+
+
+async def compact_request_tracker() -> dict[str, Any]:
+    """
+    Moves request_tracker rows not updated for REQUEST_TRACKER_RETENTION_DAYS into a gzip compressed NDJSON file under ARCHIVE_DIR.
+    Rows are only deleted once the archive is closed, and only if they were not updated while being archived.
+    Runs in one worker at a time.
+
+    Returns:
+        dict[str, Any]: archive path with the number of archived and deleted rows, empty if there was nothing to compact
+            or another worker holds the lock
+    """
+    if not await mongo_utils.acquire_lock(COMPACTION_LOCK, ttl=timedelta(seconds=config.COMPACTION_INTERVAL_SECONDS)):
+        return {}
+    try:
+        cutoff = date_utils.get_timestamp(expires_delta=-timedelta(days=config.REQUEST_TRACKER_RETENTION_DAYS))
+        data_filter = {'updated_at': {'$lt': cutoff}}
+        # file operations run in a thread, they would block the event loop
+        await asyncio.to_thread(os.makedirs, config.ARCHIVE_DIR, exist_ok=True)
+        path = os.path.join(config.ARCHIVE_DIR, f'{Collections.REQUEST_TRACKER}-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}.ndjson.gz')
+
+        archived_ids = []
+        lines = []
+        archive = await asyncio.to_thread(gzip.open, path, 'wb')
+        try:
+            async for row in core_service.stream_many(Collections.REQUEST_TRACKER, data_filter, sort={'_id': 1}):
+                archived_ids.append(row['_id'])
+                lines.append(orjson.dumps(row, default=str) + b'\n')
+                if len(lines) >= config.STREAM_BATCH_SIZE:
+                    await asyncio.to_thread(_write_lines, archive, lines)
+                    lines = []
+            if lines:
+                await asyncio.to_thread(_write_lines, archive, lines)
+        finally:
+            await asyncio.to_thread(archive.close)
+
+        if not archived_ids:
+            await asyncio.to_thread(os.remove, path)
+            return {}
+
+        deleted = 0
+        for start in range(0, len(archived_ids), config.STREAM_BATCH_SIZE):
+            batch_ids = archived_ids[start : start + config.STREAM_BATCH_SIZE]
+            result = await core_service.delete_many(Collections.REQUEST_TRACKER, {'_id': {'$in': batch_ids}, **data_filter})
+            deleted += result['deleted_count']
+        logger.info(f'{Collections.REQUEST_TRACKER}: archived {len(archived_ids)} rows to {path}, deleted {deleted}')
+        return {'path': path, 'archived': len(archived_ids), 'deleted': deleted}
+    finally:
+        await mongo_utils.release_lock(COMPACTION_LOCK)
+
+
+async def _compact_periodically() -> None:
+    while True:
+        try:
+            await compact_request_tracker()
+        except Exception as error:  # pylint: disable=broad-except
+            logger.exception(error)
+        await asyncio.sleep(config.COMPACTION_INTERVAL_SECONDS)
+
+
+def start() -> None:
+    global _compaction_task  # pylint: disable=global-statement
+    if config.COMPACTION_INTERVAL_SECONDS > 0 and (_compaction_task is None or _compaction_task.done()):
+        _compaction_task = asyncio.create_task(_compact_periodically())
+
+
+async def stop() -> None:
+    global _compaction_task  # pylint: disable=global-statement
+    if _compaction_task:
+        _compaction_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _compaction_task
+        _compaction_task = None
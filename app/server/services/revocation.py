@@ -0,0 +1,142 @@
+import asyncio
+import contextlib
+import time
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from fastapi import HTTPException, status
+
+import app.server.database.core_data as core_service
+from app.server.config import config
+from app.server.logger.custom_logger import logger
+from app.server.static.collections import Collections
+from app.server.static.enums import WriteProfile
+from app.server.utils.bloom_filter import BloomFilter
+
+
+class RevocationSet:
+    """In-memory view of the revoked_tokens collection used by the stateless JWTAuthUser mode.
+
+    A Bloom filter answers most checks without a lookup. The jtis loaded from the collection are also kept in an exact
+    map until their token expires, so only Bloom filter false positives go to the database. Every worker refreshes the
+    set incrementally every REVOCATION_REFRESH_SECONDS and rebuilds the filter every REVOCATION_REBUILD_SECONDS
+    to forget the expired tokens.
+    """
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.revoked: dict[str, int] = {}
+        self.watermark: Optional[int] = None
+        self.rebuilt_at = 0.0
+        self.checks = 0
+        self.filter_hits = 0
+        self.lookups = 0
+
+    def add(self, jti: str, exp: int) -> None:
+        if jti not in self.revoked:
+            self.bloom.add(jti)
+        self.revoked[jti] = exp
+
+    async def refresh(self) -> int:
+        """
+        Loads the revocations made since the previous refresh, all of them when the filter is due for a rebuild.
+        Revocations stamped within CHANGES_SAFETY_WINDOW_SECONDS of the watermark are read again, their writes may have committed late.
+
+        Returns:
+            int: number of revocations read
+        """
+        rebuild = self.watermark is None or time.monotonic() - self.rebuilt_at >= config.REVOCATION_REBUILD_SECONDS
+        data_filter: dict[str, Any] = {}
+        if not rebuild:
+            data_filter = {'created_at': {'$gte': self.watermark - config.CHANGES_SAFETY_WINDOW_SECONDS * 1000}}
+
+        bloom = BloomFilter(self.capacity, self.error_rate) if rebuild else self.bloom
+        revoked = {} if rebuild else self.revoked
+        now = int(time.time())
+        watermark = self.watermark or 0
+        read = 0
+        async for token in core_service.stream_many(Collections.REVOKED_TOKENS, data_filter, options={'exp': 1, 'created_at': 1}):
+            read += 1
+            watermark = max(watermark, token['created_at'])
+            if token['exp'] >= now and token['_id'] not in revoked:
+                bloom.add(token['_id'])
+                revoked[token['_id']] = token['exp']
+
+        if rebuild:
+            # revocations made by this worker while the collection was read
+            for jti, exp in self.revoked.items():
+                if jti not in revoked and exp >= now:
+                    bloom.add(jti)
+                    revoked[jti] = exp
+            self.bloom, self.revoked, self.rebuilt_at = bloom, revoked, time.monotonic()
+        self.watermark = watermark
+        if bloom.count > self.capacity:
+            logger.warning(f'{Collections.REVOKED_TOKENS}: {bloom.count} revocations exceed the filter capacity of {self.capacity}, raise REVOCATION_FILTER_CAPACITY')
+        return read
+
+    async def is_revoked(self, jti: str) -> bool:
+        """Checks a jti, reading the collection only when the Bloom filter matches a jti that was not loaded"""
+        self.checks += 1
+        if jti not in self.bloom:
+            return False
+        self.filter_hits += 1
+        if jti in self.revoked:
+            return True
+        self.lookups += 1
+        token = await core_service.read_one(Collections.REVOKED_TOKENS, jti)
+        if token:
+            self.add(jti, token['exp'])
+        return bool(token)
+
+    def stats(self) -> dict[str, Any]:
+        return {'revoked': len(self.revoked), 'filter_items': self.bloom.count, 'checks': self.checks, 'filter_hits': self.filter_hits, 'lookups': self.lookups}
+
+
+revoked_tokens = RevocationSet(config.REVOCATION_FILTER_CAPACITY, config.REVOCATION_FILTER_ERROR_RATE)
+_refresh_task: Optional[asyncio.Task] = None
+
+
+async def revoke(jti: str, exp: int) -> None:
+    """
+    Revokes an access token until it expires. The worker revoking it rejects it at once, the others after their next refresh.
+
+    Args:
+        jti (str): jti claim of the token
+        exp (int): exp claim of the token, in seconds
+    """
+    try:
+        # removed by the TTL index once the token has expired
+        await core_service.create_one(
+            Collections.REVOKED_TOKENS, {'_id': jti, 'exp': exp, 'expires_at': datetime.fromtimestamp(exp, timezone.utc)}, write_profile=WriteProfile.CRITICAL
+        )
+    except HTTPException as error:
+        # already revoked
+        if error.status_code != status.HTTP_409_CONFLICT:
+            raise
+    revoked_tokens.add(jti, exp)
+
+
+async def _refresh_periodically() -> None:
+    while True:
+        try:
+            await revoked_tokens.refresh()
+        except Exception as error:  # pylint: disable=broad-except
+            logger.exception(error)
+        await asyncio.sleep(config.REVOCATION_REFRESH_SECONDS)
+
+
+def start() -> None:
+    global _refresh_task  # pylint: disable=global-statement
+    if config.STATELESS_AUTH and (_refresh_task is None or _refresh_task.done()):
+        _refresh_task = asyncio.create_task(_refresh_periodically())
+
+
+async def stop() -> None:
+    global _refresh_task  # pylint: disable=global-statement
+    if _refresh_task:
+        _refresh_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _refresh_task
+        _refresh_task = None
@@ -3,7 +3,9 @@ class Collections:
     PASSPORT = 'passport'
     TEMP_PASSPORT = 'temp_passport'
     ACCESS_TOKENS = 'access_tokens'
+    REVOKED_TOKENS = 'revoked_tokens'
     RATE_LIMITS = 'rate_limits'
     REQUEST_TRACKER = 'request_tracker'
     NOTIFICATIONS = 'notifications'
     DEVICE_TOKENS = 'device_tokens'
+    LOCKS = 'locks'
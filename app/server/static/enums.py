@@ -38,3 +38,37 @@ class Gender(str, Enum):
 class AssignmentStatus(str, Enum):
     IN_PROGRESS = 'IN_PROGRESS'
     COMPLETED = 'COMPLETED'
+
+
+class PaginationMode(str, Enum):
+    OFFSET = 'offset'
+    CURSOR = 'cursor'
+
+
+class CountStrategy(str, Enum):
+    EXACT = 'exact'
+    CACHED = 'cached'
+    ESTIMATED = 'estimated'
+    NONE = 'none'
+
+
+class StreamFormat(str, Enum):
+    NDJSON = 'ndjson'
+    JSON = 'json'
+
+
+class ImportFormat(str, Enum):
+    CSV = 'csv'
+    NDJSON = 'ndjson'
+
+
+class ReadProfile(str, Enum):
+    PRIMARY = 'primary'
+    SECONDARY_PREFERRED = 'secondary_preferred'
+    NEAREST = 'nearest'
+    PRIMARY_MAJORITY = 'primary_majority'
+
+
+class WriteProfile(str, Enum):
+    TELEMETRY = 'telemetry'
+    CRITICAL = 'critical'
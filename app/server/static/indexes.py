@@ -0,0 +1,57 @@
+from pymongo import ASCENDING, TEXT, IndexModel
+
+from app.server.static.collections import Collections
+
+# Indexes every collection must have. mongo_utils.create_indexes creates the missing ones on startup, matching them by name.
+INDEXES: dict[str, list[IndexModel]] = {
+    Collections.USERS: [
+        IndexModel([('first_name', TEXT), ('last_name', TEXT)], name='first_name_text_last_name_text'),
+        # unique among active users only, the email of a soft deleted account can be registered again
+        IndexModel([('email', ASCENDING)], name='email_unique_active', unique=True, partialFilterExpression={'is_deleted': False}),
+        # multikey index on the edge n-grams of search_utils.get_user_search_fields, serves prefix and word searches
+        IndexModel([('search_ngrams', ASCENDING)], name='search_ngrams'),
+        # listing order of get_users_paginated, search_utils.NAME_SORT
+        IndexModel([('first_name', ASCENDING), ('last_name', ASCENDING), ('_id', ASCENDING)], name='first_name_last_name_id'),
+        # change cursor of core_data.read_changes
+        IndexModel([('updated_at', ASCENDING), ('_id', ASCENDING)], name='updated_at_id'),
+    ],
+    Collections.ACCESS_TOKENS: [
+        IndexModel([('user_id', ASCENDING), ('access_token', ASCENDING)], name='user_id_access_token'),
+        IndexModel([('user_id', ASCENDING), ('refresh_token', ASCENDING)], name='user_id_refresh_token'),
+        # expires_at is the expiry of the refresh token, documents from before it was added never expire
+        IndexModel([('expires_at', ASCENDING)], name='expires_at_ttl', expireAfterSeconds=0),
+    ],
+    Collections.REVOKED_TOKENS: [
+        # incremental refresh of revocation.RevocationSet
+        IndexModel([('created_at', ASCENDING)], name='created_at'),
+        IndexModel([('expires_at', ASCENDING)], name='expires_at_ttl', expireAfterSeconds=0),
+    ],
+    Collections.PASSPORT: [
+        IndexModel([('user_id', ASCENDING)], name='user_id'),
+    ],
+    Collections.TEMP_PASSPORT: [
+        # equality fields first, range field (expiry) last
+        IndexModel([('user_id', ASCENDING), ('is_used', ASCENDING), ('expiry', ASCENDING)], name='user_id_is_used_expiry'),
+        IndexModel([('expires_at', ASCENDING)], name='expires_at_ttl', expireAfterSeconds=0),
+    ],
+    Collections.REQUEST_TRACKER: [
+        IndexModel([('user_id', ASCENDING), ('ip', ASCENDING), ('path', ASCENDING)], name='user_id_ip_path_unique', unique=True),
+    ],
+    Collections.LOCKS: [
+        IndexModel([('expires_at', ASCENDING)], name='expires_at_ttl', expireAfterSeconds=0),
+    ],
+}
+
+# Filters of the hot queries, optionally followed by their sort, checked by mongo_utils.verify_hot_queries to not need a collection scan
+HOT_QUERIES: list[tuple] = [
+    (Collections.USERS, {'email': '', 'is_deleted': False}),
+    (Collections.USERS, {'search_ngrams': {'$all': ['']}}),
+    (Collections.USERS, {'is_deleted': False}, {'first_name': 1, 'last_name': 1, '_id': 1}),
+    (Collections.USERS, {'updated_at': {'$gt': 0, '$lte': 0}}),
+    (Collections.ACCESS_TOKENS, {'user_id': '', 'user_type': '', 'access_token': ''}),
+    (Collections.ACCESS_TOKENS, {'user_id': '', 'refresh_token': ''}),
+    (Collections.REVOKED_TOKENS, {'created_at': {'$gte': 0}}),
+    (Collections.PASSPORT, {'user_id': ''}),
+    (Collections.TEMP_PASSPORT, {'user_id': '', 'expiry': {'$gte': 0}, 'is_used': False, 'password': ''}),
+    (Collections.REQUEST_TRACKER, {'user_id': '', 'ip': '', 'path': ''}),
+]
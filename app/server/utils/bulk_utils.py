@@ -0,0 +1,43 @@
+from typing import Any, Iterator
+
+import bson
+
+# bson overhead of the command envelope of one operation, added to the size of its documents
+OPERATION_OVERHEAD_BYTES = 16
+
+
+def get_operation_size(operation: Any) -> int:
+    """Estimates the encoded size of a pymongo bulk operation (InsertOne, UpdateOne, ReplaceOne, DeleteOne, ...) from its documents"""
+    size = OPERATION_OVERHEAD_BYTES
+    for attribute in ('_filter', '_doc'):
+        document = getattr(operation, attribute, None)
+        if isinstance(document, dict):
+            size += len(bson.encode(document))
+        elif isinstance(document, list):
+            # update pipelines
+            size += len(bson.encode({'u': document}))
+    return size
+
+
+def chunk_operations(operations: list[Any], max_count: int, max_bytes: int) -> Iterator[tuple[int, list[Any]]]:
+    """
+    Splits bulk operations into chunks of at most `max_count` operations and about `max_bytes` encoded bytes.
+    An operation larger than `max_bytes` gets a chunk of its own.
+
+    Args:
+        operations (list): pymongo bulk operations
+        max_count (int): maximum number of operations per chunk
+        max_bytes (int): maximum estimated size of a chunk
+
+    Yields:
+        tuple[int, list]: index of the first operation of the chunk in `operations` and the chunk
+    """
+    start, size = 0, 0
+    for index, operation in enumerate(operations):
+        operation_size = get_operation_size(operation)
+        if index > start and (index - start >= max_count or size + operation_size > max_bytes):
+            yield start, operations[start:index]
+            start, size = index, 0
+        size += operation_size
+    if start < len(operations):
+        yield start, operations[start:]
@@ -61,6 +61,19 @@ def get_current_date_time() -> datetime.datetime:
     return datetime.datetime.now(timezone.utc)
 
 
+def get_date_time_from_timestamp(timestamp: int) -> datetime.datetime:
+    """
+    Converts a Unix epoch timestamp in milliseconds to a datetime, e.g. for fields read by TTL indexes which require BSON dates.
+
+    Args:
+        timestamp (int): The Unix epoch timestamp in milliseconds.
+
+    Returns:
+        datetime.datetime: A datetime object in UTC timezone.
+    """
+    return datetime.datetime.fromtimestamp(timestamp / 1000, timezone.utc)
+
+
 def get_n_previous_day_timestamp(days) -> int:
     """
     Returns the UNIX timestamp in milliseconds of `days` number of days ago at midnight UTC.
@@ -0,0 +1,55 @@
+import csv
+from typing import Any, AsyncIterator, Union
+
+import orjson
+
+from app.server.static.enums import ImportFormat
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Splits a stream of bytes, e.g. Request.stream(), into decoded lines without reading it whole"""
+    pending = b''
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            yield line.decode('utf-8-sig').rstrip('\r')
+    if pending:
+        yield pending.decode('utf-8-sig').rstrip('\r')
+
+
+async def iter_records(chunks: AsyncIterator[bytes], import_format: ImportFormat) -> AsyncIterator[tuple[int, Union[dict[str, Any], str]]]:
+    """
+    Parses an upload into records, one per line. CSV uploads start with a header row naming the fields, quoted values
+    cannot span lines. Blank lines are skipped.
+
+    Args:
+        chunks (AsyncIterator[bytes]): upload body
+        import_format (ImportFormat): csv or ndjson
+
+    Returns:
+        AsyncIterator[tuple[int, Union[dict, str]]]: line number with the record, or with the parse error of the line
+    """
+    header = None
+    line_number = 0
+    async for line in iter_lines(chunks):
+        line_number += 1
+        if not line.strip():
+            continue
+        if import_format == ImportFormat.NDJSON:
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                yield line_number, 'Invalid JSON'
+                continue
+            yield line_number, record if isinstance(record, dict) else 'Expected a JSON object'
+            continue
+
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [field.strip() for field in values]
+        elif len(values) != len(header):
+            yield line_number, f'Expected {len(header)} columns, got {len(values)}'
+        else:
+            # empty cells are missing values
+            yield line_number, {field: value for field, value in zip(header, values) if value != ''}
@@ -0,0 +1,120 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import time
+from calendar import timegm
+from datetime import datetime
+from typing import Any, Union
+
+import orjson
+from jose.exceptions import ExpiredSignatureError, JWTClaimsError, JWTError
+
+from app.server.config import config
+
+# header python-jose writes for HS256 tokens: {"alg":"HS256","typ":"JWT"} with sorted keys and no whitespace
+_HEADER = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b'=')
+_TIME_CLAIMS = ('exp', 'iat', 'nbf')
+
+
+def _b64_decode(segment: bytes) -> bytes:
+    return base64.urlsafe_b64decode(segment + b'=' * (-len(segment) % 4))
+
+
+def _to_int(claims: dict[str, Any], claim: str, name: str) -> int:
+    try:
+        return int(claims[claim])
+    except (TypeError, ValueError) as error:
+        raise JWTClaimsError(f'{name} claim ({claim}) must be an integer.') from error
+
+
+class HS256Codec:
+    """HS256 JWT encoder and decoder producing and accepting the same tokens as python-jose.
+
+    The HMAC key schedule is computed once and copied per token, claims are serialized with orjson and only the
+    exp, iat, nbf and aud claims are validated, like jose.jwt.decode does for the tokens of this app.
+    Errors are the jose exceptions so existing handlers keep working.
+    """
+
+    def __init__(self, secret: Union[str, bytes]) -> None:
+        self._hmac = hmac.new(secret.encode() if isinstance(secret, str) else secret, digestmod=hashlib.sha256)
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        mac = self._hmac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+    def encode(self, claims: dict[str, Any]) -> str:
+        """Encodes claims into a signed token, datetimes of exp, iat and nbf become NumericDates like jose.jwt.encode does
+
+        Args:
+            claims (dict): claims of the token
+
+        Returns:
+            str: compact serialized token
+        """
+        for claim in _TIME_CLAIMS:
+            if isinstance(claims.get(claim), datetime):
+                claims = {**claims, claim: timegm(claims[claim].utctimetuple())}
+        signing_input = _HEADER + b'.' + base64.urlsafe_b64encode(orjson.dumps(claims)).rstrip(b'=')
+        return (signing_input + b'.' + base64.urlsafe_b64encode(self._sign(signing_input)).rstrip(b'=')).decode()
+
+    def decode(self, token: Union[str, bytes]) -> dict[str, Any]:
+        """Verifies the signature and the time claims of a token
+
+        Args:
+            token (str): compact serialized token
+
+        Raises:
+            JWTError: if the token is malformed, not HS256 or its signature does not match
+            ExpiredSignatureError: if the token has expired
+            JWTClaimsError: if a time claim is not an integer, the token is not yet valid or has an audience
+
+        Returns:
+            dict[str, Any]: claims of the token
+        """
+        if isinstance(token, str):
+            token = token.encode()
+        try:
+            signing_input, signature_segment = token.rsplit(b'.', 1)
+            header_segment, payload_segment = signing_input.split(b'.', 1)
+        except ValueError as error:
+            raise JWTError('Not enough segments') from error
+
+        if header_segment != _HEADER:
+            # same header with a different serialization, e.g. from another library
+            try:
+                header = orjson.loads(_b64_decode(header_segment))
+            except (binascii.Error, orjson.JSONDecodeError) as error:
+                raise JWTError('Error decoding token headers.') from error
+            if not isinstance(header, dict) or header.get('alg') != 'HS256':
+                raise JWTError('The specified alg value is not allowed')
+
+        try:
+            signature = _b64_decode(signature_segment)
+        except binascii.Error as error:
+            raise JWTError('Invalid crypto padding') from error
+        if not hmac.compare_digest(signature, self._sign(signing_input)):
+            raise JWTError('Signature verification failed.')
+
+        try:
+            claims = orjson.loads(_b64_decode(payload_segment))
+        except (binascii.Error, orjson.JSONDecodeError) as error:
+            raise JWTError('Invalid payload string') from error
+        if not isinstance(claims, dict):
+            raise JWTError('Invalid payload string: must be a json object')
+
+        now = int(time.time())
+        if 'iat' in claims:
+            _to_int(claims, 'iat', 'Issued At')
+        if 'nbf' in claims and _to_int(claims, 'nbf', 'Not Before') > now:
+            raise JWTClaimsError('The token is not yet valid (nbf)')
+        if 'exp' in claims and _to_int(claims, 'exp', 'Expiration Time') < now:
+            raise ExpiredSignatureError('Signature has expired.')
+        if 'aud' in claims:
+            # no audience is expected, jose rejects tokens carrying one
+            raise JWTClaimsError('Invalid audience')
+        return claims
+
+
+hs256 = HS256Codec(config.JWT_SECRET)
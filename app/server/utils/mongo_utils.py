@@ -1,8 +1,132 @@
-import pymongo
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+from uuid import uuid4
 
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from app.server.database.cache import plan_cache
 from app.server.database.db import mongo
+from app.server.logger.custom_logger import logger
 from app.server.static.collections import Collections
+from app.server.static.indexes import HOT_QUERIES, INDEXES
+
+# identifies the locks held by this worker process
+WORKER_ID = uuid4().hex
+
+
+async def acquire_lock(name: str, ttl: timedelta = timedelta(minutes=5)) -> bool:
+    """
+    Acquires a lock shared by every worker, backed by a document in the locks collection.
+    A lock that is not released expires after `ttl` and can then be taken over.
+
+    Args:
+        name (str): lock name
+        ttl (timedelta): time after which the lock is considered abandoned
+
+    Returns:
+        bool: True if this worker now holds the lock
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        await mongo.get_collection(Collections.LOCKS).update_one({'_id': name, 'expires_at': {'$lt': now}}, {'$set': {'owner': WORKER_ID, 'expires_at': now + ttl}}, upsert=True)
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+async def extend_lock(name: str, ttl: timedelta = timedelta(minutes=5)) -> bool:
+    """Pushes back the expiry of a lock held by this worker, e.g. between the batches of a long job. Returns False if the lock was lost."""
+    result = await mongo.get_collection(Collections.LOCKS).update_one({'_id': name, 'owner': WORKER_ID}, {'$set': {'expires_at': datetime.now(timezone.utc) + ttl}})
+    return result.matched_count == 1
+
+
+async def wait_for_lock(name: str, poll_interval: float = 0.5) -> None:
+    """Waits until a lock is released or has expired"""
+    while await mongo.get_collection(Collections.LOCKS).find_one({'_id': name, 'expires_at': {'$gte': datetime.now(timezone.utc)}}, {'_id': 1}):
+        await asyncio.sleep(poll_interval)
+
+
+async def release_lock(name: str) -> None:
+    await mongo.get_collection(Collections.LOCKS).delete_one({'_id': name, 'owner': WORKER_ID})
 
 
 async def create_indexes():
-    await mongo.get_collection(Collections.USERS).create_index([('first_name', pymongo.TEXT), ('last_name', pymongo.TEXT)], background=True)
+    """
+    Reconciles the index registry with the database, creating only the indexes missing from index_information().
+    Runs under a cross-worker lock so a multi-worker start builds each index once. Indexes that exist with the
+    same name but a different definition are reported and left untouched. A worker finding the lock taken waits for its release
+    and then reconciles too, finding the indexes built, so the hot query check never runs while another worker is still building them.
+    """
+    while not await acquire_lock('create_indexes'):
+        logger.debug('Index reconciliation running in another worker, waiting for it')
+        await wait_for_lock('create_indexes')
+    try:
+        for collection_name, indexes in INDEXES.items():
+            collection = mongo.get_collection(collection_name)
+            existing_indexes = await collection.index_information()
+            for index in indexes:
+                name = index.document['name']
+                if name in existing_indexes:
+                    # text indexes are reported with their internal _fts/_ftsx keys
+                    is_text_index = 'text' in index.document['key'].values()
+                    if not is_text_index and list(existing_indexes[name]['key']) != list(index.document['key'].items()):
+                        logger.warning(f'{collection_name}: index {name} differs from the registry, drop it to rebuild')
+                    continue
+                try:
+                    await collection.create_indexes([index])
+                    logger.debug(f'{collection_name}: created index {name}')
+                    # cached plans were estimated without the new index
+                    plan_cache.clear()
+                except OperationFailure as error:
+                    logger.error(f'{collection_name}: failed to create index {name}: {error}')
+    finally:
+        await release_lock('create_indexes')
+
+
+def get_plan_stages(plan: dict[str, Any]) -> list[str]:
+    """Flattens the stage names of an explain plan"""
+    stages = [plan['stage']] if 'stage' in plan else []
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            stages += get_plan_stages(plan[key])
+    for input_stage in plan.get('inputStages', []):
+        stages += get_plan_stages(input_stage)
+    return stages
+
+
+async def explain_find(
+    collection_name: str, data_filter: dict[str, Any], verbosity: str = 'queryPlanner', sort: Optional[dict[str, Any]] = None, limit: Optional[int] = None
+) -> dict[str, Any]:
+    find = {'find': collection_name, 'filter': data_filter}
+    if sort:
+        find['sort'] = sort
+    if limit:
+        find['limit'] = limit
+    return await mongo.command({'explain': find, 'verbosity': verbosity})
+
+
+async def verify_hot_queries():
+    """
+    Check mode of the index registry: explains every registered hot query and fails if one would run a COLLSCAN.
+
+    Raises:
+        RuntimeError: listing the hot queries without a supporting index
+    """
+    collection_scans = []
+    for collection_name, data_filter, *sort in HOT_QUERIES:
+        explain = await explain_find(collection_name, data_filter, sort=sort[0] if sort else None)
+        if 'COLLSCAN' in get_plan_stages(explain['queryPlanner']['winningPlan']):
+            query = f'{collection_name}: {list(data_filter)}'
+            collection_scans.append(f'{query} sorted by {list(sort[0])}' if sort else query)
+    if collection_scans:
+        raise RuntimeError(f'Hot queries running a COLLSCAN: {collection_scans}')
+
+
+if __name__ == '__main__':
+    # python -m app.server.utils.mongo_utils: create the missing indexes, then check the hot queries
+    async def _check_indexes():
+        await create_indexes()
+        await verify_hot_queries()
+
+    asyncio.run(_check_indexes())
@@ -0,0 +1,177 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Optional
+
+import orjson
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+from fastapi import HTTPException, status
+
+MAX_PAGE_SIZE = 100
+DEFAULT_PAGE_SIZE = 10
+CURSOR_NEXT = 'next'
+CURSOR_PREV = 'prev'
+
+
+def get_page_size(page_size: Optional[int]) -> int:
+    return min(page_size, MAX_PAGE_SIZE) if page_size else DEFAULT_PAGE_SIZE
+
+
+def get_sort_fields(sort: Optional[dict[str, Any]]) -> list[tuple[str, int]]:
+    """
+    Builds the keyset sort spec. `_id` is appended as the final tie breaker so that the sort order is total.
+
+    Args:
+        sort (dict): sort spec in the form {field: 1 | -1}
+
+    Returns:
+        list[tuple[str, int]]: ordered list of (field, direction)
+    """
+    sort_fields = [(field, -1 if direction in (-1, '-1', 'desc', 'descending') else 1) for field, direction in (sort or {}).items()]
+    if '_id' not in dict(sort_fields):
+        sort_fields.append(('_id', sort_fields[-1][1] if sort_fields else 1))
+    return sort_fields
+
+
+def get_field_value(document: dict[str, Any], field: str) -> Any:
+    value: Any = document
+    for key in field.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _encode_value(value: Any) -> Any:
+    # sort values keep their BSON type, a string never matches an ObjectId or a date in the keyset filter
+    if isinstance(value, ObjectId):
+        return {'$oid': str(value)}
+    if isinstance(value, datetime):
+        return {'$date': value.isoformat()}
+    if isinstance(value, dict):
+        return {key: _encode_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode_value(item) for item in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise TypeError(f'{type(value).__name__} sort values cannot be encoded in a cursor')
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if list(value) == ['$oid']:
+            return ObjectId(value['$oid'])
+        if list(value) == ['$date']:
+            return datetime.fromisoformat(value['$date'])
+        return {key: _decode_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode_value(item) for item in value]
+    return value
+
+
+def encode_cursor(document: dict[str, Any], sort_fields: list[tuple[str, int]], direction: str) -> str:
+    """
+    Encodes the sort key of a document into an opaque cursor. ObjectId and datetime values are tagged to be restored with their type.
+
+    Args:
+        document (dict): boundary document of the page
+        sort_fields (list): keyset sort spec
+        direction (str): 'next' to read the page after the document, 'prev' to read the page before it
+
+    Returns:
+        str: url safe cursor
+    """
+    payload = {'f': [field for field, _ in sort_fields], 'v': [_encode_value(get_field_value(document, field)) for field, _ in sort_fields], 'd': direction}
+    return base64.urlsafe_b64encode(orjson.dumps(payload)).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, sort_fields: list[tuple[str, int]]) -> tuple[list[Any], str]:
+    """
+    Decodes a cursor produced by `encode_cursor`.
+
+    Raises:
+        HTTPException: if the cursor is malformed or was issued for a different sort order
+
+    Returns:
+        tuple[list[Any], str]: sort key values and direction
+    """
+    try:
+        payload = orjson.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        values, direction, fields = [_decode_value(value) for value in payload['v']], payload['d'], payload['f']
+    except (binascii.Error, ValueError, TypeError, KeyError, InvalidId) as error:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail='Invalid pagination cursor') from error
+    if fields != [field for field, _ in sort_fields] or direction not in (CURSOR_NEXT, CURSOR_PREV):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail='Invalid pagination cursor')
+    return values, direction
+
+
+def _after_condition(operator: str, value: Any) -> Optional[dict[str, Any]]:
+    # comparison operators only match values of the same BSON type, and null sorts before every other type
+    if value is None:
+        return {'$ne': None} if operator == '$gt' else None
+    if operator == '$lt':
+        return {'$not': {'$gte': value}}
+    return {operator: value}
+
+
+def get_keyset_filter(sort_fields: list[tuple[str, int]], values: list[Any], backward: bool = False) -> dict[str, Any]:
+    """
+    Builds the filter selecting documents strictly after (or before when `backward`) the given sort key,
+    i.e. (f1 > v1) or (f1 = v1 and f2 > v2) or ...
+
+    Args:
+        sort_fields (list): keyset sort spec
+        values (list): sort key values of the boundary document
+        backward (bool): select documents before the boundary instead of after
+
+    Returns:
+        dict[str, Any]: mongo filter
+    """
+    clauses = []
+    for index, (field, direction) in enumerate(sort_fields):
+        operator = '$gt' if (direction == 1) != backward else '$lt'
+        condition = _after_condition(operator, values[index])
+        if condition is None:
+            continue
+        clause = {prev_field: values[prev_index] for prev_index, (prev_field, _) in enumerate(sort_fields[:index])}
+        clause[field] = condition
+        clauses.append(clause)
+    if not clauses:
+        return {'_id': {'$exists': False}}
+    return {'$or': clauses} if len(clauses) > 1 else clauses[0]
+
+
+def get_sort_spec(sort_fields: list[tuple[str, int]], backward: bool = False) -> dict[str, int]:
+    return {field: -direction if backward else direction for field, direction in sort_fields}
+
+
+def get_keyset_page(documents: list[dict[str, Any]], sort_fields: list[tuple[str, int]], page_size: int, cursor_direction: Optional[str]) -> dict[str, Any]:
+    """
+    Trims the page_size + 1 documents fetched for a keyset page and builds its metadata.
+
+    Args:
+        documents (list): documents read in the fetch order (reversed order for 'prev' cursors)
+        sort_fields (list): keyset sort spec
+        page_size (int): number of documents per page
+        cursor_direction (str, optional): direction of the cursor the page was read with, None for the first page
+
+    Returns:
+        dict[str, Any]: page data and metadata with next/prev cursors
+    """
+    has_more = len(documents) > page_size
+    data = documents[:page_size]
+    if cursor_direction == CURSOR_PREV:
+        data.reverse()
+        has_next_page, has_prev_page = True, has_more
+    else:
+        has_next_page, has_prev_page = has_more, cursor_direction is not None
+
+    metadata = {
+        'page_size': page_size,
+        'has_next_page': has_next_page,
+        'has_prev_page': has_prev_page,
+        'next_cursor': encode_cursor(data[-1], sort_fields, CURSOR_NEXT) if data and has_next_page else None,
+        'prev_cursor': encode_cursor(data[0], sort_fields, CURSOR_PREV) if data and has_prev_page else None,
+    }
+    return {'data': data, 'metadata': metadata}
@@ -1,3 +1,8 @@
+import hashlib
+
+import orjson
+
+
 def get_agg_projections(*args, include=True):
     projection = get_projections(*args, include)
     return {'$project': projection}
@@ -5,3 +10,71 @@ def get_agg_projections(*args, include=True):
 
 def get_projections(*args, include=True):
     return {arg: 1 if include else 0 for arg in args}
+
+
+def get_query_key(*parts) -> str:
+    """Serializes filters, projections and pipelines into a string usable as a cache key.
+    Key order is preserved since it is significant for sort specs and embedded document equality."""
+    return orjson.dumps(parts, default=_encode_key_value).decode()
+
+
+def _encode_key_value(value):
+    return f'{type(value).__name__}:{value}'
+
+
+def get_pipeline_fingerprint(*parts) -> str:
+    """Returns a short stable digest of a collection name and pipeline, used to key cached aggregation results"""
+    return hashlib.sha1(get_query_key(*parts).encode()).hexdigest()
+
+
+def normalize_query_shape(value):
+    """Replaces the literal values of a filter or pipeline with '?' keeping its operators and field names"""
+    if isinstance(value, dict):
+        return {key: normalize_query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if any(isinstance(item, (dict, list, tuple)) for item in value):
+            return [normalize_query_shape(item) for item in value]
+        # arrays of literals ($in, $nin, $all ...) collapse to a single placeholder whatever their length
+        return '?'
+    return '?'
+
+
+def get_query_shape(value) -> str:
+    """Returns the normalized fingerprint of a filter or pipeline, identical for queries differing only by their values"""
+    return orjson.dumps(normalize_query_shape(value), option=orjson.OPT_SORT_KEYS).decode()
+
+
+def apply_projection(document: dict, projection: dict = None) -> dict:
+    """Applies a find() projection of fields with value 1 or 0 to a document in process. Nested fields use dotted paths."""
+    if not projection or not document:
+        return document
+    if any(value for key, value in projection.items() if key != '_id'):
+        projected = {'_id': document['_id']} if projection.get('_id', 1) and '_id' in document else {}
+        for path, value in projection.items():
+            if path == '_id' or not value:
+                continue
+            source, target = document, projected
+            *parents, field = path.split('.')
+            for parent in parents:
+                if not isinstance(source.get(parent), dict):
+                    break
+                source, target = source[parent], target.setdefault(parent, {})
+            else:
+                if field in source:
+                    target[field] = source[field]
+        return projected
+
+    projected = dict(document)
+    for path, value in projection.items():
+        if value:
+            continue
+        *parents, field = path.split('.')
+        target = projected
+        for parent in parents:
+            if not isinstance(target.get(parent), dict):
+                break
+            target[parent] = dict(target[parent])
+            target = target[parent]
+        else:
+            target.pop(field, None)
+    return projected
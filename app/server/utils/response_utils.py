@@ -0,0 +1,48 @@
+from typing import Any, AsyncIterator
+
+import orjson
+from fastapi.responses import StreamingResponse
+
+from app.server.logger.custom_logger import logger
+from app.server.static.enums import StreamFormat
+
+
+def _dumps(document: dict[str, Any]) -> bytes:
+    return orjson.dumps(document, default=str)
+
+
+async def _ndjson_lines(documents: AsyncIterator[dict[str, Any]]) -> AsyncIterator[bytes]:
+    try:
+        async for document in documents:
+            yield _dumps(document) + b'\n'
+    except Exception as error:  # pylint: disable=broad-except
+        # headers are already sent, the truncated body is the only signal left to the client
+        logger.exception(error)
+
+
+async def _json_array(documents: AsyncIterator[dict[str, Any]]) -> AsyncIterator[bytes]:
+    yield b'{"data":['
+    separator = b''
+    try:
+        async for document in documents:
+            yield separator + _dumps(document)
+            separator = b','
+    except Exception as error:  # pylint: disable=broad-except
+        logger.exception(error)
+        return
+    yield b'],"status":"SUCCESS"}'
+
+
+def stream_response(documents: AsyncIterator[dict[str, Any]], stream_format: StreamFormat = StreamFormat.NDJSON) -> StreamingResponse:
+    """Streams documents to the client as they are read, keeping memory constant regardless of the number of documents
+
+    Args:
+        documents (AsyncIterator): documents, e.g. from core_data.stream_many or core_data.stream_query
+        stream_format (StreamFormat): ndjson writes one document per line, json writes the usual {'data': [...], 'status': 'SUCCESS'} body incrementally
+
+    Returns:
+        StreamingResponse: response streaming the serialized documents
+    """
+    if stream_format == StreamFormat.NDJSON:
+        return StreamingResponse(_ndjson_lines(documents), media_type='application/x-ndjson')
+    return StreamingResponse(_json_array(documents), media_type='application/json')
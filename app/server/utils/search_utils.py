@@ -0,0 +1,81 @@
+import re
+import unicodedata
+from typing import Any, Optional
+
+from app.server.config import config
+
+# longer query tokens are truncated to this length, the longest indexed prefix
+MAX_NGRAM_LENGTH = 15
+# shorter query words are ignored, a single character matches most users
+MIN_TERM_LENGTH = 2
+# queries without a word this long match too many users to rank, they are sorted by name instead
+MIN_SCORED_TERM_LENGTH = 3
+# listing order of users, served by the first_name_last_name index
+NAME_SORT = {'first_name': 1, 'last_name': 1, '_id': 1}
+# user fields the search fields are computed from
+USER_SEARCH_SOURCE_FIELDS = ('first_name', 'last_name', 'email')
+# keeps the search fields out of responses
+SEARCH_FIELDS_PROJECTION = {'search_keys': 0, 'search_ngrams': 0}
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def normalize(text: Optional[str]) -> str:
+    """Lower cases, strips accents and replaces everything but letters and digits with single spaces, 'José-Luis' becomes 'jose luis'"""
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return _NON_WORD.sub(' ', text.lower()).strip()
+
+
+def get_search_keys(*values: Optional[str]) -> list[str]:
+    """Distinct normalized words of the given values, in order"""
+    return list(dict.fromkeys(word for value in values for word in normalize(value).split()))
+
+
+def get_edge_ngrams(words: list[str], max_length: int = MAX_NGRAM_LENGTH) -> list[str]:
+    """Distinct prefixes of every word up to max_length characters, 'ann' gives ['a', 'an', 'ann']"""
+    return list(dict.fromkeys(word[:length] for word in words for length in range(1, min(len(word), max_length) + 1)))
+
+
+def get_user_search_fields(user: dict[str, Any]) -> dict[str, list[str]]:
+    """
+    Search fields stored on a user document: the normalized words of the names and of the local part of the email
+    as search_keys, and their edge n-grams as search_ngrams for prefix matching.
+
+    Args:
+        user (dict): user document or update holding first_name, last_name and email
+
+    Returns:
+        dict[str, list[str]]: search_keys and search_ngrams
+    """
+    email = user.get('email') or ''
+    search_keys = get_search_keys(user.get('first_name'), user.get('last_name'), email.split('@')[0])
+    return {'search_keys': search_keys, 'search_ngrams': get_edge_ngrams(search_keys)}
+
+
+def get_search_pipeline(query: str) -> list[dict[str, Any]]:
+    """
+    Pipeline stages matching the active users whose search_ngrams hold a prefix of every word of the query, words shorter
+    than MIN_TERM_LENGTH are ignored. If a word has at least MIN_SCORED_TERM_LENGTH characters, the first SEARCH_CANDIDATE_LIMIT
+    matches are sorted by relevance: users where more query words are whole words come first. Shorter queries are sorted by name.
+
+    Args:
+        query (str): search query
+
+    Returns:
+        list[dict[str, Any]]: $match, $limit, $addFields, $project and $sort stages, empty if the query has no words
+    """
+    words = [word[:MAX_NGRAM_LENGTH] for word in get_search_keys(query) if len(word) >= MIN_TERM_LENGTH]
+    if not words:
+        return []
+    match = {'$match': {'is_deleted': False, 'search_ngrams': {'$all': words}}}
+    if max(len(word) for word in words) < MIN_SCORED_TERM_LENGTH:
+        return [match, {'$project': SEARCH_FIELDS_PROJECTION}, {'$sort': NAME_SORT}]
+    return [
+        match,
+        # bounds the in-memory relevance sort
+        {'$limit': config.SEARCH_CANDIDATE_LIMIT},
+        {'$addFields': {'search_score': {'$size': {'$setIntersection': [{'$ifNull': ['$search_keys', []]}, words]}}}},
+        {'$project': SEARCH_FIELDS_PROJECTION},
+        {'$sort': {'search_score': -1, **NAME_SORT}},
+    ]
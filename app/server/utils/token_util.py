@@ -1,21 +1,31 @@
-import asyncio
+import hashlib
 import secrets
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, Optional
 
-from fastapi import HTTPException, status
+from bson.objectid import ObjectId
+from fastapi import HTTPException, Request, status
 from fastapi.param_functions import Depends
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBasic, HTTPBasicCredentials, HTTPBearer
-from jose import jwt
+from jose import JWTError
+from user_agents import parse
 
 import app.server.database.core_data as core_service
 from app.server.config import config
+from app.server.database.cache import auth_user_cache, claims_cache
+from app.server.database.write_behind import write_buffer
+from app.server.services import revocation
 from app.server.static import localization
 from app.server.static.collections import Collections
 from app.server.static.enums import AccountStatus, TokenType
 from app.server.utils import date_utils
+from app.server.utils.jwt_codec import hs256
 
 security_basic = HTTPBasic()
+RESERVED_CLAIMS = ('iss', 'sub', 'aud', 'exp', 'nbf', 'iat', 'jti')
+# user fields deciding whether an access token is accepted by JWTAuthUser
+AUTH_USER_FIELDS = {'account_status', 'is_deleted', 'user_type'}
 
 
 def authorize_docs(credentials: HTTPBasicCredentials = Depends(security_basic)):
@@ -41,12 +51,17 @@ def create_jwt_token(payload: dict[str, Any], expires_delta: timedelta = timedel
     now = datetime.now(timezone.utc)
     expire = now + expires_delta
     exp_timestamp = int(expire.timestamp() * 1000)
-    to_encode.update({'token_type': token_type, 'iat': now, 'exp': expire})
-    return jwt.encode(to_encode, config.JWT_SECRET, algorithm='HS256'), exp_timestamp
+    # jti identifies the token in revoked_tokens
+    to_encode.update({'token_type': token_type, 'iat': now, 'exp': expire, 'jti': str(ObjectId())})
+    return hs256.encode(to_encode), exp_timestamp
+
+
+def get_token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
 
 
 def verify_jwt_token(token: str, remove_reserved_claims: bool = False) -> dict[str, Any]:
-    """Verifies jwt token signature
+    """Verifies jwt token signature. Verified claims are cached until the token expires, keyed by a digest of the token.
 
     Args:
         token (jwt-token): token that needs to be verified
@@ -54,17 +69,89 @@ def verify_jwt_token(token: str, remove_reserved_claims: bool = False) -> dict[s
     Returns:
         [JSON]: JSON payload of the decoded token
     """
-    decoded_token = jwt.decode(token, config.JWT_SECRET, algorithms=['HS256'])
+    token_key = get_token_key(token)
+    claims = claims_cache.get(token_key)
+    if claims is None:
+        claims = hs256.decode(token)
+        claims_cache.set(token_key, claims, ttl=claims['exp'] - time.time() if isinstance(claims.get('exp'), (int, float)) else 0)
+    decoded_token = dict(claims)
     if remove_reserved_claims:
-        reserved_claims = ['iss', 'sub', 'aud', 'exp', 'nbf', 'iat', 'jti']
-        for key in reserved_claims:
+        for key in RESERVED_CLAIMS:
             if key in decoded_token:
                 del decoded_token[key]
     return decoded_token
 
 
-async def update_last_active(user_id: int) -> None:
-    await core_service.update_one(Collections.USERS, data_filter={'_id': user_id}, update={'$set': {'last_active': date_utils.get_current_timestamp()}})
+class RequestAuthContext:
+    """Authorization and user agent details of a request, each parsed on first use and shared by the tracker middleware,
+    JWTAuthUser and get_user_agent through request.state.auth so a request verifies its token at most once"""
+
+    __slots__ = ('_headers', '_token', '_claims', '_error', '_agent')
+    _UNSET = object()
+
+    def __init__(self, headers: Any) -> None:
+        self._headers = headers
+        self._token = self._UNSET
+        self._claims = self._UNSET
+        self._error: Optional[Exception] = None
+        self._agent = self._UNSET
+
+    @property
+    def token(self) -> Optional[str]:
+        """Bearer token of the Authorization header, None if there is none"""
+        if self._token is self._UNSET:
+            parts = self._headers.get('authorization', '').split()
+            self._token = parts[1] if len(parts) == 2 and parts[0].lower() == 'bearer' and parts[1] != 'null' else None
+        return self._token
+
+    def get_claims(self, token: Optional[str] = None) -> dict[str, Any]:
+        """
+        Verified claims of the bearer token. The result, or the verification error, is kept for the rest of the request.
+
+        Args:
+            token (str, optional): token to verify instead when it differs from the bearer token of the headers
+
+        Raises:
+            JWTError: if there is no token or it does not verify
+
+        Returns:
+            dict[str, Any]: claims of the token
+        """
+        if token is not None and token != self.token:
+            return verify_jwt_token(token)
+        if self._claims is self._UNSET:
+            try:
+                if self.token is None:
+                    raise JWTError('Missing bearer token')
+                self._claims = verify_jwt_token(self.token)
+            except JWTError as error:
+                self._claims, self._error = None, error
+        if self._error:
+            raise self._error
+        return self._claims
+
+    @property
+    def agent(self) -> dict[str, Any]:
+        """Operating system, device and browser of the User-Agent header"""
+        if self._agent is self._UNSET:
+            agent_details = parse(self._headers.get('user-agent') or '')
+            self._agent = {
+                'os': agent_details.os.family,
+                'device': f'{agent_details.device.brand}:{agent_details.device.model}',
+                'browser': f'{agent_details.browser.family}:{agent_details.browser.version_string}',
+            }
+        return self._agent
+
+
+def get_auth_context(request: Request) -> RequestAuthContext:
+    context = getattr(request.state, 'auth', None)
+    if context is None:
+        context = request.state.auth = RequestAuthContext(request.headers)
+    return context
+
+
+def update_last_active(user_id: str) -> None:
+    write_buffer.enqueue(Collections.USERS, data_filter={'_id': user_id}, update={'$set': {'last_active': date_utils.get_current_timestamp()}})
 
 
 async def get_current_user(user_data: dict[str, Any], token: str) -> dict[str, Any]:
@@ -85,6 +172,43 @@ async def get_current_user(user_data: dict[str, Any], token: str) -> dict[str, A
     return users[0] if users else {}
 
 
+async def get_authenticated_user(user_data: dict[str, Any], token: str) -> dict[str, Any]:
+    """
+    get_current_user cached per access token for AUTH_USER_CACHE_TTL_SECONDS. Entries are dropped when access tokens
+    are updated or deleted and when the account status, deletion or type of a user changes.
+
+    Args:
+        user_data (dict): verified claims of the token
+        token (str): access token
+
+    Returns:
+        dict[str, Any]: user of the token, empty if the token is unknown or the user deleted
+    """
+    token_key = get_token_key(token)
+    user = auth_user_cache.get(token_key)
+    if user is None:
+        generation = auth_user_cache.generation
+        user = await get_current_user(user_data, token)
+        if user:
+            auth_user_cache.set(token_key, user, generation=generation)
+    return user
+
+
+def _on_access_token_write(operation: str, _fields: Optional[set[str]]) -> None:
+    # new tokens do not affect the cached users
+    if operation != 'insert':
+        auth_user_cache.clear()
+
+
+def _on_user_write(operation: str, fields: Optional[set[str]]) -> None:
+    if operation == 'delete' or (operation == 'update' and (fields is None or fields & AUTH_USER_FIELDS)):
+        auth_user_cache.clear()
+
+
+core_service.register_write_hook(Collections.ACCESS_TOKENS, _on_access_token_write)
+core_service.register_write_hook(Collections.USERS, _on_user_write)
+
+
 class JWTAuthUser:
     """
     A class used to manage JWT Authentication for a User.
@@ -109,12 +233,13 @@ class JWTAuthUser:
         self.access_levels = access_levels
         self.token_type = token_type
 
-    async def __call__(self, credentials: HTTPAuthorizationCredentials = Depends(security)):
+    async def __call__(self, request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
         """
         Callable method to verify the authorization token and check the
         user's access levels.
 
         Args:
+            request (Request): request whose auth context holds the claims verified earlier, e.g. by the tracker middleware
             credentials (HTTPAuthorizationCredentials, optional): HTTP authorization
                 credentials obtained from the HTTP Bearer token.
 
@@ -129,14 +254,21 @@ class JWTAuthUser:
         token = credentials.credentials
 
         # Verify the JWT token
-        token_data = verify_jwt_token(token.strip())
+        token_data = get_auth_context(request).get_claims(token.strip())
 
         # Check if the token type matches the expected token type
         if token_data['token_type'] != self.token_type:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=localization.EXCEPTION_TOKEN_INVALID)
 
+        # Stateless mode trusts the signature and expiry of the token unless it is revoked.
+        # Tokens without jti and workers that have not loaded the revocations yet verify the user.
+        if config.STATELESS_AUTH and 'jti' in token_data and revocation.revoked_tokens.watermark is not None:
+            if await revocation.revoked_tokens.is_revoked(token_data['jti']):
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=localization.EXCEPTION_TOKEN_INVALID)
+            return self._authorize(token_data)
+
         # Verify the user
-        existing_user = await get_current_user(token_data, token)
+        existing_user = await get_authenticated_user(token_data, token)
 
         # Check if the user exists
         if not existing_user:
@@ -146,11 +278,14 @@ class JWTAuthUser:
         if existing_user['account_status'] != AccountStatus.ACTIVE:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=localization.EXCEPTION_ACCOUNT_INACTIVE)
 
+        return self._authorize(token_data)
+
+    def _authorize(self, token_data: dict[str, Any]) -> dict[str, Any]:
         # Check if the user has the required access level
         if token_data['user_type'] not in self.access_levels:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=localization.EXCEPTION_FORBIDDEN_ACCESS)
 
         # Update the last active time for the user
-        asyncio.create_task(update_last_active(token_data['user_id']))
+        update_last_active(token_data['user_id'])
 
         return token_data
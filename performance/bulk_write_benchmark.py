@@ -0,0 +1,55 @@
+"""Measures core_data.bulk_write throughput for a 100k operation import.
+
+Runs against the configured database, e.g.
+    MONGO_URI=mongodb://localhost:27017/benchmark python -m performance.bulk_write_benchmark
+    DATABASE_BACKEND=memory python -m performance.bulk_write_benchmark
+The benchmark collection is dropped before every run.
+"""
+import asyncio
+import time
+
+from pymongo import InsertOne
+
+from app.server.database import core_data
+from app.server.database.db import mongo
+
+COLLECTION = 'bulk_write_benchmark'
+OPERATIONS = 100_000
+
+
+def make_operations(count: int) -> list[InsertOne]:
+    return [InsertOne({'_id': f'{index:08d}', 'email': f'user{index}@example.com', 'name': f'User {index}', 'tags': ['a', 'b'], 'count': index}) for index in range(count)]
+
+
+async def reset() -> None:
+    collection = mongo.get_collection(COLLECTION)
+    await collection.delete_many({})
+
+
+async def run(label: str, ordered: bool, chunk_size: int, max_concurrency: int) -> None:
+    await reset()
+    operations = make_operations(OPERATIONS)
+    # every 10000th operation duplicates the _id of the previous one
+    for index in range(10_000, OPERATIONS, 10_000):
+        operations[index] = InsertOne({'_id': f'{index - 1:08d}'})
+    started = time.perf_counter()
+    result = await core_data.bulk_write(COLLECTION, operations, ordered=ordered, chunk_size=chunk_size, max_concurrency=max_concurrency)
+    elapsed = time.perf_counter() - started
+    print(
+        f'{label:<32}{elapsed:>8.2f} s{result["inserted_count"] / elapsed:>12.0f} ops/s'
+        f'  inserted={result["inserted_count"]} errors={len(result["errors"])} unprocessed={result["unprocessed_count"]}'
+    )
+
+
+async def main() -> None:
+    print(f'{OPERATIONS} InsertOne operations with {len(range(10_000, OPERATIONS, 10_000))} duplicate keys')
+    await run('single ordered batch', ordered=True, chunk_size=OPERATIONS, max_concurrency=1)
+    await run('ordered chunks of 1000', ordered=True, chunk_size=1000, max_concurrency=1)
+    await run('unordered single batch', ordered=False, chunk_size=OPERATIONS, max_concurrency=1)
+    for concurrency in (1, 4, 8):
+        await run(f'unordered 1000 x {concurrency} concurrent', ordered=False, chunk_size=1000, max_concurrency=concurrency)
+    await reset()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,40 @@
+"""Compares the HS256 codec of utils.jwt_codec with python-jose for the tokens created at login and refresh.
+
+Run from the repository root: python -m performance.jwt_benchmark
+Tokens of each implementation are verified by the other before timing.
+"""
+import timeit
+from datetime import datetime, timedelta, timezone
+
+from jose import jwt
+
+from app.server.static.enums import Role, TokenType
+from app.server.utils.jwt_codec import HS256Codec
+
+SECRET = 'benchmark-secret'
+ROUNDS = 20_000
+
+
+def make_claims() -> dict:
+    now = datetime.now(timezone.utc)
+    return {'user_id': '64f1c2a9e13b0c5d7e8f9a01', 'user_type': Role.TALENT, 'token_type': TokenType.BEARER, 'iat': now, 'exp': now + timedelta(days=1)}
+
+
+def measure(function) -> float:
+    return min(timeit.repeat(function, number=ROUNDS, repeat=3)) / ROUNDS
+
+
+if __name__ == '__main__':
+    codec = HS256Codec(SECRET)
+    claims = make_claims()
+    jose_token = jwt.encode(claims, SECRET, algorithm='HS256')
+    codec_token = codec.encode(claims)
+    assert codec.decode(jose_token) == jwt.decode(codec_token, SECRET, algorithms=['HS256'])
+
+    print(f'{"operation":<10}{"jose (us)":>12}{"codec (us)":>12}{"speedup":>10}')
+    for operation, before, after in (
+        ('encode', lambda: jwt.encode(claims, SECRET, algorithm='HS256'), lambda: codec.encode(claims)),
+        ('decode', lambda: jwt.decode(jose_token, SECRET, algorithms=['HS256']), lambda: codec.decode(jose_token)),
+    ):
+        before_seconds, after_seconds = measure(before), measure(after)
+        print(f'{operation:<10}{before_seconds * 1e6:>12.2f}{after_seconds * 1e6:>12.2f}{before_seconds / after_seconds:>9.1f}x')
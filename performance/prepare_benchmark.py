@@ -0,0 +1,60 @@
+"""Compares the document and update preparation of core_data with the previous pydantic/deepcopy path.
+
+Run from the repository root: python -m performance.prepare_benchmark
+"""
+import copy
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+
+from app.server.database.core_data import _prepare_document, _prepare_update, _prepare_upsert
+from app.server.models.core_data import CreateData
+from app.server.utils import date_utils
+
+
+def make_document(index: int) -> dict:
+    return {'email': f'user{index}@example.com', 'first_name': 'First', 'last_name': 'Last', 'address': {'city': 'City', 'tags': ['a', 'b']}, 'age': index % 90}
+
+
+def make_update(index: int) -> dict:
+    return {'$set': {'first_name': f'First {index}', 'address': {'city': 'City', 'tags': ['a', 'b']}}, '$inc': {'logins': 1}}
+
+
+def pydantic_documents(documents: list[dict]) -> list[dict]:
+    return jsonable_encoder([CreateData.parse_obj(document) for document in documents])
+
+
+def fast_documents(documents: list[dict]) -> list[dict]:
+    timestamp = date_utils.get_current_timestamp()
+    return [_prepare_document(document, timestamp) for document in documents]
+
+
+def deepcopy_updates(updates: list[dict]) -> list[dict]:
+    timestamp = date_utils.get_current_timestamp()
+    prepared = []
+    for update in updates:
+        update = copy.deepcopy(update)
+        update.setdefault('$set', {})['updated_at'] = timestamp
+        update.setdefault('$setOnInsert', {}).update({'created_at': timestamp, 'is_deleted': False})
+        prepared.append(update)
+    return prepared
+
+
+def copy_on_write_updates(updates: list[dict]) -> list[dict]:
+    timestamp = date_utils.get_current_timestamp()
+    return [_prepare_upsert(_prepare_update(update, timestamp), timestamp) for update in updates]
+
+
+def measure(function, argument, size: int) -> float:
+    repeat = max(1, 1000 // size)
+    return min(timeit.repeat(lambda: function(argument), number=repeat, repeat=3)) / repeat
+
+
+if __name__ == '__main__':
+    print(f'{"operation":<10}{"documents":>10}{"before (ms)":>14}{"after (ms)":>14}{"speedup":>10}')
+    for size in (1, 1_000, 100_000):
+        documents = [make_document(index) for index in range(size)]
+        updates = [make_update(index) for index in range(size)]
+        for operation, before, after, data in (('create', pydantic_documents, fast_documents, documents), ('update', deepcopy_updates, copy_on_write_updates, updates)):
+            before_seconds, after_seconds = measure(before, data, size), measure(after, data, size)
+            print(f'{operation:<10}{size:>10}{before_seconds * 1000:>14.3f}{after_seconds * 1000:>14.3f}{before_seconds / after_seconds:>9.1f}x')